@@ -1,11 +1,23 @@
-import speech_recognition as sr
-import pyaudio
 import wave
 import time
 import threading
 import os
 
+# pyaudio, speech_recognition and nltk are imported on first use so that
+# importing this module does not open audio devices or need those packages.
+_p = None
+
+def get_audio_interface():
+    """Create the PortAudio interface on first use"""
+    global _p
+    if _p is None:
+        import pyaudio
+        _p = pyaudio.PyAudio()  # Create an interface to PortAudio
+    return _p
+
 def read_audio(stream, filename):
+    import pyaudio
+    p = get_audio_interface()
     chunk = 1024  # Record in chunks of 1024 samples
     sample_format = pyaudio.paInt16  # 16 bits per sample
     channels = 2
@@ -30,6 +42,7 @@ def read_audio(stream, filename):
     stream.close()
 
 def convert(i):
+    import speech_recognition as sr
     if i >= 0:
         sound = 'record' + str(i) +'.wav'
         r = sr.Recognizer()
@@ -58,67 +71,18 @@ def convert(i):
         except KeyboardInterrupt:
             pass
 
-p = pyaudio.PyAudio()  # Create an interface to PortAudio
 chunk = 1024  # Record in chunks of 1024 samples
-sample_format = pyaudio.paInt16  # 16 bits per sample
 channels = 2
 fs = 44100
 
 def save_audios(i):
-    stream = p.open(format=sample_format,channels=channels,rate=fs,
+    import pyaudio
+    sample_format = pyaudio.paInt16  # 16 bits per sample
+    stream = get_audio_interface().open(format=sample_format,channels=channels,rate=fs,
                 frames_per_buffer=chunk,input=True)
     filename = 'record'+str(i)+'.wav'
     read_audio(stream, filename)
 
-for i in range(30//10): # Number of total seconds to record/ Number of seconds per recording
-    t1 = threading.Thread(target=save_audios, args=[i]) 
-    x = i-1
-    t2 = threading.Thread(target=convert, args=[x]) # send one earlier than being recorded
-    t1.start() 
-    t2.start() 
-    t1.join() 
-    t2.join() 
-    if i==2:
-        flag = True
-if flag:
-    convert(i)
-    p.terminate()
-
-
-from nltk.corpus import stopwords 
-from nltk.tokenize import word_tokenize 
-
-file = open("test.txt") ## Student speech file
-data = file.read()
-file.close()
-stop_words = set(stopwords.words('english'))   
-word_tokens = word_tokenize(data) ######### tokenizing sentence
-filtered_sentence = [w for w in word_tokens if not w in stop_words]  
-filtered_sentence = [] 
-  
-for w in word_tokens:   ####### Removing stop words
-    if w not in stop_words: 
-        filtered_sentence.append(w) 
-
-####### creating a final file
-f=open('final.txt','w')
-for ele in filtered_sentence:
-    f.write(ele+' ')
-f.close()
-    
-##### checking whether proctor needs to be alerted or not
-file = open("paper.txt") ## Question file
-data = file.read()
-file.close()
-stop_words = set(stopwords.words('english'))   
-word_tokens = word_tokenize(data) ######### tokenizing sentence
-filtered_questions = [w for w in word_tokens if not w in stop_words]  
-filtered_questions = [] 
-  
-for w in word_tokens:   ####### Removing stop words
-    if w not in stop_words: 
-        filtered_questions.append(w) 
-        
 def common_member(a, b):     
     a_set = set(a) 
     b_set = set(b) 
@@ -127,8 +91,61 @@ def common_member(a, b):
     if len(a_set.intersection(b_set)) > 0: 
         return(a_set.intersection(b_set))   
     else: 
-        return([]) 
+        return([])
+
+def main():
+    flag = False
+    for i in range(30//10): # Number of total seconds to record/ Number of seconds per recording
+        t1 = threading.Thread(target=save_audios, args=[i]) 
+        x = i-1
+        t2 = threading.Thread(target=convert, args=[x]) # send one earlier than being recorded
+        t1.start() 
+        t2.start() 
+        t1.join() 
+        t2.join() 
+        if i==2:
+            flag = True
+    if flag:
+        convert(i)
+        get_audio_interface().terminate()
+
+    from nltk.corpus import stopwords 
+    from nltk.tokenize import word_tokenize 
+
+    file = open("test.txt") ## Student speech file
+    data = file.read()
+    file.close()
+    stop_words = set(stopwords.words('english'))   
+    word_tokens = word_tokenize(data) ######### tokenizing sentence
+    filtered_sentence = [w for w in word_tokens if not w in stop_words]  
+    filtered_sentence = [] 
+
+    for w in word_tokens:   ####### Removing stop words
+        if w not in stop_words: 
+            filtered_sentence.append(w) 
+
+    ####### creating a final file
+    f=open('final.txt','w')
+    for ele in filtered_sentence:
+        f.write(ele+' ')
+    f.close()
+
+    ##### checking whether proctor needs to be alerted or not
+    file = open("paper.txt") ## Question file
+    data = file.read()
+    file.close()
+    stop_words = set(stopwords.words('english'))   
+    word_tokens = word_tokenize(data) ######### tokenizing sentence
+    filtered_questions = [w for w in word_tokens if not w in stop_words]  
+    filtered_questions = [] 
+
+    for w in word_tokens:   ####### Removing stop words
+        if w not in stop_words: 
+            filtered_questions.append(w) 
+
+    comm = common_member(filtered_questions, filtered_sentence)
+    print('Number of common elements:', len(comm))
+    print(comm)
 
-comm = common_member(filtered_questions, filtered_sentence)
-print('Number of common elements:', len(comm))
-print(comm)
+if __name__ == '__main__':
+    main()
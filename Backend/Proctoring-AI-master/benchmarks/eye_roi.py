@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Compares the full-frame and crop-local eye pipelines of eye_tracker on the
+eye_tracking/*.mp4 clips: how often the gaze classifications agree and how
+long each takes per face.
+
+Run from the Proctoring-AI-master folder:
+    python benchmarks/eye_roi.py
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+import cv2
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from detectors import get_face_model, get_landmarks_model
+from eye_tracker import EyeBuffers, gaze_for_face
+from face_detector import find_faces
+from face_landmarks import detect_marks
+
+
+def positions(result):
+    return result['left_eye']['position'], result['right_eye']['position'], result['gaze']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--videos', nargs='+', default=sorted(glob.glob(os.path.join(BASE_DIR, 'eye_tracking', '*.mp4'))))
+    parser.add_argument('--threshold', type=int, default=75)
+    args = parser.parse_args()
+
+    face_model = get_face_model()
+    landmark_model = get_landmarks_model()
+    buffers = EyeBuffers()
+
+    print(f"{'video':<28}{'faces':>7}{'agree':>8}{'full ms':>10}{'crop ms':>10}{'speedup':>9}")
+    for video in args.videos:
+        cap = cv2.VideoCapture(video)
+        faces = agree = 0
+        full_time = crop_time = 0.0
+        while True:
+            ret, img = cap.read()
+            if not ret:
+                break
+            for face in find_faces(img, face_model):
+                shape = detect_marks(img, landmark_model, face)
+
+                start = time.perf_counter()
+                full, _ = gaze_for_face(img, shape, args.threshold, crop=False)
+                full_time += time.perf_counter() - start
+
+                start = time.perf_counter()
+                cropped, _ = gaze_for_face(img, shape, args.threshold, buffers, crop=True)
+                crop_time += time.perf_counter() - start
+
+                faces += 1
+                agree += positions(full) == positions(cropped)
+        cap.release()
+
+        if faces:
+            print(f"{os.path.basename(video):<28}{faces:>7}{agree / faces:>8.1%}"
+                  f"{full_time / faces * 1000:>10.2f}{crop_time / faces * 1000:>10.2f}"
+                  f"{full_time / max(crop_time, 1e-9):>8.1f}x")
+        else:
+            print(f"{os.path.basename(video):<28}{0:>7}  no faces found")
+
+
+if __name__ == '__main__':
+    main()
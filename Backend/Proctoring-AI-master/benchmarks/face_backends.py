@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+Speed and agreement of the face detectors behind the /proctor routes on the
+face_detection/faces/*.jpg images.
+
+Every backend is timed on the whole frame; "haar_full" is the old scan (no
+face size limits). Face counts and boxes are compared with the reference
+backend (dnn_tf by default). The "+roi" rows time a hinted scan around the
+reference faces, as a session keyframe does after the first one.
+
+Run from the Proctoring-AI-master folder:
+    python benchmarks/face_backends.py
+    python benchmarks/face_backends.py --repeat 20 --reference haar
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+import cv2
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(BASE_DIR))
+
+from app.utils import faces as face_backends
+from app.utils.models import registry
+
+
+def haar_full(frame, gray=None, frame_side=None):
+    if gray is None:
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    boxes = registry.get('haar').detectMultiScale(gray, 1.1, 4)
+    return [[int(x), int(y), int(x + w), int(y + h)] for (x, y, w, h) in boxes]
+
+
+def iou(a, b):
+    x0, y0 = max(a[0], b[0]), max(a[1], b[1])
+    x1, y1 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0, x1 - x0) * max(0, y1 - y0)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def mean_best_iou(boxes, reference):
+    """Mean over the reference faces of the best IoU with any of ``boxes``."""
+    if not reference:
+        return None
+    return sum(max((iou(r, b) for b in boxes), default=0.0) for r in reference) / len(reference)
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return result, (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', nargs='+', default=sorted(glob.glob(os.path.join(BASE_DIR, 'face_detection', 'faces', '*.jpg'))))
+    parser.add_argument('--reference', default='dnn_tf')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    backends = {'haar_full': haar_full}
+    for name, detect in face_backends.BACKENDS.items():
+        if registry.available(name if name == 'haar' else 'face_' + name):
+            backends[name] = detect
+        else:
+            print(f"skipping {name}: model not available")
+    if args.reference not in backends:
+        parser.error(f"reference backend {args.reference!r} is not available")
+
+    frames = [img for img in (cv2.imread(path) for path in args.images) if img is not None]
+    references = [backends[args.reference](img) for img in frames]
+
+    print(f"{'backend':<16}{'ms/frame':>10}{'count ok':>10}{'mean IoU':>10}")
+    for name, detect in backends.items():
+        total_ms = 0.0
+        roi_ms = 0.0
+        count_ok = 0
+        ious = []
+        for img, reference in zip(frames, references):
+            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+            boxes, ms = timed(lambda: detect(img, gray), args.repeat)
+            total_ms += ms
+            count_ok += len(boxes) == len(reference)
+            score = mean_best_iou(boxes, reference)
+            if score is not None:
+                ious.append(score)
+            if name in face_backends.BACKENDS:
+                _, ms = timed(lambda: face_backends.detect_faces(img, gray, backend=name, hint=reference),
+                              args.repeat)
+                roi_ms += ms
+
+        n = max(len(frames), 1)
+        mean_iou = f"{sum(ious) / len(ious):.3f}" if ious else "-"
+        print(f"{name:<16}{total_ms / n:>10.2f}{count_ok / n:>10.1%}{mean_iou:>10}")
+        if name in face_backends.BACKENDS:
+            print(f"{name + '+roi':<16}{roi_ms / n:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
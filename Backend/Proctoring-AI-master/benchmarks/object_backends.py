@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Latency of the person/phone detectors behind /proctor/monitor, YoloV3 and
+SSD MobileNet (TFLite), on frames of the eye_tracking/*.mp4 clips, and how
+often SSD agrees with YoloV3 on the person count and on phone presence.
+
+YoloV3 needs models/yolov3.weights; without it only SSD is timed.
+
+Run from the Proctoring-AI-master folder:
+    python benchmarks/object_backends.py
+    python benchmarks/object_backends.py --step 5 --threads 1 2 4
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+import cv2
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from ssd_detector import SsdDetector
+
+
+def read_frames(videos, step):
+    frames = []
+    for video in videos:
+        cap = cv2.VideoCapture(video)
+        index = 0
+        while True:
+            ret, img = cap.read()
+            if not ret:
+                break
+            if index % step == 0:
+                frames.append(img)
+            index += 1
+        cap.release()
+    return frames
+
+
+def run(detect, frames):
+    results = []
+    start = time.perf_counter()
+    for img in frames:
+        results.append(detect(img))
+    return results, (time.perf_counter() - start) / max(len(frames), 1) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--videos', nargs='+', default=sorted(glob.glob(os.path.join(BASE_DIR, 'eye_tracking', '*.mp4'))))
+    parser.add_argument('--step', type=int, default=10, help='use every step-th frame')
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4], help='SSD interpreter threads')
+    parser.add_argument('--score', type=float, default=0.5, help='SSD score threshold')
+    args = parser.parse_args()
+
+    frames = read_frames(args.videos, args.step)
+    if not frames:
+        parser.error("no frames could be read")
+    print(f"{len(frames)} frames")
+
+    reference = None
+    try:
+        from person_and_phone import MODELS_DIR, process_frame_for_proctoring, warm_up_yolo
+        if os.path.exists(os.path.join(MODELS_DIR, 'yolov3.weights')):
+            warm_up_yolo()
+            reference, ms = run(process_frame_for_proctoring, frames)
+            print(f"{'yolo':<12}{ms:>10.2f} ms/frame")
+        else:
+            print("skipping yolo: models/yolov3.weights not found")
+    except ImportError as e:
+        print(f"skipping yolo: {e}")
+
+    for threads in args.threads:
+        detector = SsdDetector(num_threads=threads)
+        detector.process_frame_for_proctoring(frames[0], args.score)
+        results, ms = run(lambda img: detector.process_frame_for_proctoring(img, args.score), frames)
+        line = f"{'ssd x' + str(threads):<12}{ms:>10.2f} ms/frame"
+        if reference is not None:
+            pairs = [(r, s) for r, s in zip(reference, results)
+                     if r['status'] == 'success' and s['status'] == 'success']
+            n = max(len(pairs), 1)
+            people = sum(r['person_count'] == s['person_count'] for r, s in pairs) / n
+            phone = sum(r['phone_detected'] == s['phone_detected'] for r, s in pairs) / n
+            line += f"   person count agrees {people:.1%}, phone agrees {phone:.1%}"
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+Accuracy vs. speed of the frame sampling policies of video_pipeline on the
+eye_tracking/*.mp4 clips.
+
+Every clip is first analyzed at full rate as the reference. Each policy is
+then timed, and its filled-in timeline is compared frame by frame with the
+reference: face count, gaze, head direction, mouth (and person count and
+phone with --objects, which needs the YoloV3 weights).
+
+Run from the Proctoring-AI-master folder:
+    python benchmarks/sampling_policies.py
+    python benchmarks/sampling_policies.py --policies stride:3 fps:5 change:6
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from detectors import get_face_model, get_landmarks_model
+from video_pipeline import (VideoPipeline, GazeStage, HeadPoseStage, MouthStage,
+                            ObjectStage)
+
+
+def first_face(record):
+    return record['faces'][0] if record['faces'] else {}
+
+
+def head_direction(record):
+    pose = first_face(record).get('head_pose')
+    return (pose['vertical'], pose['horizontal']) if pose else None
+
+
+FIELDS = {
+    'faces': lambda r: len(r['faces']),
+    'gaze': lambda r: first_face(r).get('gaze'),
+    'head': head_direction,
+    'mouth': lambda r: first_face(r).get('mouth_open'),
+}
+OBJECT_FIELDS = {
+    'people': lambda r: r.get('person_count'),
+    'phone': lambda r: r.get('phone_detected'),
+}
+
+
+def analyze(video, policy, face_model, landmark_model, objects):
+    stages = [GazeStage(), HeadPoseStage(), MouthStage()]
+    if objects:
+        stages.append(ObjectStage())
+    pipeline = VideoPipeline(stages, face_model, landmark_model)
+    start = time.perf_counter()
+    result = pipeline.run(video, sampling=policy)
+    return result, time.perf_counter() - start
+
+
+def agreement(reference, timeline, fields):
+    n = min(len(reference), len(timeline))
+    return {name: sum(get(reference[i]) == get(timeline[i]) for i in range(n)) / max(n, 1)
+            for name, get in fields.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--videos', nargs='+', default=sorted(glob.glob(os.path.join(BASE_DIR, 'eye_tracking', '*.mp4'))))
+    parser.add_argument('--policies', nargs='+',
+                        default=['stride:2', 'stride:3', 'fps:10', 'fps:5', 'change', 'change:8:0.95'])
+    parser.add_argument('--objects', action='store_true', help='also run the YoloV3 object stage')
+    args = parser.parse_args()
+
+    face_model = get_face_model()
+    landmark_model = get_landmarks_model()
+    fields = dict(FIELDS, **OBJECT_FIELDS) if args.objects else FIELDS
+    # One untimed pass so model initialisation does not count against 'all'
+    analyze(args.videos[0], 'stride:1000', face_model, landmark_model, args.objects)
+
+    header = f"{'video':<26}{'policy':<16}{'analyzed':>9}{'time s':>8}{'speedup':>9}"
+    header += ''.join(f"{name:>8}" for name in fields)
+    print(header)
+    for video in args.videos:
+        reference, ref_time = analyze(video, 'all', face_model, landmark_model, args.objects)
+        name = os.path.basename(video)
+        print(f"{name:<26}{'all':<16}{reference['frames']:>9}{ref_time:>8.2f}{1:>8.1f}x"
+              + ''.join(f"{1:>8.1%}" for _ in fields))
+        for policy in args.policies:
+            result, elapsed = analyze(video, policy, face_model, landmark_model, args.objects)
+            scores = agreement(reference['timeline'], result['timeline'], fields)
+            print(f"{name:<26}{policy:<16}{result['sampling']['analyzed_frames']:>9}{elapsed:>8.2f}"
+                  f"{ref_time / max(elapsed, 1e-9):>8.1f}x"
+                  + ''.join(f"{scores[f]:>8.1%}" for f in fields))
+
+
+if __name__ == '__main__':
+    main()
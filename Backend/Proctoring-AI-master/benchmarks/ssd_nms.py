@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+Per-class NMS for the TFLite SSD output: the NumPy ssd_detector.nms_per_class
+used by seg_tflite.apply_nms against the previous implementation, which
+scattered the detections into dense [1, N, 90, 4] tensors and ran
+tf.image.combined_non_max_suppression over all 90 classes.
+
+Detections are synthetic, clustered so that boxes of the same class overlap.
+Every run checks that both select the same detections in the same order.
+The TensorFlow reference is skipped when TensorFlow is not installed.
+
+Run from the Proctoring-AI-master folder:
+    python benchmarks/ssd_nms.py
+    python benchmarks/ssd_nms.py --sizes 10 100 --classes 5
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from ssd_detector import nms_per_class
+
+
+def dense_tf_nms(boxes, classes, scores, iou_thresh, score_thresh, q=90):
+    """The previous seg_tflite.apply_nms, returning (boxes, classes, scores)."""
+    import tensorflow as tf
+    num = len(scores)
+    dense_boxes = np.zeros([1, num, q, 4])
+    dense_scores = np.zeros([1, num, q])
+    for i in range(num):
+        dense_boxes[0, i, classes[i], :] = boxes[i]
+        dense_scores[0, i, classes[i]] = scores[i]
+    nmsd = tf.image.combined_non_max_suppression(boxes=dense_boxes.astype(np.float32),
+                                                 scores=dense_scores.astype(np.float32),
+                                                 max_output_size_per_class=num,
+                                                 max_total_size=num,
+                                                 iou_threshold=iou_thresh,
+                                                 score_threshold=score_thresh,
+                                                 pad_per_class=False,
+                                                 clip_boxes=False)
+    valid = nmsd.valid_detections[0].numpy()
+    return (nmsd.nmsed_boxes[0].numpy()[:valid],
+            nmsd.nmsed_classes[0].numpy().astype(np.int64)[:valid],
+            nmsd.nmsed_scores[0].numpy()[:valid])
+
+
+def numpy_nms(boxes, classes, scores, iou_thresh, score_thresh):
+    keep = nms_per_class(boxes, classes, scores, iou_thresh, score_thresh)
+    return boxes[keep], classes[keep], scores[keep]
+
+
+def synthetic(rng, num, n_classes):
+    """SSD-like output: boxes jittered around a few centres, classes from a few ids."""
+    centres = rng.uniform(0.2, 0.8, size=(max(1, num // 4), 2))
+    picked = centres[rng.integers(0, len(centres), num)] + rng.normal(0, 0.03, size=(num, 2))
+    size = rng.uniform(0.1, 0.3, size=(num, 2))
+    boxes = np.concatenate([picked - size / 2, picked + size / 2], axis=1).astype(np.float32)
+    class_ids = rng.choice(90, size=n_classes, replace=False)
+    classes = class_ids[rng.integers(0, n_classes, num)].astype(np.int64)
+    scores = rng.uniform(0, 1, num).astype(np.float32)
+    return boxes, classes, scores
+
+
+def timed(fn, args, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn(*args)
+    return result, (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 50, 100])
+    parser.add_argument('--classes', type=int, default=3, help='distinct classes among the detections')
+    parser.add_argument('--iou', type=float, default=0.5)
+    parser.add_argument('--score', type=float, default=0.6)
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    try:
+        import tensorflow  # noqa: F401
+        have_tf = True
+    except ImportError:
+        print("TensorFlow not installed: timing the NumPy NMS only")
+        have_tf = False
+
+    rng = np.random.default_rng(args.seed)
+    print(f"{'N':>6}{'numpy ms':>11}{'tf ms':>10}{'speedup':>9}{'identical':>11}")
+    for num in args.sizes:
+        inputs = synthetic(rng, num, args.classes) + (args.iou, args.score)
+        ours, ours_ms = timed(numpy_nms, inputs, args.repeat)
+        if not have_tf:
+            print(f"{num:>6}{ours_ms:>11.3f}")
+            continue
+        dense_tf_nms(*inputs)  # graph setup outside the timing
+        theirs, tf_ms = timed(dense_tf_nms, inputs, args.repeat)
+        identical = (np.array_equal(ours[1], theirs[1]) and np.allclose(ours[0], theirs[0])
+                     and np.allclose(ours[2], theirs[2]))
+        print(f"{num:>6}{ours_ms:>11.3f}{tf_ms:>10.3f}{tf_ms / max(ours_ms, 1e-9):>8.1f}x{str(identical):>11}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""
+Per-frame YoloV3 latency in eager, graph (tf.function) and XLA execution
+at batch sizes 1, 4 and 16.
+
+Run from the Proctoring-AI-master folder:
+    python benchmarks/yolo_execution.py --iterations 20
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from person_and_phone import get_yolo, make_inference_fn
+
+
+def time_mode(mode, batch_size, iterations, warmup=2):
+    infer = make_inference_fn(get_yolo(), mode, 416)
+    batch = np.random.rand(batch_size, 416, 416, 3).astype(np.float32)
+    for _ in range(warmup):
+        infer(batch)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        outputs = infer(batch)
+        np.asarray(outputs[3])  # make sure the work has actually finished
+    elapsed = time.perf_counter() - start
+    return elapsed / iterations * 1000, elapsed / (iterations * batch_size) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--modes', nargs='+', default=['eager', 'graph', 'xla'])
+    parser.add_argument('--iterations', type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{'mode':<8}{'batch':>6}{'ms/batch':>12}{'ms/frame':>12}")
+    for mode in args.modes:
+        for batch_size in args.batch_sizes:
+            try:
+                per_batch, per_frame = time_mode(mode, batch_size, args.iterations)
+            except Exception as e:
+                print(f"{mode:<8}{batch_size:>6}  failed: {e}")
+                break
+            print(f"{mode:<8}{batch_size:>6}{per_batch:>12.1f}{per_frame:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
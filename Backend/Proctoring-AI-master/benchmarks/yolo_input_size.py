@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+YoloV3 latency and detection quality at each input size on letterboxed
+frames, plus the old 416x416 squash for comparison.
+
+There are no labels, so the largest letterboxed size is the reference:
+phone recall is the share of its phone frames that a setting also flags,
+and person agreement the share of frames with the same person count.
+The default clips rarely show a phone; pass --sources with recordings that
+do for a meaningful recall.
+
+Needs models/yolov3.weights. Run from the Proctoring-AI-master folder:
+    python benchmarks/yolo_input_size.py
+    python benchmarks/yolo_input_size.py --sizes 320 416 608 --sources phone_clip.mp4
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from person_and_phone import get_yolo_infer, preprocess_frame, summarize_detections, warm_up_yolo
+
+
+def read_frames(paths, step):
+    frames = []
+    for path in paths:
+        if path.lower().endswith(('.jpg', '.jpeg', '.png')):
+            img = cv2.imread(path)
+            if img is not None:
+                frames.append(img)
+            continue
+        cap = cv2.VideoCapture(path)
+        index = 0
+        while True:
+            ret, img = cap.read()
+            if not ret:
+                break
+            if index % step == 0:
+                frames.append(img)
+            index += 1
+        cap.release()
+    return frames
+
+
+def squashed(image, size=416):
+    """The previous preprocessing: a plain resize to size x size."""
+    img = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    return cv2.resize(img, (size, size)).astype(np.float32) / 255.0
+
+
+def run(frames, size, letterbox=True):
+    infer = get_yolo_infer(size)
+    results = []
+    start = time.perf_counter()
+    for img in frames:
+        batch = (preprocess_frame(img, size) if letterbox else squashed(img, size))[np.newaxis]
+        boxes, scores, classes, nums = (np.asarray(t)[0] for t in infer(batch))
+        results.append(summarize_detections(scores, classes, nums, boxes, img.shape,
+                                            size if letterbox else None))
+    return results, (time.perf_counter() - start) / len(frames) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sources', nargs='+', default=sorted(glob.glob(os.path.join(BASE_DIR, 'eye_tracking', '*.mp4'))),
+                        help='videos and images to take frames from')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[320, 416, 608],
+                        help='input sizes to compare, multiples of 32')
+    parser.add_argument('--step', type=int, default=10, help='use every step-th video frame')
+    args = parser.parse_args()
+
+    frames = read_frames(args.sources, args.step)
+    if not frames:
+        parser.error("no frames could be read")
+    sizes = sorted(args.sizes, reverse=True)
+    warm_up_yolo(sizes=sizes)
+
+    settings = [('letterbox {}'.format(size), size, True) for size in sizes] + [('squash 416', 416, False)]
+    reference = None
+    print(f"{len(frames)} frames")
+    print(f"{'setting':<16}{'ms/frame':>10}{'phone recall':>14}{'people agree':>14}")
+    for name, size, letterbox in settings:
+        results, ms = run(frames, size, letterbox)
+        if reference is None:
+            reference = results
+        phone_frames = [i for i, r in enumerate(reference) if r.get('phone_detected')]
+        recall = (f"{sum(bool(results[i].get('phone_detected')) for i in phone_frames) / len(phone_frames):.1%}"
+                  if phone_frames else '-')
+        agree = sum(r.get('person_count') == ref.get('person_count')
+                    for r, ref in zip(results, reference)) / len(frames)
+        print(f"{name:<16}{ms:>10.1f}{recall:>14}{agree:>14.1%}")
+    print(f"reference ({settings[0][0]}) flags a phone in {len(phone_frames)} frames")
+
+
+if __name__ == '__main__':
+    main()
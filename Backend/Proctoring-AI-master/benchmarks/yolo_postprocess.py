@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+Cost of YoloV3 post-processing: yolo_nms over all 80 COCO classes against
+yolo_nms_proctoring over person and cell phone only, on the decoded boxes of
+frames from the eye_tracking/*.mp4 clips (the backbone runs once per frame,
+outside the timing).
+
+Also reports how often both give the same person count and phone flag, with
+the all-class output both as is (score >= 0.1) and thresholded at --score.
+
+Needs models/yolov3.weights. Run from the Proctoring-AI-master folder:
+    python benchmarks/yolo_postprocess.py
+    python benchmarks/yolo_postprocess.py --step 5 --score 0.4
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+import tensorflow as tf
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from person_and_phone import (YoloV3, load_yolo_weights, preprocess_frame, summarize_detections,
+                              yolo_anchors, yolo_anchor_masks, yolo_nms, yolo_nms_proctoring)
+
+
+def read_frames(videos, step):
+    frames = []
+    for video in videos:
+        cap = cv2.VideoCapture(video)
+        index = 0
+        while True:
+            ret, img = cap.read()
+            if not ret:
+                break
+            if index % step == 0:
+                frames.append(img)
+            index += 1
+        cap.release()
+    return frames
+
+
+def flags(result):
+    return result['person_count'], result['phone_detected']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--videos', nargs='+', default=sorted(glob.glob(os.path.join(BASE_DIR, 'eye_tracking', '*.mp4'))))
+    parser.add_argument('--step', type=int, default=10, help='use every step-th frame')
+    parser.add_argument('--score', type=float, default=0.5, help='score threshold of the proctoring mode')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    model = YoloV3()
+    if not load_yolo_weights(model):
+        parser.error("YoloV3 weights are required")
+    decode = tf.keras.Model(model.input, [model.get_layer(f'yolo_boxes_{i}').output for i in range(3)])
+
+    @tf.function
+    def all_classes(outputs):
+        return yolo_nms([o[:3] for o in outputs], yolo_anchors, yolo_anchor_masks, 80)
+
+    @tf.function
+    def proctoring(outputs):
+        return yolo_nms_proctoring([o[:3] for o in outputs], score_threshold=args.score)
+
+    frames = read_frames(args.videos, args.step)
+    if not frames:
+        parser.error("no frames could be read")
+    decoded = [decode(preprocess_frame(img)[np.newaxis]) for img in frames]
+
+    timings = {}
+    results = {}
+    for name, fn in (('all', all_classes), ('proctoring', proctoring)):
+        fn(decoded[0])  # trace outside the timing
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            outputs = [fn(d) for d in decoded]
+            np.asarray(outputs[-1][3])
+        timings[name] = (time.perf_counter() - start) / (args.repeat * len(decoded)) * 1000
+        results[name] = [[np.asarray(t)[0] for t in out] for out in outputs]
+
+    def summaries(name, score=None):
+        summary = []
+        for boxes, scores, classes, num in results[name]:
+            n = int(num)
+            if score is not None:
+                keep = scores[:n] >= score
+                boxes, scores, classes, n = boxes[:n][keep], scores[:n][keep], classes[:n][keep], int(keep.sum())
+            summary.append(summarize_detections(scores, classes, n, boxes))
+        return summary
+
+    ours = summaries('proctoring')
+    print(f"{len(frames)} frames")
+    print(f"all classes  {timings['all']:>8.3f} ms/frame")
+    print(f"proctoring   {timings['proctoring']:>8.3f} ms/frame  ({timings['all'] / max(timings['proctoring'], 1e-9):.1f}x)")
+    for label, theirs in (('all, score >= 0.1', summaries('all')),
+                          (f'all, score >= {args.score}', summaries('all', args.score))):
+        agree = sum(flags(a) == flags(b) for a, b in zip(ours, theirs)) / len(ours)
+        print(f"same person count and phone flag as {label}: {agree:.1%}")
+
+
+if __name__ == '__main__':
+    main()
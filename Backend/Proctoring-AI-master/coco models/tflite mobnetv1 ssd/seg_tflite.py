@@ -5,11 +5,17 @@ Created on Tue Aug 18 16:23:16 2020
 @author: hp
 """
 
+import os
+import sys
 import numpy as np
 import tensorflow as tf
 import cv2
 import visualization_utils as vis_util
 
+# nms_per_class lives in ssd_detector at the top of Proctoring-AI-master
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from ssd_detector import nms_per_class
+
 def create_category_index(label_path='coco_ssd_mobilenet/labelmap.txt'):
     """
     To create dictionary of label map
@@ -100,28 +106,17 @@ def apply_nms(output_dict, iou_thresh=0.5, score_thresh=0.6):
             where N2 is the number of valid predictions after those conditions.
 
     """
-    q = 90 # no of classes
+    # Per-class NMS in NumPy over the classes that are present, instead of
+    # combined_non_max_suppression over dense [1, num, 90] tensors
     num = int(output_dict['num_detections'])
-    boxes = np.zeros([1, num, q, 4])
-    scores = np.zeros([1, num, q])
-    # val = [0]*q
-    for i in range(num):
-        # indices = np.where(classes == output_dict['detection_classes'][i])[0][0]
-        boxes[0, i, output_dict['detection_classes'][i], :] = output_dict['detection_boxes'][i]
-        scores[0, i, output_dict['detection_classes'][i]] = output_dict['detection_scores'][i]
-    nmsd = tf.image.combined_non_max_suppression(boxes=boxes,
-                                                 scores=scores,
-                                                 max_output_size_per_class=num,
-                                                 max_total_size=num,
-                                                 iou_threshold=iou_thresh,
-                                                 score_threshold=score_thresh,
-                                                 pad_per_class=False,
-                                                 clip_boxes=False)
-    valid = nmsd.valid_detections[0].numpy()
+    boxes = output_dict['detection_boxes'][:num]
+    classes = output_dict['detection_classes'][:num]
+    scores = output_dict['detection_scores'][:num]
+    keep = nms_per_class(boxes, classes, scores, iou_thresh, score_thresh)
     output_dict = {
-                   'detection_boxes' : nmsd.nmsed_boxes[0].numpy()[:valid],
-                   'detection_classes' : nmsd.nmsed_classes[0].numpy().astype(np.int64)[:valid],
-                   'detection_scores' : nmsd.nmsed_scores[0].numpy()[:valid],
+                   'detection_boxes' : boxes[keep].astype(np.float32),
+                   'detection_classes' : classes[keep].astype(np.int64),
+                   'detection_scores' : scores[keep].astype(np.float32),
                    }
     return output_dict
 
@@ -171,27 +166,28 @@ def make_and_show_inference(img, interpreter, input_details, output_details, cat
     min_score_thresh=score_thresh,
     line_thickness=3)
 
-# Load TFLite model and allocate tensors.
-interpreter = tf.lite.Interpreter(model_path="coco_ssd_mobilenet/detect.tflite")
-interpreter.allocate_tensors()
-
-# Get input and output tensors.
-input_details = interpreter.get_input_details()
-output_details = interpreter.get_output_details()
-
-category_index = create_category_index()
-input_shape = input_details[0]['shape']
-cap = cv2.VideoCapture(0)
-
-while(True):
-    ret, img = cap.read()
-    if ret:
-        make_and_show_inference(img, interpreter, input_details, output_details, category_index)
-        cv2.imshow("image", img)
-        if cv2.waitKey(1) & 0xFF == ord('q'):
+if __name__ == '__main__':
+    # Load TFLite model and allocate tensors.
+    interpreter = tf.lite.Interpreter(model_path="coco_ssd_mobilenet/detect.tflite")
+    interpreter.allocate_tensors()
+
+    # Get input and output tensors.
+    input_details = interpreter.get_input_details()
+    output_details = interpreter.get_output_details()
+
+    category_index = create_category_index()
+    input_shape = input_details[0]['shape']
+    cap = cv2.VideoCapture(0)
+
+    while(True):
+        ret, img = cap.read()
+        if ret:
+            make_and_show_inference(img, interpreter, input_details, output_details, category_index)
+            cv2.imshow("image", img)
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                break
+        else:
             break
-    else:
-        break
-    
-cap.release()
-cv2.destroyAllWindows()
+
+    cap.release()
+    cv2.destroyAllWindows()
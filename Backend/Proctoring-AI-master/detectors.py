@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+Lazily-initialised detectors shared by the proctoring modules.
+
+Nothing is loaded when this module (or any detector module) is imported:
+each model is built on first use and cached for the rest of the process.
+Call warm_up() to load them up front, e.g. when a server starts.
+"""
+
+import threading
+
+_models = {}
+_lock = threading.Lock()
+
+
+def _load_yolo():
+    from person_and_phone import get_yolo
+    return get_yolo()
+
+
+def _load_face():
+    from face_detector import get_face_detector
+    return get_face_detector()
+
+
+def _load_landmarks():
+    from face_landmarks import get_landmark_model
+    return get_landmark_model()
+
+
+FACTORIES = {
+    'face': _load_face,
+    'landmarks': _load_landmarks,
+    'yolo': _load_yolo,
+}
+
+
+def get_model(name):
+    """
+    Get a shared detector, loading it on the first call
+
+    Parameters
+    ----------
+    name : string
+        One of 'face', 'landmarks' or 'yolo'.
+
+    Returns
+    -------
+    model
+        The loaded model. OpenCV dnn nets are not thread-safe, so callers
+        using threads should give each thread its own face detector.
+
+    """
+    model = _models.get(name)
+    if model is None:
+        with _lock:
+            model = _models.get(name)
+            if model is None:
+                model = _models[name] = FACTORIES[name]()
+    return model
+
+
+def get_face_model():
+    """Shared OpenCV dnn face detector"""
+    return get_model('face')
+
+
+def get_landmarks_model():
+    """Shared facial landmark model"""
+    return get_model('landmarks')
+
+
+def warm_up(names=None):
+    """
+    Load detectors ahead of first use
+
+    Parameters
+    ----------
+    names : list of string, optional
+        Detectors to load. The default is all of them.
+
+    Returns
+    -------
+    loaded : dict
+        Whether each detector loaded successfully.
+
+    """
+    loaded = {}
+    for name in names or FACTORIES:
+        try:
+            get_model(name)
+            loaded[name] = True
+        except Exception as e:
+            print(f"Warning: Could not load {name} detector: {e}")
+            loaded[name] = False
+    return loaded
@@ -5,10 +5,13 @@ Created on Thu Jul 30 19:21:18 2020
 @author: hp
 """
 
+from collections import OrderedDict
+
 import cv2
 import numpy as np
-from face_detector import get_face_detector, find_faces
-from face_landmarks import get_landmark_model, detect_marks
+from face_detector import find_faces
+from face_landmarks import detect_marks_batch
+from detectors import get_face_model, get_landmarks_model
 
 def eye_on_mask(mask, side, shape):
     """
@@ -80,20 +83,53 @@ def contouring(thresh, mid, img, end_points, right=False):
             2 for right
             3 for up
 
+    """
+    pupil = find_pupil(thresh)
+    if pupil is None:
+        return None
+    cx, cy, _ = pupil
+    if right:
+        cx += mid
+    cv2.circle(img, (cx, cy), 4, (0, 0, 255), 2)
+    return safe_eyeball_position(end_points, cx, cy)
+
+def find_pupil(thresh):
+    """
+    Find the centroid of the largest contour on a thresholded eye image
+
+    Parameters
+    ----------
+    thresh : Array of uint8
+        Thresholded image of one side containing the eyeball
+
+    Returns
+    -------
+    (cx, cy, confidence) : tuple or None
+        Centroid of the largest contour in thresh coordinates, and the share of
+        the total contour area it covers (1.0 when it is the only blob).
+        None if no usable contour is found.
+
     """
     cnts, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL,cv2.CHAIN_APPROX_NONE)
+    if not cnts:
+        return None
+    areas = [cv2.contourArea(cnt) for cnt in cnts]
+    idx = int(np.argmax(areas))
+    M = cv2.moments(cnts[idx])
+    if M['m00'] == 0:
+        return None
+    cx = int(M['m10']/M['m00'])
+    cy = int(M['m01']/M['m00'])
+    total = sum(areas)
+    confidence = areas[idx] / total if total > 0 else 0.0
+    return cx, cy, confidence
+
+def safe_eyeball_position(end_points, cx, cy):
+    """find_eyeball_position, returning None when the pupil sits on an eye corner"""
     try:
-        cnt = max(cnts, key = cv2.contourArea)
-        M = cv2.moments(cnt)
-        cx = int(M['m10']/M['m00'])
-        cy = int(M['m01']/M['m00'])
-        if right:
-            cx += mid
-        cv2.circle(img, (cx, cy), 4, (0, 0, 255), 2)
-        pos = find_eyeball_position(end_points, cx, cy)
-        return pos
-    except:
-        pass
+        return find_eyeball_position(end_points, cx, cy)
+    except ZeroDivisionError:
+        return None
     
 def process_thresh(thresh):
     """
@@ -149,53 +185,330 @@ def print_eye_pos(img, left, right):
         cv2.putText(img, text, (30, 30), font,  
                    1, (0, 255, 255), 2, cv2.LINE_AA) 
 
-face_model = get_face_detector()
-landmark_model = get_landmark_model()
 left = [36, 37, 38, 39, 40, 41]
 right = [42, 43, 44, 45, 46, 47]
 
-cv2.namedWindow("image")
 kernel = np.ones((9, 9), np.uint8)
 
+POSITIONS = {0: 'center', 1: 'left', 2: 'right', 3: 'up'}
+
+def threshold_eyes(img, shape, threshold=75):
+    """
+    Isolate both eyes of a face and threshold them so the pupils stand out
+
+    Parameters
+    ----------
+    img : Array of uint8
+        BGR image
+    shape : Array of uint32
+        Facial landmarks of the face
+    threshold : int, optional
+        Binary threshold applied to the grayscale eyes. The default is 75.
+
+    Returns
+    -------
+    thresh : Array of uint8
+        Processed thresholded image, same size as img
+    mid : int
+        x coordinate of the mid point between the eyes
+    end_points_left, end_points_right : list
+        Extreme points of each eye
+
+    """
+    mask = np.zeros(img.shape[:2], dtype=np.uint8)
+    mask, end_points_left = eye_on_mask(mask, left, shape)
+    mask, end_points_right = eye_on_mask(mask, right, shape)
+    mask = cv2.dilate(mask, kernel, 5)
+    
+    eyes = cv2.bitwise_and(img, img, mask=mask)
+    mask = (eyes == [0, 0, 0]).all(axis=2)
+    eyes[mask] = [255, 255, 255]
+    mid = int((shape[42][0] + shape[39][0]) // 2)
+    eyes_gray = cv2.cvtColor(eyes, cv2.COLOR_BGR2GRAY)
+    _, thresh = cv2.threshold(eyes_gray, threshold, 255, cv2.THRESH_BINARY)
+    thresh = process_thresh(thresh)
+    return thresh, mid, end_points_left, end_points_right
+
+# How far the eye pipeline reaches beyond the eye polygons: mask dilation (4),
+# erode/dilate/median in process_thresh (2 + 4 + 1) and the contour border (1).
+# A crop with at least this margin thresholds exactly like the full frame.
+EYE_CROP_MARGIN = 16
+# Crop sizes are rounded up to this step so consecutive frames reuse buffers
+EYE_CROP_STEP = 32
+
+class EyeBuffers:
+    """
+    Reusable working images for threshold_eyes_crop, keyed by crop size.
+
+    Parameters
+    ----------
+    max_sizes : int, optional
+        Number of crop sizes to keep buffers for. The default is 4.
+
+    """
+
+    def __init__(self, max_sizes=4):
+        self.max_sizes = max_sizes
+        self._buffers = OrderedDict()
+
+    def get(self, h, w):
+        key = (h, w)
+        if key in self._buffers:
+            self._buffers.move_to_end(key)
+            return self._buffers[key]
+        buffers = {
+            'mask': np.empty((h, w), dtype=np.uint8),
+            'dilated': np.empty((h, w), dtype=np.uint8),
+            'eyes': np.empty((h, w, 3), dtype=np.uint8),
+            'black': np.empty((h, w), dtype=np.uint8),
+            'gray': np.empty((h, w), dtype=np.uint8),
+            'thresh': np.empty((h, w), dtype=np.uint8),
+            'tmp': np.empty((h, w), dtype=np.uint8),
+        }
+        self._buffers[key] = buffers
+        if len(self._buffers) > self.max_sizes:
+            self._buffers.popitem(last=False)
+        return buffers
+
+def eye_crop_box(shape, img_shape, margin=EYE_CROP_MARGIN, step=EYE_CROP_STEP):
+    """Bounding box (x0, y0, x1, y1) around landmarks 36-47 plus margin, clipped to the image"""
+    pts = np.asarray(shape[36:48], dtype=np.int64)
+    h, w = img_shape[:2]
+    x0 = max(0, int(pts[:, 0].min()) - margin)
+    y0 = max(0, int(pts[:, 1].min()) - margin)
+    x1 = int(pts[:, 0].max()) + margin + 1
+    y1 = int(pts[:, 1].max()) + margin + 1
+    x1 = min(w, x0 + -(-(x1 - x0) // step) * step)
+    y1 = min(h, y0 + -(-(y1 - y0) // step) * step)
+    return x0, y0, x1, y1
+
+def threshold_eyes_crop(img, shape, threshold=75, buffers=None):
+    """
+    threshold_eyes restricted to a tight crop around the eye landmarks
+
+    Produces the same thresholded pixels as threshold_eyes inside the crop
+    (everything outside it is blank in the full-frame version), while only
+    touching the crop and reusing preallocated buffers.
+
+    Parameters
+    ----------
+    img : Array of uint8
+        BGR image
+    shape : Array of uint32
+        Facial landmarks of the face
+    threshold : int, optional
+        Binary threshold applied to the grayscale eyes. The default is 75.
+    buffers : EyeBuffers, optional
+        Buffers to reuse across calls. The returned thresh is one of them,
+        so it is only valid until the next call with the same buffers.
+
+    Returns
+    -------
+    thresh : Array of uint8
+        Processed thresholded crop
+    origin : tuple
+        (x0, y0) of the crop in the image
+    mid : int
+        x coordinate of the mid point between the eyes, in crop coordinates
+    end_points_left, end_points_right : list
+        Extreme points of each eye, in crop coordinates
+    None is returned if the landmarks do not give a usable crop.
+
+    """
+    x0, y0, x1, y1 = eye_crop_box(shape, img.shape)
+    mid = int((shape[42][0] + shape[39][0]) // 2) - x0
+    if x1 <= x0 or y1 <= y0 or not 0 < mid < x1 - x0:
+        return None
+
+    b = (buffers or EyeBuffers()).get(y1 - y0, x1 - x0)
+    local = np.asarray(shape, dtype=np.int64) - (x0, y0)
+
+    b['mask'].fill(0)
+    _, end_points_left = eye_on_mask(b['mask'], left, local)
+    _, end_points_right = eye_on_mask(b['mask'], right, local)
+    cv2.dilate(b['mask'], kernel, dst=b['dilated'])
+
+    crop = img[y0:y1, x0:x1]
+    # bitwise_and leaves unmasked dst pixels untouched, so clear the reused buffer
+    b['eyes'].fill(0)
+    cv2.bitwise_and(crop, crop, dst=b['eyes'], mask=b['dilated'])
+    # Black pixels become white: OR-ing 255 into their gray value is equivalent
+    cv2.inRange(b['eyes'], (0, 0, 0), (0, 0, 0), dst=b['black'])
+    cv2.cvtColor(b['eyes'], cv2.COLOR_BGR2GRAY, dst=b['gray'])
+    cv2.bitwise_or(b['gray'], b['black'], dst=b['gray'])
+    cv2.threshold(b['gray'], threshold, 255, cv2.THRESH_BINARY, dst=b['thresh'])
+
+    # process_thresh, in place
+    cv2.erode(b['thresh'], None, dst=b['tmp'], iterations=2)
+    cv2.dilate(b['tmp'], None, dst=b['thresh'], iterations=4)
+    cv2.medianBlur(b['thresh'], 3, dst=b['tmp'])
+    cv2.bitwise_not(b['tmp'], dst=b['thresh'])
+    return b['thresh'], (x0, y0), mid, end_points_left, end_points_right
+
+def eye_result(thresh, offset, end_points, origin=(0, 0)):
+    """Position, pupil centroid (image coordinates) and confidence of one eye"""
+    pupil = find_pupil(thresh)
+    if pupil is None:
+        return {'position': None, 'pupil': None, 'confidence': 0.0}
+    cx, cy, confidence = pupil
+    cx += offset
+    pos = safe_eyeball_position(end_points, cx, cy)
+    return {
+        'position': POSITIONS.get(pos),
+        'pupil': [int(cx + origin[0]), int(cy + origin[1])],
+        'confidence': round(float(confidence), 3) if pos is not None else 0.0,
+    }
+
+def gaze_for_face(img, shape, threshold=75, buffers=None, crop=True):
+    """
+    Estimate where the eyes of one face are looking, without drawing anything
+
+    Parameters
+    ----------
+    img : Array of uint8
+        BGR image
+    shape : Array of uint32
+        Facial landmarks of the face
+    threshold : int, optional
+        Binary threshold for the pupils. The default is 75.
+    buffers : EyeBuffers, optional
+        Buffers reused by the crop-local path.
+    crop : bool, optional
+        Work on a crop around the eyes instead of the full frame. Both give
+        the same result; the full-frame path is kept as a reference. The
+        default is True.
+
+    Returns
+    -------
+    result : dict
+        'left_eye' and 'right_eye' with position ('left', 'right', 'up',
+        'center' or None), pupil centroid and confidence; 'gaze', which is the
+        shared direction when both eyes agree on one (else 'center', or None
+        if an eye could not be read); and the mean 'confidence'.
+    thresh : Array of uint8
+        The thresholded eye image (the crop when crop is True), useful for
+        display or debugging
+
+    """
+    prepared = threshold_eyes_crop(img, shape, threshold, buffers) if crop else None
+    if prepared is None:
+        thresh, mid, end_points_left, end_points_right = threshold_eyes(img, shape, threshold)
+        origin = (0, 0)
+    else:
+        thresh, origin, mid, end_points_left, end_points_right = prepared
+    left_eye = eye_result(thresh[:, 0:mid], 0, end_points_left, origin)
+    right_eye = eye_result(thresh[:, mid:], mid, end_points_right, origin)
+
+    if left_eye['position'] is None or right_eye['position'] is None:
+        gaze = None
+    elif left_eye['position'] == right_eye['position']:
+        gaze = left_eye['position']
+    else:
+        gaze = 'center'
+
+    result = {
+        'left_eye': left_eye,
+        'right_eye': right_eye,
+        'gaze': gaze,
+        'confidence': round((left_eye['confidence'] + right_eye['confidence']) / 2, 3),
+    }
+    return result, thresh
+
+class EyeTracker:
+    """
+    Headless gaze estimation for single frames.
+
+    Takes a BGR frame plus face boxes and returns structured results; it never
+    opens windows, draws or prints, so it can run on servers without a display.
+
+    Parameters
+    ----------
+    landmark_model : Tensorflow model, optional
+        Facial landmark model. The default is the shared model from detectors.
+    threshold : int, optional
+        Binary threshold for the pupils. The default is 75.
+
+    """
+
+    def __init__(self, landmark_model=None, threshold=75):
+        self.landmark_model = landmark_model
+        self.threshold = threshold
+        # Not thread-safe: use one tracker per thread
+        self.buffers = EyeBuffers()
+
+    def analyze(self, img, faces, threshold=None):
+        """
+        Parameters
+        ----------
+        img : Array of uint8
+            BGR image
+        faces : list
+            Face boxes (x, y, x1, y1)
+        threshold : int, optional
+            Overrides the tracker threshold for this call
+
+        Returns
+        -------
+        results : list of dict
+            One gaze_for_face result per face, with the face box under 'face'
+
+        """
+        if self.landmark_model is None:
+            self.landmark_model = get_landmarks_model()
+        threshold = self.threshold if threshold is None else threshold
+
+        results = []
+        shapes = detect_marks_batch(img, self.landmark_model, faces)
+        for face, shape in zip(faces, shapes):
+            result, _ = gaze_for_face(img, shape, threshold, self.buffers)
+            result['face'] = [int(v) for v in face]
+            results.append(result)
+        return results
+
 def nothing(x):
     pass
 
-cv2.createTrackbar("threshold", "image", 75, 255, nothing)
+def track_eye(video_path=0):
+    """
+    Interactive eye tracking on a video file or camera, with a threshold trackbar
+
+    Parameters
+    ----------
+    video_path : string or int, optional
+        Video file or camera index. The default is 0 (webcam).
 
-def track_eye(video_path=None):
+    Returns
+    -------
+    None.
 
-    video_path = ""
+    """
+    face_model = get_face_model()
+    landmark_model = get_landmarks_model()
+    # GUI setup happens here, not at import, so headless servers can import this module
+    cv2.namedWindow("image")
+    cv2.createTrackbar("threshold", "image", 75, 255, nothing)
 
+    codes = {v: k for k, v in POSITIONS.items()}
+    buffers = EyeBuffers()
     cap = cv2.VideoCapture(video_path)
     ret, img = cap.read()
     thresh = img.copy()
 
     while(True):
         ret, img = cap.read()
-        rects = find_faces(img, face_model)
-
         if not ret:
             break
-        
-        for rect in rects:
-            shape = detect_marks(img, landmark_model, rect)
-            mask = np.zeros(img.shape[:2], dtype=np.uint8)
-            mask, end_points_left = eye_on_mask(mask, left, shape)
-            mask, end_points_right = eye_on_mask(mask, right, shape)
-            mask = cv2.dilate(mask, kernel, 5)
-            
-            eyes = cv2.bitwise_and(img, img, mask=mask)
-            mask = (eyes == [0, 0, 0]).all(axis=2)
-            eyes[mask] = [255, 255, 255]
-            mid = int((shape[42][0] + shape[39][0]) // 2)
-            eyes_gray = cv2.cvtColor(eyes, cv2.COLOR_BGR2GRAY)
+
+        rects = find_faces(img, face_model)
+        for shape in detect_marks_batch(img, landmark_model, rects):
             threshold = cv2.getTrackbarPos('threshold', 'image')
-            _, thresh = cv2.threshold(eyes_gray, threshold, 255, cv2.THRESH_BINARY)
-            thresh = process_thresh(thresh)
-            
-            eyeball_pos_left = contouring(thresh[:, 0:mid], mid, img, end_points_left)
-            eyeball_pos_right = contouring(thresh[:, mid:], mid, img, end_points_right, True)
-            print_eye_pos(img, eyeball_pos_left, eyeball_pos_right)
+            result, thresh = gaze_for_face(img, shape, threshold, buffers)
+
+            for eye in (result['left_eye'], result['right_eye']):
+                if eye['pupil'] is not None:
+                    cv2.circle(img, tuple(eye['pupil']), 4, (0, 0, 255), 2)
+            print_eye_pos(img, codes.get(result['left_eye']['position']),
+                          codes.get(result['right_eye']['position']))
             # for (x, y) in shape[36:48]:
             #     cv2.circle(img, (x, y), 2, (255, 0, 0), -1)
             
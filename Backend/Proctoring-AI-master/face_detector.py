@@ -5,9 +5,12 @@ Created on Wed Jul 29 17:52:00 2020
 @author: hp
 """
 
+import os
 import cv2
 import numpy as np
 
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
 def get_face_detector(modelFile=None,
                       configFile=None,
                       quantized=False):
@@ -17,9 +20,9 @@ def get_face_detector(modelFile=None,
     Parameters
     ----------
     modelFile : string, optional
-        Path to model file. The default is "models/res10_300x300_ssd_iter_140000.caffemodel" or models/opencv_face_detector_uint8.pb" based on quantization.
+        Path to model file. The default is "models/res10_300x300_ssd_iter_140000.caffemodel" or models/opencv_face_detector_uint8.pb" based on quantization, relative to this file.
     configFile : string, optional
-        Path to config file. The default is "models/deploy.prototxt" or "models/opencv_face_detector.pbtxt" based on quantization.
+        Path to config file. The default is "models/deploy.prototxt" or "models/opencv_face_detector.pbtxt" based on quantization, relative to this file.
     quantization: bool, optional
         Determines whether to use quantized tf model or unquantized caffe model. The default is False.
     
@@ -30,20 +33,47 @@ def get_face_detector(modelFile=None,
     """
     if quantized:
         if modelFile == None:
-            modelFile = "models/opencv_face_detector_uint8.pb"
+            modelFile = os.path.join(BASE_DIR, "models/opencv_face_detector_uint8.pb")
         if configFile == None:
-            configFile = "models/opencv_face_detector.pbtxt"
+            configFile = os.path.join(BASE_DIR, "models/opencv_face_detector.pbtxt")
         model = cv2.dnn.readNetFromTensorflow(modelFile, configFile)
         
     else:
         if modelFile == None:
-            modelFile = "models/res10_300x300_ssd_iter_140000.caffemodel"
+            modelFile = os.path.join(BASE_DIR, "models/res10_300x300_ssd_iter_140000.caffemodel")
         if configFile == None:
-            configFile = "models/deploy.prototxt"
+            configFile = os.path.join(BASE_DIR, "models/deploy.prototxt")
         model = cv2.dnn.readNetFromCaffe(configFile, modelFile)
     return model
 
-def find_faces(img, model):
+def faces_from_detections(detections, img_shape, conf_threshold=0.5):
+    """
+    Convert raw SSD detections into pixel face boxes
+
+    Parameters
+    ----------
+    detections : np.float32
+        Detections of one image, shape (K, 7): image id, class, confidence,
+        then x, y, x1, y1 normalised to [0, 1]
+    img_shape : tuple
+        Shape of the image the detections belong to
+    conf_threshold : float, optional
+        Minimum confidence of a face. The default is 0.5.
+
+    Returns
+    -------
+    faces : np.int64
+        Array of shape (N, 4) with (x, y, x1, y1) of each face, clipped to the image
+
+    """
+    h, w = img_shape[:2]
+    keep = detections[:, 2] > conf_threshold
+    faces = (detections[keep, 3:7] * np.array([w, h, w, h])).astype(np.int64)
+    np.clip(faces[:, 0::2], 0, w, out=faces[:, 0::2])
+    np.clip(faces[:, 1::2], 0, h, out=faces[:, 1::2])
+    return faces
+
+def find_faces(img, model, conf_threshold=0.5):
     """
     Find the faces in an image
     
@@ -53,26 +83,50 @@ def find_faces(img, model):
         Image to find faces from
     model : dnn_Net
         Face detection model
+    conf_threshold : float, optional
+        Minimum confidence of a face. The default is 0.5.
 
     Returns
     -------
-    faces : list
-        List of coordinates of the faces detected in the image
+    faces : np.int64
+        Array of shape (N, 4) with the coordinates (x, y, x1, y1) of the faces
+        detected in the image
 
     """
-    h, w = img.shape[:2]
-    blob = cv2.dnn.blobFromImage(cv2.resize(img, (300, 300)), 1.0,
-	(300, 300), (104.0, 177.0, 123.0))
+    # blobFromImage does the resize to 300x300 itself
+    blob = cv2.dnn.blobFromImage(img, 1.0, (300, 300), (104.0, 177.0, 123.0))
     model.setInput(blob)
     res = model.forward()
-    faces = []
-    for i in range(res.shape[2]):
-        confidence = res[0, 0, i, 2]
-        if confidence > 0.5:
-            box = res[0, 0, i, 3:7] * np.array([w, h, w, h])
-            (x, y, x1, y1) = box.astype("int")
-            faces.append([x, y, x1, y1])
-    return faces
+    return faces_from_detections(res[0, 0], img.shape, conf_threshold)
+
+def find_faces_batch(imgs, model, conf_threshold=0.5):
+    """
+    Find the faces in several images with a single forward pass
+
+    Parameters
+    ----------
+    imgs : list of np.uint8
+        Images to find faces from
+    model : dnn_Net
+        Face detection model
+    conf_threshold : float, optional
+        Minimum confidence of a face. The default is 0.5.
+
+    Returns
+    -------
+    faces : list of np.int64
+        One (N, 4) array of face coordinates per image, as in find_faces
+
+    """
+    if len(imgs) == 0:
+        return []
+    blob = cv2.dnn.blobFromImages(imgs, 1.0, (300, 300), (104.0, 177.0, 123.0))
+    model.setInput(blob)
+    res = model.forward()[0, 0]
+    # Column 0 of every detection is the index of the image it belongs to
+    image_ids = res[:, 0].astype(np.int64)
+    return [faces_from_detections(res[image_ids == i], img.shape, conf_threshold)
+            for i, img in enumerate(imgs)]
 
 def draw_faces(img, faces):
     """
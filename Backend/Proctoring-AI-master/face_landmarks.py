@@ -5,13 +5,17 @@ Created on Wed Jul 29 19:47:08 2020
 @author: hp
 """
 
+import os
 import cv2
 import numpy as np
-import tensorflow as tf
-from tensorflow import keras
 
+# TensorFlow is imported inside the functions that need it, so importing this
+# module (and the detectors built on it) stays cheap.
 
-def get_landmark_model(saved_model='models/pose_model'):
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def get_landmark_model(saved_model=os.path.join(BASE_DIR, 'models', 'pose_model')):
     """
     Get the facial landmark model. 
     Original repository: https://github.com/yinguobing/cnn-facial-landmark
@@ -19,7 +23,7 @@ def get_landmark_model(saved_model='models/pose_model'):
     Parameters
     ----------
     saved_model : string, optional
-        Path to facial landmarks model. The default is 'models/pose_model'.
+        Path to facial landmarks model. The default is 'models/pose_model' next to this file.
 
     Returns
     -------
@@ -27,6 +31,7 @@ def get_landmark_model(saved_model='models/pose_model'):
         Facial landmarks model
 
     """
+    import tensorflow as tf
     #model = keras.models.load_model(saved_model)
     model = tf.saved_model.load(saved_model)
     return model
@@ -71,6 +76,101 @@ def move_box(box, offset):
         bottom_y = box[3] + offset[1]
         return [left_x, top_y, right_x, bottom_y]
 
+def get_face_boxes(faces, img_shape):
+    """
+    Vectorized version of the box preparation in detect_marks: shift each face
+    box down by 10% of its height, make it square and clip it to the image.
+
+    Parameters
+    ----------
+    faces : list or numpy array
+        Face coordinates (x, y, x1, y1), shape (N, 4)
+    img_shape : tuple
+        Shape of the image the faces were found in
+
+    Returns
+    -------
+    boxes : numpy array
+        Square face boxes (x, y, x1, y1) clipped to the image, shape (N, 4)
+
+    """
+    boxes = np.array(faces, dtype=np.int64).reshape(-1, 4)
+    offset_y = np.abs((boxes[:, 3] - boxes[:, 1]) * 0.1).astype(np.int64)
+    boxes[:, 1] += offset_y
+    boxes[:, 3] += offset_y
+
+    diff = (boxes[:, 3] - boxes[:, 1]) - (boxes[:, 2] - boxes[:, 0])
+    delta = np.abs(diff) // 2
+    odd = diff % 2 == 1
+    slim = diff > 0                 # Height > width
+    short = diff < 0                # Width > height
+    boxes[slim, 0] -= delta[slim]
+    boxes[slim, 2] += delta[slim] + odd[slim]
+    boxes[short, 1] -= delta[short]
+    boxes[short, 3] += delta[short] + odd[short]
+
+    h, w = img_shape[:2]
+    boxes[:, 0:2] = np.maximum(boxes[:, 0:2], 0)
+    boxes[:, 2] = np.minimum(boxes[:, 2], w)
+    boxes[:, 3] = np.minimum(boxes[:, 3], h)
+    return boxes
+
+def detect_marks_batch(img_or_imgs, model, faces):
+    """
+    Find the facial landmarks of many faces with a single model call
+
+    Parameters
+    ----------
+    img_or_imgs : np.uint8 or list of np.uint8
+        One image, or a list of images
+    model : Tensorflow model
+        Loaded facial landmark model
+    faces : list
+        For one image, a list of face coordinates (x, y, x1, y1). For a list
+        of images, one such list per image.
+
+    Returns
+    -------
+    marks : list
+        For one image, a list with the landmarks (68, 2) of each face. For a
+        list of images, one such list per image.
+
+    """
+    import tensorflow as tf
+
+    single = isinstance(img_or_imgs, np.ndarray)
+    imgs = [img_or_imgs] if single else list(img_or_imgs)
+    faces_per_img = [faces] if single else list(faces)
+
+    boxes = [get_face_boxes(f, img.shape) for img, f in zip(imgs, faces_per_img)]
+    counts = [len(b) for b in boxes]
+    total = sum(counts)
+    if total == 0:
+        return [] if single else [[] for _ in imgs]
+
+    # All face crops in one contiguous uint8 RGB tensor
+    batch = np.empty((total, 128, 128, 3), dtype=np.uint8)
+    i = 0
+    for img, img_boxes in zip(imgs, boxes):
+        for x, y, x1, y1 in img_boxes:
+            face_img = cv2.resize(img[y: y1, x: x1], (128, 128))
+            cv2.cvtColor(face_img, cv2.COLOR_BGR2RGB, dst=batch[i])
+            i += 1
+
+    # # Actual detection.
+    predictions = model.signatures["predict"](tf.constant(batch, dtype=tf.uint8))
+
+    # Convert predictions to landmarks, in image coordinates.
+    all_boxes = np.concatenate(boxes)
+    marks = np.array(predictions['output']).reshape(total, -1)[:, :136].reshape(total, 68, 2)
+    marks *= (all_boxes[:, 2] - all_boxes[:, 0]).astype(marks.dtype)[:, None, None]
+    marks += all_boxes[:, None, 0:2].astype(marks.dtype)
+    marks = marks.astype(np.uint)
+
+    split = np.split(marks, np.cumsum(counts)[:-1])
+    results = [list(m) for m in split]
+    return results[0] if single else results
+
 def detect_marks(img, model, face):
     """
     Find the facial landmarks in an image from the faces
@@ -90,40 +190,7 @@ def detect_marks(img, model, face):
         facial landmark points
 
     """
-
-    offset_y = int(abs((face[3] - face[1]) * 0.1))
-    box_moved = move_box(face, [0, offset_y])
-    facebox = get_square_box(box_moved)
-    
-    h, w = img.shape[:2]
-    if facebox[0] < 0:
-        facebox[0] = 0
-    if facebox[1] < 0:
-        facebox[1] = 0
-    if facebox[2] > w:
-        facebox[2] = w
-    if facebox[3] > h:
-        facebox[3] = h
-    
-    face_img = img[facebox[1]: facebox[3],
-                     facebox[0]: facebox[2]]
-    face_img = cv2.resize(face_img, (128, 128))
-    face_img = cv2.cvtColor(face_img, cv2.COLOR_BGR2RGB)
-    
-    # # Actual detection.
-    predictions = model.signatures["predict"](
-        tf.constant([face_img], dtype=tf.uint8))
-
-    # Convert predictions to landmarks.
-    marks = np.array(predictions['output']).flatten()[:136]
-    marks = np.reshape(marks, (-1, 2))
-    
-    marks *= (facebox[2] - facebox[0])
-    marks[:, 0] += facebox[0]
-    marks[:, 1] += facebox[1]
-    marks = marks.astype(np.uint)
-
-    return marks
+    return detect_marks_batch(img, model, [face])[0]
 
 def draw_marks(image, marks, color=(0, 255, 0)):
     """
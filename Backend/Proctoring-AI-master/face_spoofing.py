@@ -1,7 +1,8 @@
+import os
 import numpy as np
 import cv2
-from sklearn.externals import joblib
-from face_detector import get_face_detector, find_faces
+from face_detector import find_faces
+from detectors import get_face_model
 
 def calc_hist(img):
     """
@@ -25,61 +26,102 @@ def calc_hist(img):
         histogram[j] = histr
     return np.array(histogram)
 
-face_model = get_face_detector()
-clf = joblib.load('models/face_spoofing.pkl')
-cap = cv2.VideoCapture(0)
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+_clf = None
 
-sample_number = 1
-count = 0
-measures = np.zeros(sample_number, dtype=np.float)
+def get_spoofing_classifier(model_path=os.path.join(BASE_DIR, 'models', 'face_spoofing.pkl')):
+    """
+    Load the face spoofing classifier on first use
+
+    Parameters
+    ----------
+    model_path : string, optional
+        Path to the pickled classifier. The default is 'models/face_spoofing.pkl' next to this file.
 
-while True:
-    ret, img = cap.read()
-    faces = find_faces(img, face_model)
+    Returns
+    -------
+    clf : sklearn classifier
+        Classifier predicting the probability that a face is spoofed
 
-    measures[count%sample_number]=0
-    height, width = img.shape[:2]
-    for x, y, x1, y1 in faces:
+    """
+    global _clf
+    if _clf is None:
+        import joblib
+        _clf = joblib.load(model_path)
+    return _clf
+
+def detect_spoofing(video_path=0):
+    """
+    Run spoof detection on a video or webcam and display the results
+
+    Parameters
+    ----------
+    video_path : string or int, optional
+        Video file or camera index. The default is 0 (webcam).
+
+    Returns
+    -------
+    None.
+
+    """
+    face_model = get_face_model()
+    clf = get_spoofing_classifier()
+    cap = cv2.VideoCapture(video_path)
+
+    sample_number = 1
+    count = 0
+    measures = np.zeros(sample_number, dtype=float)
+
+    while True:
+        ret, img = cap.read()
+        faces = find_faces(img, face_model)
+
+        measures[count%sample_number]=0
+        height, width = img.shape[:2]
+        for x, y, x1, y1 in faces:
         
-        roi = img[y:y1, x:x1]
-        point = (0,0)
+            roi = img[y:y1, x:x1]
+            point = (0,0)
         
-        img_ycrcb = cv2.cvtColor(roi, cv2.COLOR_BGR2YCR_CB)
-        img_luv = cv2.cvtColor(roi, cv2.COLOR_BGR2LUV)
+            img_ycrcb = cv2.cvtColor(roi, cv2.COLOR_BGR2YCR_CB)
+            img_luv = cv2.cvtColor(roi, cv2.COLOR_BGR2LUV)
 
-        ycrcb_hist = calc_hist(img_ycrcb)
-        luv_hist = calc_hist(img_luv)
+            ycrcb_hist = calc_hist(img_ycrcb)
+            luv_hist = calc_hist(img_luv)
 
-        feature_vector = np.append(ycrcb_hist.ravel(), luv_hist.ravel())
-        feature_vector = feature_vector.reshape(1, len(feature_vector))
+            feature_vector = np.append(ycrcb_hist.ravel(), luv_hist.ravel())
+            feature_vector = feature_vector.reshape(1, len(feature_vector))
 
-        prediction = clf.predict_proba(feature_vector)
-        prob = prediction[0][1]
+            prediction = clf.predict_proba(feature_vector)
+            prob = prediction[0][1]
 
-        measures[count % sample_number] = prob
+            measures[count % sample_number] = prob
 
-        cv2.rectangle(img, (x, y), (x1, y1), (255, 0, 0), 2)
+            cv2.rectangle(img, (x, y), (x1, y1), (255, 0, 0), 2)
 
-        point = (x, y-5)
+            point = (x, y-5)
 
-        # print (measures, np.mean(measures))
-        if 0 not in measures:
-            text = "True"
-            if np.mean(measures) >= 0.7:
-                text = "False"
-                font = cv2.FONT_HERSHEY_SIMPLEX
-                cv2.putText(img=img, text=text, org=point, fontFace=font, fontScale=0.9, color=(0, 0, 255),
-                            thickness=2, lineType=cv2.LINE_AA)
-            else:
-                font = cv2.FONT_HERSHEY_SIMPLEX
-                cv2.putText(img=img, text=text, org=point, fontFace=font, fontScale=0.9,
-                            color=(0, 255, 0), thickness=2, lineType=cv2.LINE_AA)
+            # print (measures, np.mean(measures))
+            if 0 not in measures:
+                text = "True"
+                if np.mean(measures) >= 0.7:
+                    text = "False"
+                    font = cv2.FONT_HERSHEY_SIMPLEX
+                    cv2.putText(img=img, text=text, org=point, fontFace=font, fontScale=0.9, color=(0, 0, 255),
+                                thickness=2, lineType=cv2.LINE_AA)
+                else:
+                    font = cv2.FONT_HERSHEY_SIMPLEX
+                    cv2.putText(img=img, text=text, org=point, fontFace=font, fontScale=0.9,
+                                color=(0, 255, 0), thickness=2, lineType=cv2.LINE_AA)
         
-    count+=1
-    cv2.imshow('img_rgb', img)
+        count+=1
+        cv2.imshow('img_rgb', img)
     
-    if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
+        if cv2.waitKey(1) & 0xFF == ord('q'):
+                break
+
+    cap.release()
+    cv2.destroyAllWindows()
 
-cap.release()
-cv2.destroyAllWindows()
+if __name__ == '__main__':
+    detect_spoofing()
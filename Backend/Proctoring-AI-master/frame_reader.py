@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+Background video decoding.
+
+FrameReader decodes a video on its own thread into a bounded queue, so
+decoding overlaps with whatever the caller does with the previous frames.
+OpenCV releases the GIL while decoding, so this works with plain threads.
+"""
+
+import queue
+import threading
+import time
+
+import cv2
+from frame_sampling import make_sampler, sampled_frames
+
+_END = object()
+
+
+class StageStats:
+    """Count, total and worst latency of one pipeline stage, in milliseconds"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, ms):
+        with self._lock:
+            self.count += 1
+            self.total_ms += ms
+            self.max_ms = max(self.max_ms, ms)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'count': self.count,
+                'avg_ms': round(self.total_ms / self.count, 2) if self.count else None,
+                'max_ms': round(self.max_ms, 2),
+            }
+
+
+class FrameReader:
+    """
+    Decode a video on a background thread
+
+    Iterating yields (index, timestamp, img) for the frames the sampler keeps.
+    read() and release() mirror cv2.VideoCapture, so the interactive tools can
+    use a FrameReader in place of a capture.
+
+    Parameters
+    ----------
+    video_path : string or int
+        Video file, URL or camera index
+    max_queue : int, optional
+        Decoded frames buffered ahead of the consumer. The default is 8.
+    sampling : string or Sampler, optional
+        Which frames to decode, see frame_sampling.make_sampler. The default
+        is every frame.
+
+    """
+
+    def __init__(self, video_path, max_queue=8, sampling=None):
+        self.cap = cv2.VideoCapture(video_path)
+        if not self.cap.isOpened():
+            raise IOError(f"Could not open video {video_path}")
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 0.0
+        self.total = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        self.sampler = make_sampler(sampling)
+        self.sampler.reset(self.fps)
+        # Frames read so far, including the ones the sampler skipped
+        self.frames = 0
+        self.decode = StageStats()
+
+        self._queue = queue.Queue(max(1, max_queue))
+        self._stop = threading.Event()
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name='frame-reader', daemon=True)
+        self._thread.start()
+
+    def _put(self, item):
+        # Give up if the consumer went away, instead of blocking forever
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self):
+        try:
+            frames = sampled_frames(self.cap, self.sampler, self.fps)
+            while not self._stop.is_set():
+                start = time.perf_counter()
+                item = next(frames, None)
+                if item is None:
+                    break
+                self.frames = item[0] + 1
+                if item[2] is None:
+                    continue
+                self.decode.add((time.perf_counter() - start) * 1000)
+                if not self._put(item):
+                    break
+        except Exception as e:
+            self._error = e
+        finally:
+            self.cap.release()
+            self._put(_END)
+
+    def __iter__(self):
+        while True:
+            item = self._queue.get()
+            if item is _END:
+                # Let later calls see the end too
+                self._queue.put(_END)
+                if self._error is not None:
+                    raise self._error
+                return
+            yield item
+
+    def read(self):
+        """Next frame as (ret, img), like cv2.VideoCapture.read"""
+        item = next(iter(self), None)
+        if item is None:
+            return False, None
+        return True, item[2]
+
+    def release(self):
+        self._stop.set()
+        self._thread.join()
+
+    def stats(self):
+        return {
+            'frames': self.frames,
+            'queued': self._queue.qsize(),
+            'decode': self.decode.to_dict(),
+        }
@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+"""
+Frame sampling policies for offline video analysis.
+
+A 30fps recording does not need 30 detector passes per second of footage.
+A sampler decides which decoded frames go through the models; the frames it
+skips get the results of the nearest analyzed frame when the timeline is
+filled back in, and the policy is recorded next to the results.
+
+Policies, as accepted by make_sampler:
+    all            every frame
+    stride:N       every Nth frame
+    fps:F          about F frames per second of video
+    change[:D[:H]] frames that differ from the last analyzed one, by a mean
+                   absolute gray difference above D (default 4.0) or a
+                   histogram correlation below H (default 0.98)
+"""
+
+import copy
+
+import cv2
+import numpy as np
+
+
+class Sampler:
+    """
+    Analyze every frame. Base class of the other samplers.
+
+    needs_image is False when the decision only depends on the frame index,
+    which lets the caller skip decoding frames it will not analyze.
+    fill is how skipped frames are filled in: 'nearest' analyzed frame, or
+    the 'previous' one when skipped frames are known to look like it.
+    """
+
+    name = 'all'
+    needs_image = False
+    fill = 'nearest'
+
+    def reset(self, fps):
+        """Start a new video with the given frame rate (0 if unknown)"""
+        self.fps = fps
+
+    def should_process(self, index, img=None):
+        return True
+
+    def policy(self):
+        return {'name': self.name}
+
+
+class StrideSampler(Sampler):
+    """Analyze every stride-th frame"""
+
+    name = 'stride'
+
+    def __init__(self, stride=2):
+        self.stride = max(1, int(stride))
+
+    def should_process(self, index, img=None):
+        return index % self.stride == 0
+
+    def policy(self):
+        return {'name': self.name, 'stride': self.stride}
+
+
+class FpsSampler(Sampler):
+    """Analyze about target_fps frames per second of video"""
+
+    name = 'fps'
+
+    def __init__(self, target_fps=5.0):
+        self.target_fps = float(target_fps)
+        if self.target_fps <= 0:
+            raise ValueError(f"fps sampling needs a positive rate, not {target_fps}")
+
+    def reset(self, fps):
+        super().reset(fps)
+        self._next = 0.0
+        # Unknown or lower source rate: analyze everything
+        self._step = fps / self.target_fps if fps and fps > self.target_fps else 1.0
+
+    def should_process(self, index, img=None):
+        if index + 1e-6 >= self._next:
+            self._next += self._step
+            return True
+        return False
+
+    def policy(self):
+        return {'name': self.name, 'target_fps': self.target_fps,
+                'source_fps': self.fps, 'stride': round(self._step, 3)}
+
+
+class ChangeSampler(Sampler):
+    """
+    Analyze frames that changed since the last analyzed frame
+
+    Frames are compared on a small grayscale thumbnail: mean absolute pixel
+    difference and the correlation of 32-bin histograms. A frame is analyzed
+    when either shows a change, or at least every max_gap frames.
+
+    Parameters
+    ----------
+    diff_threshold : float, optional
+        Mean absolute difference (0-255) counted as a change. The default is 4.0.
+    hist_threshold : float, optional
+        Histogram correlation below which the frame counts as changed. The
+        default is 0.98.
+    max_gap : int, optional
+        Most frames skipped in a row. The default is 30.
+    size : tuple, optional
+        Thumbnail (width, height) used for the comparison. The default is (64, 48).
+
+    """
+
+    name = 'change'
+    needs_image = True
+    fill = 'previous'
+
+    def __init__(self, diff_threshold=4.0, hist_threshold=0.98, max_gap=30, size=(64, 48)):
+        self.diff_threshold = float(diff_threshold)
+        self.hist_threshold = float(hist_threshold)
+        self.max_gap = max(1, int(max_gap))
+        self.size = size
+
+    def reset(self, fps):
+        super().reset(fps)
+        self._ref = None
+        self._ref_hist = None
+        self._ref_index = 0
+
+    def should_process(self, index, img=None):
+        small = cv2.resize(img, self.size, interpolation=cv2.INTER_AREA)
+        small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        hist = cv2.calcHist([small], [0], None, [32], [0, 256])
+        changed = (
+            self._ref is None
+            or index - self._ref_index >= self.max_gap
+            or float(cv2.absdiff(small, self._ref).mean()) > self.diff_threshold
+            or cv2.compareHist(hist, self._ref_hist, cv2.HISTCMP_CORREL) < self.hist_threshold
+        )
+        if changed:
+            self._ref, self._ref_hist, self._ref_index = small, hist, index
+        return changed
+
+    def policy(self):
+        return {'name': self.name, 'diff_threshold': self.diff_threshold,
+                'hist_threshold': self.hist_threshold, 'max_gap': self.max_gap}
+
+
+SAMPLERS = {
+    'all': Sampler,
+    'stride': StrideSampler,
+    'fps': FpsSampler,
+    'change': ChangeSampler,
+}
+
+# What the fields after the policy name set, in order; empty fields keep the default
+SAMPLER_PARAMS = {
+    'all': (),
+    'stride': ('stride',),
+    'fps': ('target_fps',),
+    'change': ('diff_threshold', 'hist_threshold'),
+}
+
+
+def make_sampler(spec=None):
+    """
+    Build a sampler from a policy string such as 'stride:3' or 'change:6:0.95'
+
+    Parameters
+    ----------
+    spec : string or Sampler, optional
+        Policy, see the module docstring. The default (None) is 'all'.
+
+    Returns
+    -------
+    Sampler
+
+    Raises
+    ------
+    ValueError
+        For an unknown policy, too many parameters or a parameter that is not
+        a number.
+
+    """
+    if isinstance(spec, Sampler):
+        return spec
+    name, *params = (spec or 'all').split(':')
+    if name not in SAMPLERS:
+        raise ValueError(f"Unknown sampling policy {spec!r}, expected one of {', '.join(SAMPLERS)}")
+    names = SAMPLER_PARAMS[name]
+    if len(params) > len(names):
+        raise ValueError(f"Sampling policy {name!r} takes at most {len(names)} parameter(s), got {spec!r}")
+    try:
+        kwargs = {key: float(p) for key, p in zip(names, params) if p}
+    except ValueError:
+        raise ValueError(f"Sampling policy parameters must be numbers, got {spec!r}") from None
+    return SAMPLERS[name](**kwargs)
+
+
+def fill_timeline(records, frame_count, fps, fill='nearest'):
+    """
+    Spread the analyzed frames back onto every frame of the video
+
+    Parameters
+    ----------
+    records : list of dict
+        Analyzed frame records in frame order, each with a 'frame' index
+    frame_count : int
+        Number of decoded frames
+    fps : float
+        Frame rate, used for the timestamps of filled frames
+    fill : string, optional
+        'nearest' analyzed frame or the 'previous' one. The default is 'nearest'.
+
+    Returns
+    -------
+    timeline : list of dict
+        One record per frame. Analyzed frames get 'sampled': True; filled
+        frames are copies with 'sampled': False and the 'source_frame' they
+        were copied from.
+
+    """
+    if not records:
+        return []
+    indices = np.array([r['frame'] for r in records])
+    frames = np.arange(frame_count)
+    after = np.clip(np.searchsorted(indices, frames, side='right'), 1, len(indices))
+    before = after - 1
+    if fill == 'nearest':
+        upper = np.minimum(after, len(indices) - 1)
+        closer = np.abs(indices[upper] - frames) < np.abs(frames - indices[before])
+        source = np.where(closer, upper, before)
+    else:
+        source = before
+
+    timeline = []
+    for frame, src in zip(frames.tolist(), source.tolist()):
+        record = records[src]
+        if record['frame'] == frame:
+            record['sampled'] = True
+            timeline.append(record)
+            continue
+        filled = copy.deepcopy(record)
+        filled['frame'] = frame
+        if fps:
+            filled['time'] = round(frame / fps, 3)
+        filled['sampled'] = False
+        filled['source_frame'] = record['frame']
+        timeline.append(filled)
+    return timeline
+
+
+def sampled_frames(cap, sampler, fps):
+    """
+    Read a video through a sampler
+
+    Parameters
+    ----------
+    cap : cv2.VideoCapture
+        Opened video
+    sampler : Sampler
+        Sampler, already reset for this video
+    fps : float
+        Frame rate, 0 if unknown
+
+    Yields
+    ------
+    (index, timestamp, img) : tuple
+        One tuple per frame of the video; img is None for frames the sampler
+        skipped. Frames skipped on their index alone are only grabbed, never
+        decoded to BGR.
+
+    """
+    index = 0
+    while True:
+        if sampler.needs_image or sampler.should_process(index):
+            ret, img = cap.read()
+            if not ret:
+                return
+            if sampler.needs_image and not sampler.should_process(index, img):
+                img = None
+        elif not cap.grab():
+            return
+        else:
+            img = None
+        timestamp = index / fps if fps else cap.get(cv2.CAP_PROP_POS_MSEC) / 1000
+        yield index, timestamp, img
+        index += 1
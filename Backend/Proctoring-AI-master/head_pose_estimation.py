@@ -8,8 +8,10 @@ Created on Fri Jul 31 03:00:36 2020
 import cv2
 import numpy as np
 import math
-from face_detector import get_face_detector, find_faces
-from face_landmarks import get_landmark_model, detect_marks
+from face_detector import find_faces
+from face_landmarks import detect_marks_batch
+from detectors import get_face_model, get_landmarks_model
+from frame_reader import FrameReader
 
 def get_2d_points(img, rotation_vector, translation_vector, camera_matrix, val):
     """Return the 3D points present as 2D for making annotation box"""
@@ -124,9 +126,6 @@ def head_pose_points(img, rotation_vector, translation_vector, camera_matrix):
     
     return (x, y)
     
-face_model = get_face_detector()
-landmark_model = get_landmark_model()
-
 font = cv2.FONT_HERSHEY_SIMPLEX 
 # 3D model points.
 model_points = np.array([
@@ -138,12 +137,21 @@ model_points = np.array([
                             (150.0, -150.0, -125.0)      # Right mouth corner
                         ])
 
-def detect_head_pose(video_path):
-    cap = cv2.VideoCapture(video_path)
-    ret, img = cap.read()
-    size = img.shape
+def get_camera_matrix(size):
+    """
+    Approximate camera matrix for an image of the given shape
 
-    # Camera internals
+    Parameters
+    ----------
+    size : tuple
+        Shape of the image
+
+    Returns
+    -------
+    camera_matrix : Array of float64
+        Camera internals with the focal length set to the image width
+
+    """
     focal_length = size[1]
     center = (size[1]/2, size[0]/2)
     camera_matrix = np.array(
@@ -151,67 +159,110 @@ def detect_head_pose(video_path):
                             [0, focal_length, center[1]],
                             [0, 0, 1]], dtype = "double"
                             )
+    return camera_matrix
+
+def estimate_head_pose(img, marks, camera_matrix):
+    """
+    Estimate the head pose of one face from its landmarks, without drawing
+
+    Parameters
+    ----------
+    img : np.unit8
+        Original Image.
+    marks : Array of uint
+        Facial landmarks of the face
+    camera_matrix : Array of float64
+        The camera matrix
+
+    Returns
+    -------
+    pose : dict
+        'vertical_angle' and 'horizontal_angle' in degrees, and 'vertical'
+        ('down', 'up' or None) and 'horizontal' ('right', 'left' or None)
+        when an angle passes 48 degrees
+    points : dict
+        Image points, nose line (p1, p2) and sideways line (x1, x2) for drawing
+
+    """
+    image_points = np.array([
+                            marks[30],     # Nose tip
+                            marks[8],     # Chin
+                            marks[36],     # Left eye left corner
+                            marks[45],     # Right eye right corne
+                            marks[48],     # Left Mouth corner
+                            marks[54]      # Right mouth corner
+                        ], dtype="double")
+    dist_coeffs = np.zeros((4,1)) # Assuming no lens distortion
+    (success, rotation_vector, translation_vector) = cv2.solvePnP(model_points, image_points, camera_matrix, dist_coeffs, flags=cv2.SOLVEPNP_UPNP)
+    
+    # Project a 3D point (0, 0, 1000.0) onto the image plane.
+    # We use this to draw a line sticking out of the nose
+    (nose_end_point2D, jacobian) = cv2.projectPoints(np.array([(0.0, 0.0, 1000.0)]), rotation_vector, translation_vector, camera_matrix, dist_coeffs)
+    
+    p1 = ( int(image_points[0][0]), int(image_points[0][1]))
+    p2 = ( int(nose_end_point2D[0][0][0]), int(nose_end_point2D[0][0][1]))
+    x1, x2 = head_pose_points(img, rotation_vector, translation_vector, camera_matrix)
+
+    try:
+        m = (p2[1] - p1[1])/(p2[0] - p1[0])
+        ang1 = int(math.degrees(math.atan(m)))
+    except:
+        ang1 = 90
+        
+    try:
+        m = (x2[1] - x1[1])/(x2[0] - x1[0])
+        ang2 = int(math.degrees(math.atan(-1/m)))
+    except:
+        ang2 = 90
+
+    pose = {
+        'vertical_angle': ang1,
+        'horizontal_angle': ang2,
+        'vertical': 'down' if ang1 >= 48 else 'up' if ang1 <= -48 else None,
+        'horizontal': 'right' if ang2 >= 48 else 'left' if ang2 <= -48 else None,
+    }
+    points = {'image_points': image_points, 'p1': p1, 'p2': p2, 'x1': x1, 'x2': x2}
+    return pose, points
+
+def detect_head_pose(video_path):
+    face_model = get_face_model()
+    landmark_model = get_landmarks_model()
+    # Decode on a background thread so it overlaps with inference and drawing
+    cap = FrameReader(video_path)
+    ret, img = cap.read()
+    size = img.shape
+
+    # Camera internals
+    camera_matrix = get_camera_matrix(size)
     while True:
         ret, img = cap.read()
         if ret == True:
             faces = find_faces(img, face_model)
-            for face in faces:
-                marks = detect_marks(img, landmark_model, face)
+            for marks in detect_marks_batch(img, landmark_model, faces):
                 # mark_detector.draw_marks(img, marks, color=(0, 255, 0))
-                image_points = np.array([
-                                        marks[30],     # Nose tip
-                                        marks[8],     # Chin
-                                        marks[36],     # Left eye left corner
-                                        marks[45],     # Right eye right corne
-                                        marks[48],     # Left Mouth corner
-                                        marks[54]      # Right mouth corner
-                                    ], dtype="double")
-                dist_coeffs = np.zeros((4,1)) # Assuming no lens distortion
-                (success, rotation_vector, translation_vector) = cv2.solvePnP(model_points, image_points, camera_matrix, dist_coeffs, flags=cv2.SOLVEPNP_UPNP)
+                pose, points = estimate_head_pose(img, marks, camera_matrix)
+                p1, p2, x1, x2 = points['p1'], points['p2'], points['x1'], points['x2']
+                ang1, ang2 = pose['vertical_angle'], pose['horizontal_angle']
                 
-                
-                # Project a 3D point (0, 0, 1000.0) onto the image plane.
-                # We use this to draw a line sticking out of the nose
-                
-                (nose_end_point2D, jacobian) = cv2.projectPoints(np.array([(0.0, 0.0, 1000.0)]), rotation_vector, translation_vector, camera_matrix, dist_coeffs)
-                
-                for p in image_points:
+                for p in points['image_points']:
                     cv2.circle(img, (int(p[0]), int(p[1])), 3, (0,0,255), -1)
-                
-                
-                p1 = ( int(image_points[0][0]), int(image_points[0][1]))
-                p2 = ( int(nose_end_point2D[0][0][0]), int(nose_end_point2D[0][0][1]))
-                x1, x2 = head_pose_points(img, rotation_vector, translation_vector, camera_matrix)
 
                 cv2.line(img, p1, p2, (0, 255, 255), 2)
                 cv2.line(img, tuple(x1), tuple(x2), (255, 255, 0), 2)
                 # for (x, y) in marks:
                 #     cv2.circle(img, (x, y), 4, (255, 255, 0), -1)
                 # cv2.putText(img, str(p1), p1, font, 1, (0, 255, 255), 1)
-                try:
-                    m = (p2[1] - p1[1])/(p2[0] - p1[0])
-                    ang1 = int(math.degrees(math.atan(m)))
-                except:
-                    ang1 = 90
-                    
-                try:
-                    m = (x2[1] - x1[1])/(x2[0] - x1[0])
-                    ang2 = int(math.degrees(math.atan(-1/m)))
-                except:
-                    ang2 = 90
-                    
-                    # print('div by zero error')
-                if ang1 >= 48:
+                if pose['vertical'] == 'down':
                     print('Head down')
                     cv2.putText(img, 'Head down', (30, 30), font, 2, (255, 255, 128), 3)
-                elif ang1 <= -48:
+                elif pose['vertical'] == 'up':
                     print('Head up')
                     cv2.putText(img, 'Head up', (30, 30), font, 2, (255, 255, 128), 3)
                 
-                if ang2 >= 48:
+                if pose['horizontal'] == 'right':
                     print('Head right')
                     cv2.putText(img, 'Head right', (90, 30), font, 2, (255, 255, 128), 3)
-                elif ang2 <= -48:
+                elif pose['horizontal'] == 'left':
                     print('Head left')
                     cv2.putText(img, 'Head left', (90, 30), font, 2, (255, 255, 128), 3)
                 
@@ -223,4 +274,4 @@ def detect_head_pose(video_path):
         else:
             break
     cv2.destroyAllWindows()
-    cap.release()
\ No newline at end of file
+    cap.release()
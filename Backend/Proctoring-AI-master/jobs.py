@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+"""
+Background video analysis jobs.
+
+Videos are analyzed by a fixed pool of worker threads instead of inside the
+request. Jobs, their progress and their results live in a SQLite database,
+so they survive restarts: jobs that were queued or running when the server
+stopped are queued again on start.
+
+Results are cached by the SHA-256 of the video content and the sampling
+policy, so submitting a video that was already analyzed finishes at once.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+JOBS_DIR = os.getenv('JOBS_DIR', os.path.join(BASE_DIR, 'jobs'))
+# Videos analyzed at the same time
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+# Jobs allowed to wait for a worker before submissions are refused
+JOB_MAX_PENDING = int(os.getenv('JOB_MAX_PENDING', '100'))
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    video TEXT NOT NULL,
+    sampling TEXT NOT NULL,
+    status TEXT NOT NULL,
+    content_hash TEXT,
+    frames_done INTEGER NOT NULL DEFAULT 0,
+    frames_total INTEGER NOT NULL DEFAULT 0,
+    cached INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE TABLE IF NOT EXISTS results (
+    cache_key TEXT PRIMARY KEY,
+    summary TEXT NOT NULL,
+    data BLOB NOT NULL,
+    created_at REAL NOT NULL
+);
+'''
+
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+
+
+class JobsFull(Exception):
+    """Raised when JOB_MAX_PENDING jobs are already waiting"""
+
+
+def sha256_file(path, chunk_size=1 << 20):
+    """SHA-256 hex digest of a file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def is_url(video):
+    return video.startswith(('http://', 'https://'))
+
+
+class JobStore:
+    """
+    SQLite store of jobs and cached results
+
+    Parameters
+    ----------
+    path : string
+        Database file
+
+    """
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        with self._lock, self._db:
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.executescript(SCHEMA)
+
+    def _execute(self, sql, params=()):
+        with self._lock, self._db:
+            return self._db.execute(sql, params).fetchall()
+
+    def create(self, video, sampling, content_hash=None):
+        job_id = uuid.uuid4().hex
+        self._execute('INSERT INTO jobs (id, video, sampling, status, content_hash, created_at) '
+                      'VALUES (?, ?, ?, ?, ?, ?)',
+                      (job_id, video, sampling, QUEUED, content_hash, time.time()))
+        return job_id
+
+    def update(self, job_id, **fields):
+        columns = ', '.join(f'{name} = ?' for name in fields)
+        self._execute(f'UPDATE jobs SET {columns} WHERE id = ?', (*fields.values(), job_id))
+
+    def get(self, job_id):
+        rows = self._execute('SELECT * FROM jobs WHERE id = ?', (job_id,))
+        return dict(rows[0]) if rows else None
+
+    def unfinished(self):
+        rows = self._execute('SELECT id FROM jobs WHERE status IN (?, ?) ORDER BY created_at',
+                             (QUEUED, RUNNING))
+        return [row['id'] for row in rows]
+
+    def save_result(self, cache_key, result):
+        data = gzip.compress(json.dumps(result).encode('utf-8'))
+        self._execute('INSERT OR REPLACE INTO results (cache_key, summary, data, created_at) '
+                      'VALUES (?, ?, ?, ?)',
+                      (cache_key, json.dumps(result['summary']), data, time.time()))
+
+    def has_result(self, cache_key):
+        return bool(self._execute('SELECT 1 FROM results WHERE cache_key = ?', (cache_key,)))
+
+    def load_result(self, cache_key):
+        rows = self._execute('SELECT data FROM results WHERE cache_key = ?', (cache_key,))
+        return json.loads(gzip.decompress(rows[0]['data'])) if rows else None
+
+
+def cache_key(content_hash, sampling):
+    return f'{content_hash}:{sampling}'
+
+
+class JobQueue:
+    """
+    Runs analysis jobs on a bounded pool of worker threads
+
+    Parameters
+    ----------
+    analyze : callable
+        Takes (video_path, progress=None, sampling=None) and returns the
+        analysis result, such as video_pipeline.analyze_video or
+        StagedPipeline.run
+    store : JobStore, optional
+        The default is jobs.db in JOBS_DIR.
+    workers : int, optional
+        Jobs run at the same time. The default is JOB_WORKERS.
+    max_pending : int, optional
+        Queued jobs allowed before submit raises JobsFull. The default is
+        JOB_MAX_PENDING.
+
+    """
+
+    def __init__(self, analyze, store=None, workers=JOB_WORKERS, max_pending=JOB_MAX_PENDING):
+        self.analyze = analyze
+        self.store = store or JobStore(os.path.join(JOBS_DIR, 'jobs.db'))
+        self.max_pending = max_pending
+        self.download_dir = os.path.join(JOBS_DIR, 'downloads')
+        self._pool = ThreadPoolExecutor(max(1, workers), thread_name_prefix='video-job')
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def resume(self):
+        """Queue again the jobs a previous process did not finish"""
+        for job_id in self.store.unfinished():
+            self.store.update(job_id, status=QUEUED, frames_done=0)
+            self._enqueue(job_id)
+
+    def submit(self, video, sampling):
+        """
+        Create a job for a video file or http(s) URL
+
+        Local files are hashed right away, so a video that was already
+        analyzed with the same sampling policy is done without queueing.
+
+        Returns
+        -------
+        job : dict
+            The job row
+
+        """
+        content_hash = None
+        if not is_url(video):
+            if not os.path.isfile(video):
+                raise FileNotFoundError(video)
+            content_hash = sha256_file(video)
+            if self.store.has_result(cache_key(content_hash, sampling)):
+                job_id = self.store.create(video, sampling, content_hash)
+                now = time.time()
+                self.store.update(job_id, status=DONE, cached=1, started_at=now, finished_at=now)
+                return self.store.get(job_id)
+
+        # Check and take the slot under one lock, so concurrent submits cannot
+        # both pass the check
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise JobsFull(f'{self._pending} jobs are already waiting')
+            self._pending += 1
+        try:
+            job_id = self.store.create(video, sampling, content_hash)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+        self._pool.submit(self._run, job_id)
+        return self.store.get(job_id)
+
+    def _enqueue(self, job_id):
+        with self._lock:
+            self._pending += 1
+        self._pool.submit(self._run, job_id)
+
+    def _download(self, url, job_id):
+        os.makedirs(self.download_dir, exist_ok=True)
+        path = os.path.join(self.download_dir, job_id)
+        with urllib.request.urlopen(url) as response, open(path, 'wb') as f:
+            shutil.copyfileobj(response, f)
+        return path
+
+    def _run(self, job_id):
+        with self._lock:
+            self._pending -= 1
+        job = self.store.get(job_id)
+        self.store.update(job_id, status=RUNNING, started_at=time.time())
+        path = None
+        try:
+            video = job['video']
+            path = self._download(video, job_id) if is_url(video) else video
+            content_hash = job['content_hash'] or sha256_file(path)
+            key = cache_key(content_hash, job['sampling'])
+            cached = self.store.has_result(key)
+            if not cached:
+                last_update = [0.0]
+
+                def progress(done, total):
+                    # Throttle database writes to about one per second
+                    now = time.monotonic()
+                    if now - last_update[0] >= 1.0:
+                        last_update[0] = now
+                        self.store.update(job_id, frames_done=done, frames_total=total)
+
+                result = self.analyze(path, progress=progress, sampling=job['sampling'])
+                self.store.save_result(key, result)
+                self.store.update(job_id, frames_done=result['frames'], frames_total=result['frames'])
+            self.store.update(job_id, status=DONE, content_hash=content_hash, cached=int(cached),
+                              finished_at=time.time())
+        except Exception as e:
+            print(f"Warning: video job {job_id} failed: {e}")
+            self.store.update(job_id, status=FAILED, error=str(e), finished_at=time.time())
+        finally:
+            if path is not None and path != job['video'] and os.path.exists(path):
+                os.remove(path)
+
+    def status(self, job_id):
+        """
+        Job row with its progress, or None for an unknown job
+
+        progress is the fraction of frames analyzed, or None while the total
+        is unknown.
+        """
+        job = self.store.get(job_id)
+        if job is None:
+            return None
+        if job['status'] == DONE:
+            job['progress'] = 1.0
+        elif job['frames_total']:
+            job['progress'] = round(min(job['frames_done'] / job['frames_total'], 1.0), 3)
+        else:
+            job['progress'] = None
+        job['cached'] = bool(job['cached'])
+        return job
+
+    def result(self, job_id):
+        """Analysis result of a finished job, or None"""
+        job = self.store.get(job_id)
+        if job is None or job['status'] != DONE:
+            return None
+        return self.store.load_result(cache_key(job['content_hash'], job['sampling']))
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
@@ -1,21 +1,76 @@
-from fastapi import FastAPI, APIRouter
+import os
 
+from fastapi import FastAPI, APIRouter, HTTPException
 
-from eye_tracker import track_eye
-from head_pose_estimation import detect_head_pose
-from mouth_opening_detector import mouth_opening_detector
-from person_and_phone import detect_phone_and_person
+
+from frame_sampling import make_sampler
+from jobs import JobQueue, JobsFull
+from staged_pipeline import StagedPipeline
+from video_pipeline import analyze_video
 
 
 app = FastAPI()
 
+# Default frame sampling policy, e.g. "stride:3", "fps:5" or "change"
+VIDEO_SAMPLING = os.getenv('VIDEO_SAMPLING', 'all')
+# Inference workers per video ("thread" or "process" mode); 1 runs serially
+VIDEO_WORKERS = int(os.getenv('VIDEO_WORKERS', '2'))
+VIDEO_WORKER_MODE = os.getenv('VIDEO_WORKER_MODE', 'thread')
+
+staged = StagedPipeline(VIDEO_WORKERS, VIDEO_WORKER_MODE) if VIDEO_WORKERS > 1 else None
+# One decode and one face/landmark pass per frame, shared by the gaze,
+# head pose, mouth and phone/person checks
+jobs = JobQueue(staged.run if staged is not None else analyze_video)
+
+
+@app.on_event("startup")
+def resume_jobs():
+    jobs.resume()
+
+
+@app.on_event("shutdown")
+def stop_jobs():
+    jobs.shutdown()
+    if staged is not None:
+        staged.close()
+
 
 @app.post("/analyze_video")
-def read_root(video_url: str=None):
-    track_eye(video_url)
-    detect_head_pose(video_url)
-    mouth_opening_detector(video_url)
-    detect_phone_and_person(video_url)
+def read_root(video_url: str=None, sampling: str=None):
+    # Queue the video and return straight away; poll /analyze_video/{job_id}
+    if not video_url:
+        raise HTTPException(status_code=400, detail="video_url is required")
+    sampling = sampling or VIDEO_SAMPLING
+    try:
+        make_sampler(sampling)
+        job = jobs.submit(video_url, sampling)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Video not found: {video_url}")
+    except JobsFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+    message = "Success" if job["status"] == "done" else "Queued"
+    return {"message": message, "job_id": job["id"], "status": job["status"]}
+
+
+@app.get("/analyze_video/{job_id}")
+def job_status(job_id: str):
+    job = jobs.status(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return job
 
 
-    return {"message": "Success"}
+@app.get("/analyze_video/{job_id}/results")
+def job_results(job_id: str):
+    job = jobs.status(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    result = jobs.result(job_id)
+    return {"message": "Success", "sampling": result["sampling"],
+            "summary": result["summary"], "timeline": result["timeline"]}
\ No newline at end of file
@@ -6,25 +6,70 @@ Created on Fri Jul 31 01:04:44 2020
 """
 
 import cv2
-from face_detector import get_face_detector, find_faces
-from face_landmarks import get_landmark_model, detect_marks, draw_marks
-face_model = get_face_detector()
-landmark_model = get_landmark_model()
+from face_detector import find_faces
+from face_landmarks import detect_marks_batch, draw_marks
+from detectors import get_face_model, get_landmarks_model
+from frame_reader import FrameReader
 outer_points = [[49, 59], [50, 58], [51, 57], [52, 56], [53, 55]]
 d_outer = [0]*5
 inner_points = [[61, 67], [62, 66], [63, 65]]
 d_inner = [0]*3
 font = cv2.FONT_HERSHEY_SIMPLEX 
 
+def mouth_distances(shape):
+    """
+    Vertical lip distances of a face
+
+    Parameters
+    ----------
+    shape : Array of uint32
+        Facial landmarks of the face
+
+    Returns
+    -------
+    outer, inner : list of int
+        Distances between the outer_points and inner_points pairs
+
+    """
+    # int() first: the landmarks are unsigned and would wrap on a negative gap
+    outer = [int(shape[p2][1]) - int(shape[p1][1]) for p1, p2 in outer_points]
+    inner = [int(shape[p2][1]) - int(shape[p1][1]) for p1, p2 in inner_points]
+    return outer, inner
+
+def is_mouth_open(shape, d_outer, d_inner):
+    """
+    Whether the mouth is open compared to the closed-mouth distances
+
+    Parameters
+    ----------
+    shape : Array of uint32
+        Facial landmarks of the face
+    d_outer, d_inner : list of float
+        Recorded closed-mouth distances, as from mouth_distances
+
+    Returns
+    -------
+    bool
+        True if more than 3 outer and more than 2 inner distances have grown
+        by over 3 and 2 pixels respectively
+
+    """
+    outer, inner = mouth_distances(shape)
+    cnt_outer = sum(d + 3 < v for d, v in zip(d_outer, outer))
+    cnt_inner = sum(d + 2 < v for d, v in zip(d_inner, inner))
+    return cnt_outer > 3 and cnt_inner > 2
+
 
 def mouth_opening_detector(video_path):
-    cap = cv2.VideoCapture(video_path)
+    face_model = get_face_model()
+    landmark_model = get_landmarks_model()
+    # Decode on a background thread so it overlaps with inference and drawing
+    cap = FrameReader(video_path)
 
     while(True):
         ret, img = cap.read()
         rects = find_faces(img, face_model)
-        for rect in rects:
-            shape = detect_marks(img, landmark_model, rect)
+        for shape in detect_marks_batch(img, landmark_model, rects):
             draw_marks(img, shape)
             cv2.putText(img, 'Press r to record Mouth distances', (30, 30), font,
                         1, (0, 255, 255), 2)
@@ -43,18 +88,9 @@ def mouth_opening_detector(video_path):
     while(True):
         ret, img = cap.read()
         rects = find_faces(img, face_model)
-        for rect in rects:
-            shape = detect_marks(img, landmark_model, rect)
-            cnt_outer = 0
-            cnt_inner = 0
+        for shape in detect_marks_batch(img, landmark_model, rects):
             draw_marks(img, shape[48:])
-            for i, (p1, p2) in enumerate(outer_points):
-                if d_outer[i] + 3 < shape[p2][1] - shape[p1][1]:
-                    cnt_outer += 1 
-            for i, (p1, p2) in enumerate(inner_points):
-                if d_inner[i] + 2 <  shape[p2][1] - shape[p1][1]:
-                    cnt_inner += 1
-            if cnt_outer > 3 and cnt_inner > 2:
+            if is_mouth_open(shape, d_outer, d_inner):
                 print('Mouth open')
                 cv2.putText(img, 'Mouth open', (30, 30), font,
                         1, (0, 255, 255), 2)
@@ -22,7 +22,6 @@ from tensorflow.keras.layers import (
     BatchNormalization
 )
 from tensorflow.keras.regularizers import l2
-import wget
 
 def load_darknet_weights(model, weights_file):
     '''
@@ -117,7 +116,7 @@ yolo_anchors = np.array([(10, 13), (16, 30), (33, 23), (30, 61), (62, 45),
 
 yolo_anchor_masks = np.array([[6, 7, 8], [3, 4, 5], [0, 1, 2]])
     
-def DarknetConv(x, filters, kernel_size, strides=1, batch_norm=True):
+def DarknetConv(x, filters, kernel_size, strides=1, batch_norm=True, fused=False):
     '''
     Call this function to define a single Darknet convolutional layer
     
@@ -126,6 +125,8 @@ def DarknetConv(x, filters, kernel_size, strides=1, batch_norm=True):
     :param kernel_size: Size of kernel in the Conv layer
     :param strides: Conv layer strides
     :param batch_norm: Whether or not to use the custom batch norm layer.
+    :param fused: Inference-only layout: the batch norm is folded into the
+        kernel and bias of the Conv layer, so there is no separate layer
     '''
     #Image padding
     if strides == 1:
@@ -137,14 +138,16 @@ def DarknetConv(x, filters, kernel_size, strides=1, batch_norm=True):
     #Defining the Conv layer
     x = Conv2D(filters=filters, kernel_size=kernel_size,
                strides=strides, padding=padding,
-               use_bias=not batch_norm, kernel_regularizer=l2(0.0005))(x)
+               use_bias=not batch_norm or fused,
+               kernel_regularizer=None if fused else l2(0.0005))(x)
     
     if batch_norm:
-        x = BatchNormalization()(x)
+        if not fused:
+            x = BatchNormalization()(x)
         x = LeakyReLU(alpha=0.1)(x)
     return x
 
-def DarknetResidual(x, filters):
+def DarknetResidual(x, filters, fused=False):
     '''
     Call this function to define a single DarkNet Residual layer
     
@@ -152,13 +155,13 @@ def DarknetResidual(x, filters):
     :param filters: number of filters in each Conv layer.
     '''
     prev = x
-    x = DarknetConv(x, filters // 2, 1)
-    x = DarknetConv(x, filters, 3)
+    x = DarknetConv(x, filters // 2, 1, fused=fused)
+    x = DarknetConv(x, filters, 3, fused=fused)
     x = Add()([prev, x])
     return x
   
   
-def DarknetBlock(x, filters, blocks):
+def DarknetBlock(x, filters, blocks, fused=False):
     '''
     Call this function to define a single DarkNet Block (made of multiple Residual layers)
     
@@ -166,25 +169,25 @@ def DarknetBlock(x, filters, blocks):
     :param filters: number of filters in each Residual layer
     :param blocks: number of Residual layers in the block
     '''
-    x = DarknetConv(x, filters, 3, strides=2)
+    x = DarknetConv(x, filters, 3, strides=2, fused=fused)
     for _ in range(blocks):
-        x = DarknetResidual(x, filters)
+        x = DarknetResidual(x, filters, fused)
     return x
 
-def Darknet(name=None):
+def Darknet(name=None, fused=False):
     '''
     The main function that creates the whole DarkNet.
     '''
     x = inputs = Input([None, None, 3])
-    x = DarknetConv(x, 32, 3)
-    x = DarknetBlock(x, 64, 1)
-    x = DarknetBlock(x, 128, 2)  # skip connection
-    x = x_36 = DarknetBlock(x, 256, 8)  # skip connection
-    x = x_61 = DarknetBlock(x, 512, 8)
-    x = DarknetBlock(x, 1024, 4)
+    x = DarknetConv(x, 32, 3, fused=fused)
+    x = DarknetBlock(x, 64, 1, fused)
+    x = DarknetBlock(x, 128, 2, fused)  # skip connection
+    x = x_36 = DarknetBlock(x, 256, 8, fused)  # skip connection
+    x = x_61 = DarknetBlock(x, 512, 8, fused)
+    x = DarknetBlock(x, 1024, 4, fused)
     return tf.keras.Model(inputs, (x_36, x_61, x), name=name)
 
-def YoloConv(filters, name=None):
+def YoloConv(filters, name=None, fused=False):
     '''
     Call this function to define the Yolo Conv layer.
     
@@ -197,21 +200,21 @@ def YoloConv(filters, name=None):
             x, x_skip = inputs
 
             # concat with skip connection
-            x = DarknetConv(x, filters, 1)
+            x = DarknetConv(x, filters, 1, fused=fused)
             x = UpSampling2D(2)(x)
             x = Concatenate()([x, x_skip])
         else:
             x = inputs = Input(x_in.shape[1:])
 
-        x = DarknetConv(x, filters, 1)
-        x = DarknetConv(x, filters * 2, 3)
-        x = DarknetConv(x, filters, 1)
-        x = DarknetConv(x, filters * 2, 3)
-        x = DarknetConv(x, filters, 1)
+        x = DarknetConv(x, filters, 1, fused=fused)
+        x = DarknetConv(x, filters * 2, 3, fused=fused)
+        x = DarknetConv(x, filters, 1, fused=fused)
+        x = DarknetConv(x, filters * 2, 3, fused=fused)
+        x = DarknetConv(x, filters, 1, fused=fused)
         return Model(inputs, x, name=name)(x_in)
     return yolo_conv
 
-def YoloOutput(filters, anchors, classes, name=None):
+def YoloOutput(filters, anchors, classes, name=None, fused=False):
     '''
     This function defines outputs for the Yolo V3. (Creates output projections)
      
@@ -222,8 +225,8 @@ def YoloOutput(filters, anchors, classes, name=None):
     '''
     def yolo_output(x_in):
         x = inputs = Input(x_in.shape[1:])
-        x = DarknetConv(x, filters * 2, 3)
-        x = DarknetConv(x, anchors * (classes + 5), 1, batch_norm=False)
+        x = DarknetConv(x, filters * 2, 3, fused=fused)
+        x = DarknetConv(x, anchors * (classes + 5), 1, batch_norm=False, fused=fused)
         x = Lambda(lambda x: tf.reshape(x, (-1, tf.shape(x)[1], tf.shape(x)[2],
                                             anchors, classes + 5)))(x)
         return tf.keras.Model(inputs, x, name=name)(x_in)
@@ -290,22 +293,77 @@ def yolo_nms(outputs, anchors, masks, classes):
 
     return boxes, scores, classes, valid_detections
 
+# COCO ids of the only classes proctoring looks at
+PERSON_CLASS = 0
+PHONE_CLASS = 67
+PROCTORING_CLASSES = (PERSON_CLASS, PHONE_CLASS)
+
+def yolo_nms_proctoring(outputs, class_ids=PROCTORING_CLASSES, score_threshold=0.5,
+                        max_per_class=20):
+    '''
+    Proctoring variant of yolo_nms: only the class channels in class_ids are
+    sliced out of class_probs before NMS, so the other 78 classes never become
+    candidates, and anything scoring below score_threshold is dropped up front.
+    Returned classes are COCO ids, like yolo_nms.
+    
+    :param outputs: (bbox, objectness, class_probs) of the three output scales
+    :param class_ids: COCO class ids to keep
+    :param score_threshold: Minimum objectness * class probability
+    :param max_per_class: Most boxes kept per class
+    '''
+    b, c, t = [], [], []
+    ids = tf.constant(class_ids, tf.int32)
+
+    for o in outputs:
+        b.append(tf.reshape(o[0], (tf.shape(o[0])[0], -1, tf.shape(o[0])[-1])))
+        c.append(tf.reshape(o[1], (tf.shape(o[1])[0], -1, tf.shape(o[1])[-1])))
+        t.append(tf.reshape(tf.gather(o[2], ids, axis=-1), (tf.shape(o[2])[0], -1, len(class_ids))))
+
+    bbox = tf.concat(b, axis=1)
+    confidence = tf.concat(c, axis=1)
+    class_probs = tf.concat(t, axis=1)
+
+    scores = confidence * class_probs
+    boxes, scores, classes, valid_detections = tf.image.combined_non_max_suppression(
+        boxes=tf.reshape(bbox, (tf.shape(bbox)[0], -1, 1, 4)),
+        scores=scores,
+        max_output_size_per_class=max_per_class,
+        max_total_size=max_per_class * len(class_ids),
+        iou_threshold=0.5,
+        score_threshold=score_threshold
+    )
+    # NMS numbers the sliced channels 0..len(class_ids) - 1
+    classes = tf.gather(tf.cast(ids, tf.float32), tf.cast(classes, tf.int32))
+
+    return boxes, scores, classes, valid_detections
+
 
 def YoloV3(size=None, channels=3, anchors=yolo_anchors,
-           masks=yolo_anchor_masks, classes=80):
+           masks=yolo_anchor_masks, classes=80, postprocess='all', score_threshold=0.5,
+           fused=False):
+    '''
+    Builds the Yolo V3 model.
+    
+    :param postprocess: 'all' runs NMS over every class (yolo_nms), 'proctoring'
+        only over person and cell phone (yolo_nms_proctoring)
+    :param score_threshold: Minimum score in 'proctoring' post-processing
+    :param fused: Build the inference-only layout with batch norm folded into
+        the convolutions (see yolo_tflite.fold_batch_norm); Darknet weights
+        cannot be loaded into it directly
+    '''
   
     x = inputs = Input([size, size, channels], name='input')
 
-    x_36, x_61, x = Darknet(name='yolo_darknet')(x)
+    x_36, x_61, x = Darknet(name='yolo_darknet', fused=fused)(x)
 
-    x = YoloConv(512, name='yolo_conv_0')(x)
-    output_0 = YoloOutput(512, len(masks[0]), classes, name='yolo_output_0')(x)
+    x = YoloConv(512, name='yolo_conv_0', fused=fused)(x)
+    output_0 = YoloOutput(512, len(masks[0]), classes, name='yolo_output_0', fused=fused)(x)
 
-    x = YoloConv(256, name='yolo_conv_1')((x, x_61))
-    output_1 = YoloOutput(256, len(masks[1]), classes, name='yolo_output_1')(x)
+    x = YoloConv(256, name='yolo_conv_1', fused=fused)((x, x_61))
+    output_1 = YoloOutput(256, len(masks[1]), classes, name='yolo_output_1', fused=fused)(x)
 
-    x = YoloConv(128, name='yolo_conv_2')((x, x_36))
-    output_2 = YoloOutput(128, len(masks[2]), classes, name='yolo_output_2')(x)
+    x = YoloConv(128, name='yolo_conv_2', fused=fused)((x, x_36))
+    output_2 = YoloOutput(128, len(masks[2]), classes, name='yolo_output_2', fused=fused)(x)
 
     boxes_0 = Lambda(lambda x: yolo_boxes(x, anchors[masks[0]], classes),
                      name='yolo_boxes_0')(output_0)
@@ -314,30 +372,209 @@ def YoloV3(size=None, channels=3, anchors=yolo_anchors,
     boxes_2 = Lambda(lambda x: yolo_boxes(x, anchors[masks[2]], classes),
                      name='yolo_boxes_2')(output_2)
 
-    outputs = Lambda(lambda x: yolo_nms(x, anchors, masks, classes),
-                     name='yolo_nms')((boxes_0[:3], boxes_1[:3], boxes_2[:3]))
+    if postprocess == 'proctoring':
+        nms = lambda x: yolo_nms_proctoring(x, score_threshold=score_threshold)
+    else:
+        nms = lambda x: yolo_nms(x, anchors, masks, classes)
+    outputs = Lambda(nms, name='yolo_nms')((boxes_0[:3], boxes_1[:3], boxes_2[:3]))
 
     return Model(inputs, outputs, name='yolov3')
 
+def make_inference_fn(model, mode='graph', size=None):
+    '''
+    Wraps the YoloV3 model in the callable used for inference.
+    
+    :param model: Object of the Yolo v3 model
+    :param mode: 'eager' calls the Keras model op by op, 'graph' traces it once
+        with tf.function and 'xla' additionally JIT-compiles the traced graph
+    :param size: Input resolution fixed in the traced signature, YOLO_INPUT_SIZE
+        by default; other sizes need their own function
+    '''
+    if mode == 'eager':
+        return model
+
+    size = size or YOLO_INPUT_SIZE
+
+    @tf.function(input_signature=[tf.TensorSpec([None, size, size, 3], tf.float32)],
+                 jit_compile=(mode == 'xla'))
+    def infer(images):
+        return model(images, training=False)
+    return infer
+
 import os
+import hashlib
+import threading
+
+from frame_reader import FrameReader
+from yolo_input import YOLO_INPUT_SIZE
 
 # Define base path for models
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 MODELS_DIR = os.path.join(BASE_DIR, 'models')
 WEIGHTS_PATH = os.path.join(MODELS_DIR, 'yolov3.weights')
+# Darknet weights converted to Keras layout, written on first start
+WEIGHTS_CACHE_PATH = os.path.join(MODELS_DIR, 'yolov3.weights.npz')
 CLASSES_PATH = os.path.join(MODELS_DIR, 'classes.TXT')
 
 def weights_download(out=WEIGHTS_PATH):
+    import wget
     _ = wget.download('https://pjreddie.com/media/files/yolov3.weights', out=out)
     
+def file_sha256(path, chunk_size=1 << 20):
+    '''
+    Helper function that returns the SHA-256 hex digest of a file.
+    '''
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def save_weights_cache(model, cache_file, weights_file):
+    '''
+    Saves the model weights as an uncompressed .npz tied to the source Darknet file.
+    
+    :param model: Object of the Yolo v3 model with the Darknet weights loaded
+    :param cache_file: Path of the .npz file to write
+    :param weights_file: Path to the Darknet weights the model was loaded from
+    '''
+    st = os.stat(weights_file)
+    arrays = {'w{}'.format(i): w for i, w in enumerate(model.get_weights())}
+    tmp_file = cache_file + '.tmp'
+    with open(tmp_file, 'wb') as f:
+        np.savez(f,
+                 source_sha256=np.array(file_sha256(weights_file)),
+                 source_size=np.array(st.st_size),
+                 source_mtime_ns=np.array(st.st_mtime_ns),
+                 **arrays)
+    os.replace(tmp_file, cache_file)
+
+def load_weights_cache(model, cache_file, weights_file):
+    '''
+    Loads weights saved by save_weights_cache. The cache is only used when it
+    still matches the Darknet file: size and mtime are compared first, and the
+    SHA-256 is recomputed only if those differ.
+    
+    :param model: Object of the Yolo v3 model
+    :param cache_file: Path of the .npz cache
+    :param weights_file: Path to the Darknet weights the cache was built from
+    :return: True if the weights were loaded from the cache
+    '''
+    if not os.path.exists(cache_file):
+        return False
+    with np.load(cache_file) as cache:
+        if os.path.exists(weights_file):
+            st = os.stat(weights_file)
+            same_file = (int(cache['source_size']) == st.st_size and
+                         int(cache['source_mtime_ns']) == st.st_mtime_ns)
+            if not same_file and str(cache['source_sha256']) != file_sha256(weights_file):
+                return False
+        weights = [cache['w{}'.format(i)] for i in range(len(model.weights))]
+    model.set_weights(weights)
+    return True
+
+def load_yolo_weights(model, weights_file=WEIGHTS_PATH, cache_file=WEIGHTS_CACHE_PATH):
+    '''
+    Loads the Yolo V3 weights, from the converted cache when possible. The
+    Darknet binary is only parsed when there is no valid cache, after which
+    the cache is (re)written for the next start.
+    
+    :param model: Object of the Yolo v3 model
+    :param weights_file: Path to the file with Yolo V3 weights
+    :param cache_file: Path of the converted .npz cache
+    '''
+    try:
+        if load_weights_cache(model, cache_file, weights_file):
+            return True
+    except Exception as e:
+        print(f"Warning: Ignoring unreadable YOLO weights cache {cache_file}: {e}")
+
+    if not os.path.exists(weights_file):
+        print(f"Warning: YOLO weights not found at {weights_file}")
+        return False
+
+    load_darknet_weights(model, weights_file)
+    try:
+        save_weights_cache(model, cache_file, weights_file)
+    except OSError as e:
+        print(f"Warning: Could not write YOLO weights cache {cache_file}: {e}")
+    return True
+
 # weights_download() # to download weights
-yolo = YoloV3()
 
-# Check if weights exist before loading
-if os.path.exists(WEIGHTS_PATH):
-    load_darknet_weights(yolo, WEIGHTS_PATH)
-else:
-    print(f"Warning: YOLO weights not found at {WEIGHTS_PATH}")
+# How YoloV3 is executed: 'graph' (default), 'xla' or 'eager'
+YOLO_EXECUTION = os.getenv('YOLO_EXECUTION', 'graph')
+# 'proctoring' (default) keeps only person and cell phone detections scoring at
+# least YOLO_SCORE_THRESHOLD; 'all' keeps every COCO class down to 0.1
+YOLO_POSTPROCESS = os.getenv('YOLO_POSTPROCESS', 'proctoring')
+YOLO_SCORE_THRESHOLD = float(os.getenv('YOLO_SCORE_THRESHOLD', '0.5'))
+# Input resolutions come from YOLO_INPUT_SIZES (see yolo_input.py); frames are
+# letterboxed into YOLO_INPUT_SIZE, the largest, so their aspect ratio is kept.
+
+# The model is built and its weights loaded on first use, not at import
+_yolo = None
+# Traced inference function of every input size used so far
+_yolo_infer = {}
+_yolo_lock = threading.Lock()
+
+def get_yolo():
+    '''
+    Returns the process-wide Yolo V3 model, building it and loading its
+    weights on the first call. Raises FileNotFoundError without the weights,
+    rather than handing out a model with random ones.
+    '''
+    global _yolo
+    if _yolo is None:
+        with _yolo_lock:
+            if _yolo is None:
+                model = YoloV3(postprocess=YOLO_POSTPROCESS, score_threshold=YOLO_SCORE_THRESHOLD)
+                if not load_yolo_weights(model):
+                    raise FileNotFoundError(f"YOLO weights not found at {WEIGHTS_PATH}")
+                _yolo = model
+    return _yolo
+
+def get_yolo_infer(size=None):
+    '''
+    Returns the inference callable for the Yolo V3 model in YOLO_EXECUTION mode,
+    traced for inputs of ``size`` (YOLO_INPUT_SIZE by default).
+    '''
+    size = size or YOLO_INPUT_SIZE
+    infer = _yolo_infer.get(size)
+    if infer is None:
+        model = get_yolo()
+        with _yolo_lock:
+            infer = _yolo_infer.get(size)
+            if infer is None:
+                infer = _yolo_infer[size] = make_inference_fn(model, YOLO_EXECUTION, size)
+    return infer
+
+def warm_up_yolo(batch_size=1, sizes=None):
+    '''
+    Builds the model and runs a blank batch through it so tracing (and XLA
+    compilation) happens at startup rather than on the first frame. If the
+    requested mode cannot be compiled, falls back to graph mode and then to
+    eager execution.
+    
+    :param batch_size: Size of the blank batch
+    :param sizes: Input resolutions to warm up, YOLO_INPUT_SIZE by default
+    '''
+    global YOLO_EXECUTION
+    fallbacks = {'xla': 'graph', 'graph': 'eager'}
+    # Missing weights are not an execution problem, so they fail before the fallbacks
+    get_yolo()
+    while True:
+        try:
+            for size in sizes or (YOLO_INPUT_SIZE,):
+                get_yolo_infer(size)(np.zeros((batch_size, size, size, 3), dtype=np.float32))
+            return YOLO_EXECUTION
+        except Exception as e:
+            if YOLO_EXECUTION not in fallbacks:
+                raise
+            print(f"Warning: YOLO '{YOLO_EXECUTION}' execution failed ({e}), "
+                  f"falling back to '{fallbacks[YOLO_EXECUTION]}'")
+            YOLO_EXECUTION = fallbacks[YOLO_EXECUTION]
+            with _yolo_lock:
+                _yolo_infer.clear()
 
 # Cache class names to avoid reading file on every frame
 try:
@@ -347,56 +584,110 @@ except FileNotFoundError:
     print(f"Warning: Classes file not found at {CLASSES_PATH}")
     CLASS_NAMES = []
 
-def process_frame_for_proctoring(image):
+def letterbox_transform(shape, size=YOLO_INPUT_SIZE):
     """
-    Analyzes a single image frame (numpy array) for proctoring violations.
-    Returns a dictionary with detection results.
+    How a frame of ``shape`` is letterboxed into a size x size input: the
+    scale factor, the left and top padding and the scaled width and height.
     """
-    try:
-        # Preprocessing matched to the model training
-        img = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        img = cv2.resize(img, (416, 416))
-        img = img.astype(np.float32)
-        img = np.expand_dims(img, 0)
-        img = img / 255.0
+    height, width = shape[:2]
+    scale = min(size / width, size / height)
+    new_width, new_height = max(1, round(width * scale)), max(1, round(height * scale))
+    return scale, (size - new_width) // 2, (size - new_height) // 2, new_width, new_height
 
-        # Run Inference
-        boxes, scores, classes, nums = yolo(img)
+def preprocess_frame(image, size=YOLO_INPUT_SIZE):
+    """
+    Converts a BGR frame into the normalised size x size RGB input YoloV3
+    expects, scaled to fit with its aspect ratio kept and padded with grey.
+    """
+    if size % 32:
+        raise ValueError(f"YOLO input size must be a multiple of 32, got {size}")
+    _, pad_x, pad_y, new_width, new_height = letterbox_transform(image.shape, size)
+    img = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    img = cv2.resize(img, (new_width, new_height))
+    canvas = np.full((size, size, 3), 0.5, dtype=np.float32)
+    canvas[pad_y:pad_y + new_height, pad_x:pad_x + new_width] = img.astype(np.float32) / 255.0
+    return canvas
+
+def unletterbox_boxes(boxes, shape, size=YOLO_INPUT_SIZE):
+    """
+    Maps normalised (x, y, x1, y1) boxes on the letterboxed input back to
+    pixels of the original frame of ``shape``.
+    """
+    scale, pad_x, pad_y, _, _ = letterbox_transform(shape, size)
+    height, width = shape[:2]
+    boxes = (np.asarray(boxes, dtype=np.float32) * size - [pad_x, pad_y, pad_x, pad_y]) / scale
+    boxes = np.clip(boxes, 0, [width, height, width, height])
+    return np.round(boxes).astype(np.int64)
 
-        # Analysis
-        person_count = 0
-        phone_detected = False
-        
-        # Check detections
-        num_detections = int(nums[0])
-        # print(f"Proctor Debug: Found {num_detections} objects") # Debugging
-        
-        for i in range(num_detections):
-            class_idx = int(classes[0][i])
-            score = float(scores[0][i])
-            
-            # Debug what is being seen
-            # class_name = CLASS_NAMES[class_idx] if CLASS_NAMES and class_idx < len(CLASS_NAMES) else str(class_idx)
-            # print(f" - Detected: {class_name} ({class_idx}) Score: {score:.2f}")
+PROCTORING_LABELS = {PERSON_CLASS: 'person', PHONE_CLASS: 'cell phone'}
 
-            # Use index 0 for Person (COCO standard)
-            if class_idx == 0:
-                person_count += 1
-            
-            # Use index 67 for Cell Phone (COCO standard)
-            elif class_idx == 67:
-                phone_detected = True
-
-        return {
-            "person_count": person_count,
-            "phone_detected": phone_detected,
-            "status": "success"
+def summarize_detections(scores, classes, num_detections, boxes=None, shape=None, size=None):
+    """
+    Turns the YoloV3 outputs of a single image into proctoring flags, plus
+    the count, boxes and scores of each class in "detections". Boxes are
+    (x, y, x1, y1) in pixels of an image of ``shape``, or normalised without
+    it. ``size`` is the input size the image was letterboxed to, if it was.
+    """
+    n = int(num_detections)
+    classes = np.asarray(classes[:n]).astype(np.int64)
+    scores = np.asarray(scores[:n], dtype=np.float32)
+    if boxes is not None:
+        boxes = np.asarray(boxes[:n], dtype=np.float32)
+        if shape is not None and size is not None:
+            boxes = unletterbox_boxes(boxes, shape, size)
+        elif shape is not None:
+            height, width = shape[:2]
+            boxes = np.round(boxes * [width, height, width, height]).astype(np.int64)
+
+    detections = {}
+    for class_idx, label in PROCTORING_LABELS.items():
+        mask = classes == class_idx
+        detections[label] = {
+            "count": int(np.count_nonzero(mask)),
+            "scores": [round(float(v), 4) for v in scores[mask]],
+            "boxes": boxes[mask].tolist() if boxes is not None else [],
         }
+
+    kept = np.isin(classes, list(PROCTORING_LABELS))
+    return {
+        "person_count": detections['person']["count"],
+        "phone_detected": detections['cell phone']["count"] > 0,
+        # Strongest person/phone detection, None when there is none
+        "score": float(scores[kept].max()) if kept.any() else None,
+        "detections": detections,
+        "status": "success"
+    }
+
+def process_frames_for_proctoring(images, size=None):
+    """
+    Analyzes a list of image frames with a single batched YoloV3 forward pass
+    at input resolution ``size`` (YOLO_INPUT_SIZE by default). Returns one
+    detection dictionary per frame, in the same order.
+    """
+    size = size or YOLO_INPUT_SIZE
+    try:
+        batch = np.stack([preprocess_frame(image, size) for image in images])
+
+        # Run Inference
+        boxes, scores, classes, nums = get_yolo_infer(size)(batch)
+        boxes, scores, classes, nums = (np.asarray(boxes), np.asarray(scores),
+                                        np.asarray(classes), np.asarray(nums))
+
+        return [summarize_detections(scores[i], classes[i], nums[i], boxes[i], images[i].shape, size)
+                for i in range(len(images))]
     except Exception as e:
-        return {"status": "error", "message": str(e)}
+        return [{"status": "error", "message": str(e)} for _ in images]
+
+def process_frame_for_proctoring(image, size=None):
+    """
+    Analyzes a single image frame (numpy array) for proctoring violations.
+    Returns a dictionary with detection results.
+    """
+    return process_frames_for_proctoring([image], size)[0]
 
 def detect_phone_and_person(video_path):
-    cap = cv2.VideoCapture(video_path)
+    # Decode on a background thread so it overlaps with inference and drawing
+    cap = FrameReader(video_path)
 
     while(True):
         ret, image = cap.read()
@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+"""
+Person and phone detection with the COCO SSD MobileNet v1 TFLite model, a
+much cheaper alternative to YoloV3 on CPU-only hosts. The model does its own
+non-maximum suppression and returns the top 10 detections.
+"""
+
+import os
+
+import cv2
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SSD_DIR = os.path.join(BASE_DIR, 'coco models', 'tflite mobnetv1 ssd', 'coco_ssd_mobilenet')
+SSD_MODEL_PATH = os.path.join(SSD_DIR, 'detect.tflite')
+SSD_LABELS_PATH = os.path.join(SSD_DIR, 'labelmap.txt')
+
+
+def load_labels(label_path=SSD_LABELS_PATH):
+    """
+    Class names by class id. The first line of labelmap.txt is a background
+    placeholder, so class id i is line i + 1.
+
+    Parameters
+    ----------
+    label_path : string, optional
+        Path to labelmap.txt. The default is SSD_LABELS_PATH.
+
+    Returns
+    -------
+    labels : dict
+        Class name of every class id.
+
+    """
+    with open(label_path) as f:
+        lines = [line.strip() for line in f]
+    return {i - 1: name for i, name in enumerate(lines) if i > 0 and name != '???'}
+
+
+def make_interpreter(model_path=SSD_MODEL_PATH, num_threads=None):
+    """
+    TFLite interpreter for ``model_path``, from TensorFlow or, without it,
+    from the standalone tflite_runtime package.
+
+    Parameters
+    ----------
+    model_path : string, optional
+        Path of the .tflite model. The default is SSD_MODEL_PATH.
+    num_threads : int, optional
+        Threads used by the interpreter's kernels. The default is None, which
+        leaves the choice to TFLite.
+
+    Returns
+    -------
+    interpreter : Interpreter
+        Interpreter with its tensors allocated.
+
+    """
+    try:
+        import tensorflow as tf
+        Interpreter = tf.lite.Interpreter
+    except ImportError:
+        from tflite_runtime.interpreter import Interpreter
+    interpreter = Interpreter(model_path=model_path, num_threads=num_threads)
+    interpreter.allocate_tensors()
+    return interpreter
+
+
+def _iou_matrix(boxes):
+    """
+    Pairwise IoU of (ymin, xmin, ymax, xmax) boxes. Corners may come in either
+    order, and boxes with no area overlap nothing, as in TensorFlow's NMS.
+    """
+    y0 = np.minimum(boxes[:, 0], boxes[:, 2])
+    x0 = np.minimum(boxes[:, 1], boxes[:, 3])
+    y1 = np.maximum(boxes[:, 0], boxes[:, 2])
+    x1 = np.maximum(boxes[:, 1], boxes[:, 3])
+    area = (y1 - y0) * (x1 - x0)
+    ih = np.clip(np.minimum(y1[:, None], y1[None]) - np.maximum(y0[:, None], y0[None]), 0, None)
+    iw = np.clip(np.minimum(x1[:, None], x1[None]) - np.maximum(x0[:, None], x0[None]), 0, None)
+    inter = ih * iw
+    union = area[:, None] + area[None] - inter
+    valid = (area[:, None] > 0) & (area[None] > 0)
+    return np.where(valid, inter / np.where(union > 0, union, 1), 0)
+
+
+def nms_per_class(boxes, classes, scores, iou_thresh=0.5, score_thresh=0.6):
+    """
+    Non-maximum suppression within each class, in NumPy.
+
+    Selects the same detections as tf.image.combined_non_max_suppression on
+    the dense [1, N, classes, 4] layout (without clipping or a size limit),
+    but only looks at classes that have a detection above the threshold.
+
+    Parameters
+    ----------
+    boxes : np.float32
+        Array of shape (N, 4) with (ymin, xmin, ymax, xmax).
+    classes : np.int64
+        Class id of every detection.
+    scores : np.float32
+        Score of every detection.
+    iou_thresh : float, optional
+        Boxes overlapping a better box of their class by more than this are
+        dropped. The default is 0.5.
+    score_thresh : float, optional
+        Detections scoring this or less are dropped first. The default is 0.6.
+
+    Returns
+    -------
+    keep : np.int64
+        Indices of the kept detections, highest score first.
+
+    """
+    candidates = np.flatnonzero(scores > score_thresh)
+    if len(candidates) == 0:
+        return candidates
+    # Highest score first, ties by index as TensorFlow does
+    candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+    candidate_classes = classes[candidates]
+    keep = []
+    for c in np.unique(candidate_classes):
+        order = candidates[candidate_classes == c]
+        if len(order) == 1:
+            keep.append(order)
+            continue
+        overlaps = _iou_matrix(boxes[order].astype(np.float32)) > iou_thresh
+        kept = np.ones(len(order), dtype=bool)
+        for i in range(len(order)):
+            if kept[i]:
+                kept[i + 1:] &= ~overlaps[i, i + 1:]
+        keep.append(order[kept])
+    keep = np.concatenate(keep)
+    return keep[np.argsort(-scores[keep], kind='stable')]
+
+
+class SsdDetector:
+    """
+    One SSD MobileNet interpreter with its input buffer. Interpreters are not
+    thread-safe, so every thread needs its own detector.
+    """
+
+    def __init__(self, model_path=SSD_MODEL_PATH, num_threads=None, label_path=SSD_LABELS_PATH):
+        self.interpreter = make_interpreter(model_path, num_threads)
+        input_details = self.interpreter.get_input_details()[0]
+        self.input_index = input_details['index']
+        self.input_dtype = input_details['dtype']
+        _, self.height, self.width, _ = input_details['shape']
+        # boxes, classes, scores, count
+        self.output_indices = [d['index'] for d in self.interpreter.get_output_details()[:4]]
+        self.labels = load_labels(label_path)
+        ids = {name: i for i, name in self.labels.items()}
+        self.person_id = ids['person']
+        self.phone_id = ids['cell phone']
+
+    def preprocess(self, image):
+        """
+        Converts a BGR frame into the model's RGB input batch of one.
+        """
+        img = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        img = cv2.resize(img, (int(self.width), int(self.height)), interpolation=cv2.INTER_AREA)
+        if self.input_dtype == np.float32:
+            img = (img.astype(np.float32) - 127.5) / 127.5
+        return img[np.newaxis]
+
+    def detect(self, image):
+        """
+        Run the model on one BGR frame.
+
+        Parameters
+        ----------
+        image : np.uint8
+            Frame to detect objects in.
+
+        Returns
+        -------
+        boxes : np.float32
+            Array of shape (N, 4) with normalized (ymin, xmin, ymax, xmax).
+        classes : np.int64
+            Class id of every detection.
+        scores : np.float32
+            Score of every detection, highest first.
+
+        """
+        self.interpreter.set_tensor(self.input_index, self.preprocess(image))
+        self.interpreter.invoke()
+        boxes, classes, scores, count = (self.interpreter.get_tensor(i)[0] for i in self.output_indices)
+        n = int(count)
+        return boxes[:n], classes[:n].astype(np.int64), scores[:n]
+
+    def summarize(self, classes, scores, score_thresh=0.5, boxes=None, shape=None):
+        """
+        Turns the detections of one frame into the same proctoring flags and
+        per-class "detections" as person_and_phone.summarize_detections.
+        """
+        keep = scores >= score_thresh
+        classes, scores = classes[keep], scores[keep]
+        if boxes is not None:
+            # (ymin, xmin, ymax, xmax) to (x, y, x1, y1)
+            boxes = boxes[keep][:, [1, 0, 3, 2]]
+            if shape is not None:
+                height, width = shape[:2]
+                boxes = np.round(boxes * [width, height, width, height]).astype(np.int64)
+
+        detections = {}
+        for label, class_id in (('person', self.person_id), ('cell phone', self.phone_id)):
+            mask = classes == class_id
+            detections[label] = {
+                "count": int(np.count_nonzero(mask)),
+                "scores": [round(float(v), 4) for v in scores[mask]],
+                "boxes": boxes[mask].tolist() if boxes is not None else [],
+            }
+
+        kept = (classes == self.person_id) | (classes == self.phone_id)
+        return {
+            "person_count": detections['person']["count"],
+            "phone_detected": detections['cell phone']["count"] > 0,
+            "score": float(scores[kept].max()) if kept.any() else None,
+            "detections": detections,
+            "status": "success"
+        }
+
+    def process_frame_for_proctoring(self, image, score_thresh=0.5):
+        """
+        Analyzes a single image frame for proctoring violations.
+        """
+        try:
+            boxes, classes, scores = self.detect(image)
+            return self.summarize(classes, scores, score_thresh, boxes, image.shape)
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+Parallel version of VideoPipeline.run for recorded videos.
+
+Three stages overlap instead of running one after another:
+
+    decode     a FrameReader thread fills a bounded queue of frames
+    infer      a pool of threads (or processes) runs face detection,
+               landmarks and every stage that does not depend on frame order
+    sink       the calling thread collects results in frame order and runs
+               the ordered stages (e.g. mouth calibration) on them
+
+TensorFlow and OpenCV release the GIL, so threads already spread the work
+over several cores; the process pool is there for stages that do not.
+"""
+
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from face_detector import get_face_detector
+from frame_reader import FrameReader, StageStats
+from video_pipeline import VideoPipeline, default_stages, build_result
+
+_local = threading.local()
+
+
+def _worker_pipeline(stages_factory):
+    """Per-thread (or per-process) pipeline with its own face detector"""
+    pipeline = getattr(_local, 'pipeline', None)
+    if pipeline is None:
+        stages = [s for s in stages_factory() if not getattr(s, 'ordered', False)]
+        # OpenCV dnn nets are not thread-safe, so each worker gets its own
+        pipeline = _local.pipeline = VideoPipeline(stages, face_model=get_face_detector())
+    return pipeline
+
+
+def _infer(stages_factory, index, timestamp, img):
+    start = time.perf_counter()
+    ctx, record = _worker_pipeline(stages_factory).analyze_frame(index, timestamp, img)
+    # Ordered stages work from faces and landmarks; do not ship the image back
+    ctx.img = None
+    return ctx, record, (time.perf_counter() - start) * 1000
+
+
+class StagedPipeline:
+    """
+    Decode, infer and collect a video in overlapping stages
+
+    Parameters
+    ----------
+    workers : int, optional
+        Inference workers. The default is 2.
+    mode : string, optional
+        'thread' or 'process'. Processes load their own models on first use.
+        The default is 'thread'.
+    max_queue : int, optional
+        Decoded frames buffered ahead of the workers, and results allowed to
+        wait for the sink beyond one per worker. The default is 8.
+    stages_factory : callable, optional
+        Returns a fresh list of stages, see video_pipeline. Must be a module
+        level function in process mode. The default is default_stages.
+
+    """
+
+    def __init__(self, workers=2, mode='thread', max_queue=8, stages_factory=default_stages):
+        if mode not in ('thread', 'process'):
+            raise ValueError(f"mode must be 'thread' or 'process', not {mode!r}")
+        self.workers = max(1, workers)
+        self.mode = mode
+        self.max_queue = max(1, max_queue)
+        self.stages_factory = stages_factory
+        self._pool = None
+        # run() may be called from several job threads at once
+        self._pool_lock = threading.Lock()
+
+    def _get_pool(self):
+        with self._pool_lock:
+            if self._pool is None:
+                if self.mode == 'process':
+                    # TensorFlow does not survive fork, so start clean interpreters
+                    context = multiprocessing.get_context('spawn')
+                    self._pool = ProcessPoolExecutor(self.workers, mp_context=context)
+                else:
+                    self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix='video-infer')
+            return self._pool
+
+    def close(self):
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def run(self, video_path, progress=None, sampling=None):
+        """
+        Analyze a whole video, like VideoPipeline.run
+
+        Returns
+        -------
+        result : dict
+            Same as VideoPipeline.run, plus 'stats': decode, infer and sink
+            latency, end-to-end frame latency and throughput.
+
+        """
+        pool = self._get_pool()
+        reader = FrameReader(video_path, self.max_queue, sampling)
+        sink_stages = [s for s in self.stages_factory() if getattr(s, 'ordered', False)]
+        infer, sink, latency = StageStats(), StageStats(), StageStats()
+        records = []
+        pending = deque()
+
+        def finish():
+            submitted, future = pending.popleft()
+            ctx, record, infer_ms = future.result()
+            infer.add(infer_ms)
+            start = time.perf_counter()
+            for stage in sink_stages:
+                stage(ctx, record)
+            records.append(record)
+            done = time.perf_counter()
+            sink.add((done - start) * 1000)
+            latency.add((done - submitted) * 1000)
+            if progress is not None:
+                progress(reader.frames, reader.total)
+
+        start = time.perf_counter()
+        try:
+            for index, timestamp, img in reader:
+                pending.append((time.perf_counter(),
+                                pool.submit(_infer, self.stages_factory, index, timestamp, img)))
+                # Keep the workers busy but bound the frames held in memory;
+                # results are taken strictly in submission order
+                while pending and (len(pending) > self.workers + self.max_queue or pending[0][1].done()):
+                    finish()
+            while pending:
+                finish()
+        finally:
+            reader.release()
+            for _, future in pending:
+                future.cancel()
+        elapsed = time.perf_counter() - start
+
+        result = build_result(video_path, reader.fps, reader.frames, reader.sampler, records)
+        result['stats'] = {
+            'mode': self.mode,
+            'workers': self.workers,
+            'elapsed_s': round(elapsed, 3),
+            'analyzed_fps': round(len(records) / elapsed, 2) if elapsed else None,
+            'video_fps': round(reader.frames / elapsed, 2) if elapsed else None,
+            'decode': reader.decode.to_dict(),
+            'infer': infer.to_dict(),
+            'sink': sink.to_dict(),
+            'latency': latency.to_dict(),
+        }
+        return result
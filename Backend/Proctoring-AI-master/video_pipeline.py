@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+"""
+Single-pass analysis of a recorded video.
+
+The standalone tools (track_eye, detect_head_pose, mouth_opening_detector and
+detect_phone_and_person) each open the video and run their own detectors, so a
+recording is decoded four times and faces and landmarks are found three times
+per frame. VideoPipeline decodes every frame once, runs face detection and
+landmarks once, and hands the shared results to each analysis stage. The
+output is one merged, JSON-serializable timeline.
+
+A sampler from frame_sampling decides which frames are analyzed; the others
+are filled in from the nearest analyzed frame.
+"""
+
+import threading
+
+import cv2
+import numpy as np
+from face_detector import find_faces, get_face_detector
+from face_landmarks import detect_marks_batch
+from detectors import get_face_model, get_landmarks_model
+from eye_tracker import EyeBuffers, gaze_for_face
+from head_pose_estimation import get_camera_matrix, estimate_head_pose
+from mouth_opening_detector import mouth_distances, is_mouth_open
+from frame_sampling import make_sampler, fill_timeline, sampled_frames
+
+_local = threading.local()
+
+
+class FrameContext:
+    """
+    Everything the stages share about one decoded frame
+
+    Parameters
+    ----------
+    index : int
+        Frame number in the video
+    timestamp : float
+        Position of the frame in seconds
+    img : Array of uint8
+        BGR frame
+    faces : list
+        Face boxes (x, y, x1, y1)
+    marks : list
+        Facial landmarks, one array per face
+
+    """
+
+    def __init__(self, index, timestamp, img, faces, marks):
+        self.index = index
+        self.timestamp = timestamp
+        self.img = img
+        self.faces = faces
+        self.marks = marks
+
+
+class GazeStage:
+    """Eye direction of every face, as in track_eye"""
+
+    name = 'gaze'
+
+    def __init__(self, threshold=75):
+        self.threshold = threshold
+        self.buffers = EyeBuffers()
+
+    def __call__(self, ctx, record):
+        for face, shape in zip(record['faces'], ctx.marks):
+            result, _ = gaze_for_face(ctx.img, shape, self.threshold, self.buffers)
+            face['gaze'] = result['gaze']
+            face['gaze_confidence'] = result['confidence']
+
+
+class HeadPoseStage:
+    """Head angles of every face, as in detect_head_pose"""
+
+    name = 'head_pose'
+
+    def __init__(self):
+        self.camera_matrix = None
+        self._size = None
+
+    def __call__(self, ctx, record):
+        # Workers reuse stages across videos, which may differ in size
+        if self._size != ctx.img.shape[:2]:
+            self._size = ctx.img.shape[:2]
+            self.camera_matrix = get_camera_matrix(ctx.img.shape)
+        for face, marks in zip(record['faces'], ctx.marks):
+            pose, _ = estimate_head_pose(ctx.img, marks, self.camera_matrix)
+            face['head_pose'] = pose
+
+
+class MouthStage:
+    """
+    Mouth opening of every face, as in mouth_opening_detector
+
+    The interactive tool records the closed-mouth distances when a key is
+    pressed. Here they are averaged over the first calibration_frames frames
+    showing a single face; mouth_open is None until then.
+    """
+
+    name = 'mouth'
+    # Calibration depends on frame order, so parallel runners keep this stage in order
+    ordered = True
+
+    def __init__(self, calibration_frames=10):
+        self.calibration_frames = calibration_frames
+        self._outer = []
+        self._inner = []
+        self.d_outer = None
+        self.d_inner = None
+
+    def __call__(self, ctx, record):
+        if self.d_outer is None and len(ctx.marks) == 1:
+            outer, inner = mouth_distances(ctx.marks[0])
+            self._outer.append(outer)
+            self._inner.append(inner)
+            if len(self._outer) >= self.calibration_frames:
+                self.d_outer = np.mean(self._outer, axis=0).tolist()
+                self.d_inner = np.mean(self._inner, axis=0).tolist()
+        for face, shape in zip(record['faces'], ctx.marks):
+            if self.d_outer is None:
+                face['mouth_open'] = None
+            else:
+                face['mouth_open'] = bool(is_mouth_open(shape, self.d_outer, self.d_inner))
+
+
+class ObjectStage:
+    """People and phones in the frame, as in detect_phone_and_person"""
+
+    name = 'objects'
+
+    def __call__(self, ctx, record):
+        from person_and_phone import process_frame_for_proctoring
+        result = process_frame_for_proctoring(ctx.img)
+        record['person_count'] = result.get('person_count')
+        record['phone_detected'] = result.get('phone_detected')
+        if result.get('status') != 'success':
+            record['objects_error'] = result.get('message')
+
+
+def default_stages():
+    """A fresh instance of every stage; stages keep per-video state"""
+    return [GazeStage(), HeadPoseStage(), MouthStage(), ObjectStage()]
+
+
+def summarize_timeline(timeline):
+    """Number of frames showing each kind of suspicious behaviour"""
+    summary = {
+        'frames': len(timeline),
+        'no_face': 0,
+        'multiple_faces': 0,
+        'gaze_away': 0,
+        'head_away': 0,
+        'mouth_open': 0,
+        'phone_detected': 0,
+        'multiple_people': 0,
+    }
+    for record in timeline:
+        faces = record['faces']
+        if not faces:
+            summary['no_face'] += 1
+        elif len(faces) > 1:
+            summary['multiple_faces'] += 1
+        if any(f.get('gaze') not in (None, 'center') for f in faces):
+            summary['gaze_away'] += 1
+        if any(f.get('head_pose') and (f['head_pose']['vertical'] or f['head_pose']['horizontal'])
+               for f in faces):
+            summary['head_away'] += 1
+        if any(f.get('mouth_open') for f in faces):
+            summary['mouth_open'] += 1
+        if record.get('phone_detected'):
+            summary['phone_detected'] += 1
+        if (record.get('person_count') or 0) > 1:
+            summary['multiple_people'] += 1
+    return summary
+
+
+def build_result(video_path, fps, frames, sampler, records):
+    """Fill the analyzed records onto the full timeline and summarize it"""
+    timeline = fill_timeline(records, frames, fps, sampler.fill)
+    policy = sampler.policy()
+    policy['analyzed_frames'] = len(records)
+    return {
+        'video': str(video_path),
+        'fps': fps,
+        'frames': frames,
+        'sampling': policy,
+        'timeline': timeline,
+        'summary': summarize_timeline(timeline),
+    }
+
+
+class VideoPipeline:
+    """
+    Decode once, detect faces and landmarks once, then fan out to the stages
+
+    Parameters
+    ----------
+    stages : list, optional
+        Callables taking (FrameContext, record) that add their results to the
+        record. The default is default_stages().
+    face_model : cv2.dnn_Net, optional
+        Face detector. The default is the shared model from detectors.
+    landmark_model : Tensorflow model, optional
+        Facial landmark model. The default is the shared model from detectors.
+
+    """
+
+    def __init__(self, stages=None, face_model=None, landmark_model=None):
+        self.stages = default_stages() if stages is None else stages
+        self.face_model = face_model
+        self.landmark_model = landmark_model
+
+    def process_frame(self, index, timestamp, img):
+        """
+        Analyze one decoded frame
+
+        Returns
+        -------
+        record : dict
+            'frame', 'time', and per-face results under 'faces', plus any
+            frame-level fields the stages add
+
+        """
+        return self.analyze_frame(index, timestamp, img)[1]
+
+    def analyze_frame(self, index, timestamp, img):
+        """process_frame, also returning the FrameContext the stages saw"""
+        if self.face_model is None:
+            self.face_model = get_face_model()
+        if self.landmark_model is None:
+            self.landmark_model = get_landmarks_model()
+
+        faces = find_faces(img, self.face_model)
+        marks = detect_marks_batch(img, self.landmark_model, faces)
+        ctx = FrameContext(index, timestamp, img, faces, marks)
+        record = {
+            'frame': index,
+            'time': round(timestamp, 3),
+            'faces': [{'box': [int(v) for v in face]} for face in faces],
+        }
+        for stage in self.stages:
+            stage(ctx, record)
+        return ctx, record
+
+    def run(self, video_path, progress=None, sampling=None):
+        """
+        Analyze a whole video
+
+        Parameters
+        ----------
+        video_path : string or int
+            Video file, URL or camera index
+        progress : callable, optional
+            Called with (frames_done, total_frames) after every frame;
+            total_frames is 0 when the container does not report it.
+        sampling : string or Sampler, optional
+            Which frames to analyze, see frame_sampling.make_sampler. The
+            default is every frame.
+
+        Returns
+        -------
+        result : dict
+            'video', 'fps', 'frames', the 'sampling' policy with the number of
+            'analyzed_frames', the per-frame 'timeline' and a 'summary'
+
+        """
+        sampler = make_sampler(sampling)
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            raise IOError(f"Could not open video {video_path}")
+        fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        sampler.reset(fps)
+
+        records = []
+        frames = 0
+        try:
+            for index, timestamp, img in sampled_frames(cap, sampler, fps):
+                frames = index + 1
+                if img is not None:
+                    records.append(self.process_frame(index, timestamp, img))
+                if progress is not None:
+                    progress(frames, total)
+        finally:
+            cap.release()
+
+        return build_result(video_path, fps, frames, sampler, records)
+
+
+def _thread_face_model():
+    """Face detector of the calling thread; OpenCV dnn nets are not thread-safe"""
+    model = getattr(_local, 'face_model', None)
+    if model is None:
+        model = _local.face_model = get_face_detector()
+    return model
+
+
+def analyze_video(video_path, progress=None, sampling=None):
+    """
+    VideoPipeline.run with fresh stages, see there. Job threads may call this
+    at the same time, so each thread uses its own face detector.
+    """
+    return VideoPipeline(face_model=_thread_face_model()).run(video_path, progress, sampling)
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""
+YoloV3 input sizes, shared by person_and_phone and the backend.
+
+YOLO_INPUT_SIZES lists the resolutions frames are letterboxed into, largest
+first: 320 is the cheapest, 608 finds the smallest objects. Frames use the
+first one and the backend drops to the next under load. This module does not
+import TensorFlow, so the backend can read the setting without loading YOLO.
+"""
+
+import os
+
+DEFAULT_INPUT_SIZES = '416,320'
+
+
+def parse_input_sizes(value):
+    """
+    Input sizes from a comma-separated list such as "416,320".
+
+    Parameters
+    ----------
+    value : string
+        Sizes separated by commas. Every size must be a positive multiple of
+        32, the stride of YoloV3's coarsest output.
+
+    Returns
+    -------
+    sizes : tuple
+        The distinct sizes, largest first.
+
+    """
+    sizes = set()
+    for item in value.split(','):
+        if not item.strip():
+            continue
+        size = int(item)
+        if size <= 0 or size % 32:
+            raise ValueError(f"YOLO input size must be a positive multiple of 32, got {size}")
+        sizes.add(size)
+    if not sizes:
+        raise ValueError(f"No YOLO input size in {value!r}")
+    return tuple(sorted(sizes, reverse=True))
+
+
+YOLO_INPUT_SIZES = parse_input_sizes(os.getenv('YOLO_INPUT_SIZES', DEFAULT_INPUT_SIZES))
+YOLO_INPUT_SIZE = YOLO_INPUT_SIZES[0]
@@ -0,0 +1,346 @@
+# -*- coding: utf-8 -*-
+"""
+Smaller, faster YoloV3 for CPU workers: batch norm folded into the
+convolutions and the result exported to TFLite in float16 or post-training
+INT8, calibrated on our own frames, plus the regression check that compares
+the person/phone detections of an export with the float32 Keras model.
+
+Export and check (needs models/yolov3.weights), from Proctoring-AI-master:
+    python yolo_tflite.py
+    python yolo_tflite.py --variants int8 --calibration 200 --min-agreement 0.97
+    python yolo_tflite.py --skip-export --eval 300
+
+The exported models keep float input and output and include the NMS head, so
+TfliteYolo returns the same summaries as process_frame_for_proctoring.
+The NMS ops run through TensorFlow's Flex delegate, so they need the
+tf.lite.Interpreter of a full TensorFlow install.
+"""
+
+import argparse
+import glob
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+import tensorflow as tf
+
+from person_and_phone import (MODELS_DIR, YoloV3, load_yolo_weights, preprocess_frame,
+                              summarize_detections, YOLO_POSTPROCESS, YOLO_SCORE_THRESHOLD)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+EXPORT_SIZE = 416
+# Sub-models holding convolutions, as in load_darknet_weights
+YOLO_LAYERS = ('yolo_darknet', 'yolo_conv_0', 'yolo_output_0', 'yolo_conv_1',
+               'yolo_output_1', 'yolo_conv_2', 'yolo_output_2')
+VARIANTS = ('float16', 'int8')
+
+
+def export_path(variant, models_dir=MODELS_DIR):
+    return os.path.join(models_dir, 'yolov3_{}.tflite'.format(variant))
+
+
+def _conv_layers(sub_model):
+    """
+    Conv2D layers of a sub-model in order, each with the BatchNormalization
+    layer that follows it (or None).
+    """
+    layers = sub_model.layers
+    pairs = []
+    for i, layer in enumerate(layers):
+        if not isinstance(layer, tf.keras.layers.Conv2D):
+            continue
+        batch_norm = None
+        if i + 1 < len(layers) and isinstance(layers[i + 1], tf.keras.layers.BatchNormalization):
+            batch_norm = layers[i + 1]
+        pairs.append((layer, batch_norm))
+    return pairs
+
+
+def fold_batch_norm(model, size=EXPORT_SIZE, postprocess=YOLO_POSTPROCESS,
+                    score_threshold=YOLO_SCORE_THRESHOLD):
+    """
+    Builds the fused YoloV3 layout and fills it from ``model``: every
+    convolution followed by batch norm gets kernel * scale and bias
+    beta - mean * scale, with scale = gamma / sqrt(variance + epsilon).
+
+    Parameters
+    ----------
+    model : tf.keras.Model
+        YoloV3 with its weights loaded.
+    size : int, optional
+        Fixed input size of the fused model. The default is EXPORT_SIZE.
+    postprocess : string, optional
+        NMS head of the fused model, 'proctoring' or 'all'.
+    score_threshold : float, optional
+        Score threshold of the 'proctoring' head.
+
+    Returns
+    -------
+    fused : tf.keras.Model
+        Model computing the same outputs without batch norm layers.
+
+    """
+    fused = YoloV3(size=size, fused=True, postprocess=postprocess, score_threshold=score_threshold)
+    for name in YOLO_LAYERS:
+        source = _conv_layers(model.get_layer(name))
+        target = [conv for conv, _ in _conv_layers(fused.get_layer(name))]
+        assert len(source) == len(target), 'layouts of {} differ'.format(name)
+        for (conv, batch_norm), fused_conv in zip(source, target):
+            weights = conv.get_weights()
+            if batch_norm is None:
+                fused_conv.set_weights(weights)
+                continue
+            gamma, beta, mean, variance = batch_norm.get_weights()
+            scale = gamma / np.sqrt(variance + batch_norm.epsilon)
+            bias = weights[1] * scale if len(weights) > 1 else 0
+            fused_conv.set_weights([weights[0] * scale, beta - mean * scale + bias])
+    return fused
+
+
+def model_input(image):
+    """The batch of one the exported models take for a BGR frame."""
+    return preprocess_frame(image, EXPORT_SIZE)[np.newaxis]
+
+
+def load_frames(paths, count, step=1, offset=0):
+    """
+    Up to ``count`` frames from videos and images: every ``step``-th frame of
+    each video and every ``step``-th image, starting at ``offset``, so
+    calibration and evaluation can take disjoint frames from the same sources.
+    """
+    frames = []
+    image_index = 0
+    for path in paths:
+        if len(frames) >= count:
+            break
+        if path.lower().endswith(('.jpg', '.jpeg', '.png')):
+            if image_index % step == offset:
+                img = cv2.imread(path)
+                if img is not None:
+                    frames.append(img)
+            image_index += 1
+            continue
+        cap = cv2.VideoCapture(path)
+        index = 0
+        while len(frames) < count:
+            ret, img = cap.read()
+            if not ret:
+                break
+            if index % step == offset:
+                frames.append(img)
+            index += 1
+        cap.release()
+    return frames
+
+
+def default_frame_sources():
+    return (sorted(glob.glob(os.path.join(BASE_DIR, 'eye_tracking', '*.mp4'))) +
+            sorted(glob.glob(os.path.join(BASE_DIR, 'face_detection', 'faces', '*.jpg'))))
+
+
+def export_tflite(fused, path, variant, calibration=None):
+    """
+    Converts the fused model to TFLite.
+
+    Parameters
+    ----------
+    fused : tf.keras.Model
+        Model from fold_batch_norm.
+    path : string
+        Where to write the .tflite file.
+    variant : string
+        'float16' (weights stored as float16) or 'int8' (weights and
+        activations quantized, calibrated on ``calibration``).
+    calibration : list, optional
+        BGR frames for the INT8 calibration.
+
+    Returns
+    -------
+    size : int
+        Size of the written file in bytes.
+
+    """
+    size = EXPORT_SIZE
+
+    @tf.function(input_signature=[tf.TensorSpec([1, size, size, 3], tf.float32, name='images')])
+    def serve(images):
+        boxes, scores, classes, valid = fused(images, training=False)
+        return {'boxes': boxes, 'scores': scores, 'classes': classes, 'valid_detections': valid}
+
+    # Going through a SavedModel keeps the named signature for the interpreter
+    with tempfile.TemporaryDirectory() as saved_model:
+        module = tf.Module()
+        module.model = fused
+        tf.saved_model.save(module, saved_model, signatures={'serving_default': serve})
+        converter = tf.lite.TFLiteConverter.from_saved_model(saved_model)
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        if variant == 'float16':
+            converter.target_spec.supported_types = [tf.float16]
+            converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS,
+                                                   tf.lite.OpsSet.SELECT_TF_OPS]
+        elif variant == 'int8':
+            if not calibration:
+                raise ValueError('INT8 export needs calibration frames')
+
+            def representative_dataset():
+                for img in calibration:
+                    yield [model_input(img)]
+
+            converter.representative_dataset = representative_dataset
+            converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8,
+                                                   tf.lite.OpsSet.TFLITE_BUILTINS,
+                                                   tf.lite.OpsSet.SELECT_TF_OPS]
+        else:
+            raise ValueError('Unknown variant: {}'.format(variant))
+        data = converter.convert()
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return len(data)
+
+
+class TfliteYolo:
+    """
+    One interpreter for an exported YoloV3. Interpreters are not
+    thread-safe, so every thread needs its own.
+    """
+
+    def __init__(self, model_path, num_threads=None):
+        self.interpreter = tf.lite.Interpreter(model_path=model_path, num_threads=num_threads)
+        self.runner = self.interpreter.get_signature_runner('serving_default')
+
+    def process_frame_for_proctoring(self, image, score_thresh=None):
+        """
+        Same summary as person_and_phone.process_frame_for_proctoring;
+        ``score_thresh`` optionally drops weaker detections on top of the
+        threshold built into the model.
+        """
+        try:
+            out = self.runner(images=model_input(image))
+            boxes, scores, classes = out['boxes'][0], out['scores'][0], out['classes'][0]
+            n = int(out['valid_detections'][0])
+            if score_thresh is not None:
+                keep = scores[:n] >= score_thresh
+                boxes, scores, classes, n = boxes[:n][keep], scores[:n][keep], classes[:n][keep], int(keep.sum())
+            return summarize_detections(scores, classes, n, boxes, image.shape, EXPORT_SIZE)
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+
+
+def _iou(a, b):
+    x0, y0 = max(a[0], b[0]), max(a[1], b[1])
+    x1, y1 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0, x1 - x0) * max(0, y1 - y0)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def compare(reference, candidate):
+    """
+    Regression metrics of ``candidate`` summaries against ``reference`` ones
+    (from process_frame_for_proctoring), frame by frame.
+
+    Returns
+    -------
+    metrics : dict
+        Share of frames with the same person count, the same phone flag and
+        both, and the mean best IoU of the reference person boxes.
+
+    """
+    pairs = [(r, c) for r, c in zip(reference, candidate)
+             if r['status'] == 'success' and c['status'] == 'success']
+    n = max(len(pairs), 1)
+    ious = []
+    for r, c in pairs:
+        candidate_boxes = c['detections']['person']['boxes']
+        for box in r['detections']['person']['boxes']:
+            ious.append(max((_iou(box, other) for other in candidate_boxes), default=0.0))
+    return {
+        'frames': len(pairs),
+        'errors': len(reference) - len(pairs),
+        'person_count': sum(r['person_count'] == c['person_count'] for r, c in pairs) / n,
+        'phone': sum(r['phone_detected'] == c['phone_detected'] for r, c in pairs) / n,
+        'both': sum(r['person_count'] == c['person_count'] and r['phone_detected'] == c['phone_detected']
+                    for r, c in pairs) / n,
+        'person_iou': float(np.mean(ious)) if ious else None,
+    }
+
+
+def _timed(fn, frames):
+    start = time.perf_counter()
+    results = [fn(img) for img in frames]
+    return results, (time.perf_counter() - start) / max(len(frames), 1) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--variants', nargs='+', choices=VARIANTS, default=list(VARIANTS))
+    parser.add_argument('--sources', nargs='+', default=default_frame_sources(),
+                        help='videos and images to draw calibration and evaluation frames from')
+    parser.add_argument('--calibration', type=int, default=100, help='calibration frames for int8')
+    parser.add_argument('--eval', type=int, default=100, help='frames for the regression check')
+    parser.add_argument('--step', type=int, default=10, help='use every step-th video frame and image')
+    parser.add_argument('--threads', type=int, default=2, help='interpreter threads')
+    parser.add_argument('--min-agreement', type=float, default=0.95,
+                        help='fail if person count and phone flag agree on fewer frames')
+    parser.add_argument('--skip-export', action='store_true', help='only check existing exports')
+    args = parser.parse_args()
+    if args.step < 2:
+        parser.error('--step must be at least 2 so calibration and evaluation frames differ')
+
+    model = YoloV3(size=EXPORT_SIZE, postprocess=YOLO_POSTPROCESS, score_threshold=YOLO_SCORE_THRESHOLD)
+    if not load_yolo_weights(model):
+        parser.error('YoloV3 weights are required')
+
+    # Calibration and evaluation use different frames and images
+    calibration = load_frames(args.sources, args.calibration, args.step, 0)
+    evaluation = load_frames(args.sources, args.eval, args.step, args.step // 2)
+    if not evaluation:
+        parser.error('no evaluation frames could be read')
+
+    def keras_fn(m):
+        infer = tf.function(lambda x: m(x, training=False))
+
+        def run(img):
+            boxes, scores, classes, nums = (np.asarray(t)[0] for t in infer(model_input(img)))
+            return summarize_detections(scores, classes, nums, boxes, img.shape, EXPORT_SIZE)
+        return run
+
+    reference, ms = _timed(keras_fn(model), evaluation)
+    print('{:<10}{:>10}{:>10}{:>8}{:>8}{:>8}{:>10}'.format(
+        'model', 'MB', 'ms/frame', 'people', 'phone', 'both', 'IoU'))
+    print('{:<10}{:>10}{:>10.1f}'.format('float32', '-', ms))
+
+    fused = fold_batch_norm(model)
+    rows = [('fused', None, fused)]
+    for variant in args.variants:
+        path = export_path(variant)
+        if not args.skip_export:
+            export_tflite(fused, path, variant, calibration)
+        if not os.path.exists(path):
+            print('{:<10} missing {}'.format(variant, path))
+            continue
+        rows.append((variant, os.path.getsize(path), TfliteYolo(path, args.threads)))
+
+    failed = False
+    for name, size, candidate in rows:
+        fn = keras_fn(candidate) if name == 'fused' else candidate.process_frame_for_proctoring
+        fn(evaluation[0])
+        results, ms = _timed(fn, evaluation)
+        metrics = compare(reference, results)
+        iou = '{:.3f}'.format(metrics['person_iou']) if metrics['person_iou'] is not None else '-'
+        print('{:<10}{:>10}{:>10.1f}{:>8.1%}{:>8.1%}{:>8.1%}{:>10}'.format(
+            name, '{:.1f}'.format(size / 1e6) if size else '-', ms,
+            metrics['person_count'], metrics['phone'], metrics['both'], iou))
+        if metrics['both'] < args.min_agreement or metrics['errors']:
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,6 +3,8 @@ from fastapi.middleware.cors import CORSMiddleware
 from app.routes.analyze import router as analyze_router
 from app.routes.proctor import router as proctor_router
 from app.routes.interview import router as interview_router
+from app.utils.inference import executor
+from app.utils.event_log import event_log
 
 app = FastAPI(title="Repo Analyzer")
 
@@ -16,4 +18,17 @@ app.add_middleware(
 
 app.include_router(analyze_router) # No prefix here!
 app.include_router(proctor_router, prefix="/proctor", tags=["proctor"])
-app.include_router(interview_router, prefix="/interview", tags=["interview"])
\ No newline at end of file
+app.include_router(interview_router, prefix="/interview", tags=["interview"])
+
+@app.on_event("startup")
+def load_models():
+    # Load every detector once so no request pays the parse/build cost. Each
+    # inference worker loads PROCTOR_WARMUP_MODELS (per-thread models included)
+    # as it starts; process-mode workers load their own, so the parent stays light.
+    executor.start_workers()
+
+@app.on_event("shutdown")
+def stop_inference_workers():
+    executor.shutdown()
+    # Write out proctoring log rows still waiting for the next flush
+    event_log.close()
\ No newline at end of file
@@ -1,95 +1,348 @@
-import sys
+import asyncio
 import os
+from typing import Optional
 import cv2
-import numpy as np
-from fastapi import APIRouter, UploadFile, File
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, WebSocket
 import shutil
 
-# Add the Proctoring-AI-master folder to Python path so we can import its modules
-# Adjust this path if your folder name is different
-PROCTOR_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../Proctoring-AI-master"))
-if PROCTOR_PATH not in sys.path:
-    sys.path.append(PROCTOR_PATH)
-
-try:
-    # Try importing strict modules. If they fail due to TF errors, we catch it.
-    # Note: You might need to refactor these files to not run code on import!
-    from person_and_phone import process_frame_for_proctoring
-    YOLO_AVAILABLE = True
-except ImportError as e:
-    print(f"WARNING: Could not import Proctoring modules (YOLO): {e}")
-    YOLO_AVAILABLE = False
-    process_frame_for_proctoring = None
+# Importing the registry also puts the Proctoring-AI-master folder on the Python path
+from app.utils.models import registry
+from app.utils.inference import executor, InferenceOverloaded, OVERLOAD_RESPONSE, INFERENCE_MODE
+from app.utils.sessions import sessions
+from app.utils.event_log import event_log, query as query_log, report as log_report
+from app.utils.frames import decode_frame, input_spec, FACE_MIN_SIDE
+from app.utils.faces import detect_faces, detect_faces_scan
+from app.utils.objects import BACKENDS as OBJECT_BACKENDS, get_backend, stats as object_stats, yolo_input_size
 
+# Gaze check on /monitor needs the landmark model, so it is opt-in
+EYE_TRACKING_ENABLED = os.getenv("PROCTOR_EYE_TRACKING", "0") == "1"
+EYE_THRESHOLD = int(os.getenv("PROCTOR_EYE_THRESHOLD", "75"))
+# Track faces between keyframes for frames that belong to a session. Tracker
+# state lives in this process, so it needs thread-mode inference workers.
+TRACKING_ENABLED = os.getenv("PROCTOR_TRACKING", "1") == "1" and INFERENCE_MODE == "thread"
 
 router = APIRouter()
 
+# What each per-frame condition is reported as
+ISSUES = {
+    "no_face": "No face visible (Standard)",
+    "multiple_faces": "Multiple faces detected (Standard)",
+    "looking_left": "Looking left",
+    "looking_right": "Looking right",
+    "looking_up": "Looking up",
+    "phone": "Mobile Phone Detected!",
+    "multiple_people": "Multiple People Detected!",
+}
+
+@router.get("/input-spec")
+async def get_input_spec():
+    """Smallest frames the detectors need; clients downscale to this before uploading."""
+    return input_spec()
+
+@router.get("/models")
+async def model_stats():
+    """Load time, approximate memory and instance count for every registered detector."""
+    return registry.stats()
+
+@router.get("/sessions/{session_id}")
+async def session_stats(session_id: str):
+    """Frame, alert and keyframe/tracking counters of one proctoring session."""
+    session = sessions.find(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Unknown session")
+    return session.stats()
+
+@router.get("/sessions/{session_id}/report")
+def session_report(session_id: str):
+    """Per-condition frame counts and start/end events of a session, from its server-side log."""
+    columns = event_log.read(session_id)
+    if not len(columns["time"]):
+        raise HTTPException(status_code=404, detail="No proctoring data for this session")
+    result = log_report(columns)
+    for event in result["events"]:
+        event["issue"] = ISSUES.get(event["event"], event["event"])
+    result["session_id"] = session_id
+    result["alerts"] = len(result["events"])
+    return result
+
+@router.get("/sessions/{session_id}/log")
+def session_log(session_id: str, since: Optional[float] = None, until: Optional[float] = None,
+                kind: Optional[str] = None):
+    """Raw log rows of a session (kind: frame, start or end), as columns."""
+    return query_log(event_log.read(session_id), since, until, kind)
+
+@router.get("/inference/stats")
+async def inference_stats():
+    """Queue depth, wait time and run time of the inference worker pool, plus object detector stats."""
+    stats = executor.stats()
+    stats["object_detection"] = object_stats()
+    stats["sessions"] = sessions.stats()
+    stats["event_log"] = event_log.stats()
+    return stats
+
+def _overloaded(detail: str):
+    if OVERLOAD_RESPONSE == "503":
+        raise HTTPException(status_code=503, detail=detail)
+    return {"status": "skipped", "detail": detail}
+
+def _count_faces_jpeg(data: bytes):
+    """Decode (reduced to what face detection needs) and count faces; None if it is not an image."""
+    frame = decode_frame(data, FACE_MIN_SIDE)
+    if frame is None:
+        return None
+    return len(detect_faces(frame))
+
+def _gaze_issues(frame, faces):
+    tracker = registry.get("eye_tracker")
+    issues = []
+    for result in tracker.analyze(frame, faces, threshold=EYE_THRESHOLD):
+        if result["gaze"] in ("left", "right", "up"):
+            issues.append(f"looking_{result['gaze']}")
+    return issues
+
 @router.post("/initial-check")
 async def initial_check(file: UploadFile = File(...)):
     # Read image
     contents = await file.read()
-    nparr = np.frombuffer(contents, np.uint8)
-    frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-
-    if frame is None:
-        return {"status": "error", "detail": "Invalid image format"}
 
     try:
-        # Simple Logic: Use OpenCV Haar Cascade (Fast, no TensorFlow needed) 
+        # Simple Logic: face detection only (Haar or OpenCV DNN, no TensorFlow needed)
         # This is a fallback if the complex models fail, but guarantees it works on Python 3.13
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-        faces = face_cascade.detectMultiScale(gray, 1.1, 4)
+        face_count = await executor.run(_count_faces_jpeg, contents)
+
+        if face_count is None:
+            return {"status": "error", "detail": "Invalid image format"}
 
-        if len(faces) == 0:
+        if face_count == 0:
             return {"status": "fail", "detail": "No face detected"}
         
-        if len(faces) > 1:
+        if face_count > 1:
             return {"status": "fail", "detail": "Multiple faces detected"}
             
         return {"status": "ok", "detail": "Face Centered"}
 
+    except InferenceOverloaded as e:
+        return _overloaded(str(e))
     except Exception as e:
         print(f"Proctor Check Error: {e}")
         return {"status": "error", "detail": str(e)}
 
-@router.post("/monitor")
-async def monitor(file: UploadFile = File(...)):
-    contents = await file.read()
-    nparr = np.frombuffer(contents, np.uint8)
-    frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-    
-    if frame is None:
-        return {"status": "error"}
+def _detect(frame, gray, hint=None, detector=None, yolo_size=None):
+    """
+    Full detection: face boxes (around ``hint`` faces if given), whether only
+    the region around the hint was scanned, and the person/phone result of the
+    ``detector`` backend (None if it is unavailable), at input size
+    ``yolo_size`` for YOLO.
+    """
+    # Queue the frame for the next YOLO batch first so it overlaps with the face pass
+    # If the detector could not be loaded (no TF, missing weights) only the face check runs
+    object_future = None
+    backend = get_backend(detector)
+    if backend is not None:
+        object_future = backend.submit(frame, yolo_size)
 
-    # 1. Detection Logic
+    faces, roi_only = detect_faces_scan(frame, gray, hint=hint)
+
+    yolo_results = None
+    if object_future is not None:
+        try:
+            yolo_results = object_future.result()
+        except Exception as e:
+            print(f"Object Detection Error: {e}")
+    return faces, roi_only, yolo_results
+
+def _analyze_frame(frame, tracker=None, detector=None, yolo_size=None):
+    """
+    CPU-bound part of /monitor (face detection + YOLO). Runs on the inference executor,
+    never on the event loop. Returns the conditions seen in the frame, as
+    keys of ISSUES, with the face boxes, person count and strongest
+    person/phone score behind them.
+
+    With a session tracker, face detection and YOLO only run on keyframes;
+    other frames follow the faces by template matching and report face
+    conditions only (``keyframe`` is False), and most keyframes only scan
+    around the faces already known.
+    """
     gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-    faces = face_cascade.detectMultiScale(gray, 1.1, 4)
+    keyframe = True
+    if tracker is None:
+        faces, _, yolo_results = _detect(frame, gray, detector=detector, yolo_size=yolo_size)
+    else:
+        with tracker.lock:
+            faces = tracker.update(gray)
+            if faces is None:
+                hint = tracker.face_hint()
+                faces, roi_only, yolo_results = _detect(frame, gray, hint, detector, yolo_size)
+                tracker.keyframe(gray, faces, hinted=roi_only)
+            else:
+                keyframe = False
+                yolo_results = None
+
+    # 1. Detection Logic
+    face_count = len(faces)
     
     issues = []
 
     # Basic Face Check
-    if len(faces) == 0:
-        issues.append("No face visible (Standard)")
-    elif len(faces) > 1:
-        issues.append("Multiple faces detected (Standard)")
-    
-    # 2. Advanced Proctoring (YOLO - Person & Phone)
-    if YOLO_AVAILABLE and process_frame_for_proctoring:
+    if face_count == 0:
+        issues.append("no_face")
+    elif face_count > 1:
+        issues.append("multiple_faces")
+    elif EYE_TRACKING_ENABLED and registry.available("landmarks"):
         try:
-            yolo_results = process_frame_for_proctoring(frame)
-            if yolo_results.get("status") == "success":
-                if yolo_results.get("phone_detected"):
-                    issues.append("Mobile Phone Detected!")
-                if yolo_results.get("person_count", 0) > 1:
-                    issues.append("Multiple People Detected!")
-                # Optional: If YOLO says 0 people, but Haar says 1 face, trust Haar? 
-                # Or report mismatch. For now, rely on specific flags.
+            issues.extend(_gaze_issues(frame, faces))
         except Exception as e:
-            print(f"YOLO Inference Error: {e}")
+            print(f"Eye Tracking Error: {e}")
+    
+    # 2. Advanced Proctoring (YOLO - Person & Phone)
+    if yolo_results is not None and yolo_results.get("status") == "success":
+        if yolo_results.get("phone_detected"):
+            issues.append("phone")
+        if yolo_results.get("person_count", 0) > 1:
+            issues.append("multiple_people")
+        # Optional: If YOLO says 0 people, but Haar says 1 face, trust Haar? 
+        # Or report mismatch. For now, rely on specific flags.
+
+    people = score = None
+    if yolo_results is not None and yolo_results.get("status") == "success":
+        people = yolo_results.get("person_count")
+        score = yolo_results.get("score")
+    return {"issues": issues, "faces": faces, "people": people, "score": score, "keyframe": keyframe}
+
+def _session_tracker(session):
+    return session.tracker if TRACKING_ENABLED else None
+
+def _session_events(session, result):
+    """
+    Feed one frame's result to the session's event engine and log both;
+    returns the events it produced.
+    """
+    session.frames += 1
+    event_log.append_frame(session.id, session.frames, result["issues"], result["faces"], result["people"],
+                           result["score"])
+    events = []
+    for event in session.events.update(result["issues"], keyframe=result["keyframe"]):
+        event_log.append_event(session.id, session.frames, event)
+        event["issue"] = ISSUES.get(event["event"], event["event"])
+        if event["state"] == "start":
+            session.alerts += 1
+        events.append(event)
+    return events
+
+def _check_detector(detector: Optional[str]):
+    if detector is not None and detector not in OBJECT_BACKENDS:
+        raise HTTPException(status_code=400, detail=f"Unknown detector, expected one of: {', '.join(OBJECT_BACKENDS)}")
+
+@router.post("/monitor")
+async def monitor(file: UploadFile = File(...), session_id: Optional[str] = Form(None),
+                  detector: Optional[str] = Form(None)):
+    # detector overrides PROCTOR_OBJECT_BACKEND for this frame ("yolo", "yolo_tflite" or "ssd")
+    _check_detector(detector)
+    contents = await file.read()
+
+    # Frames sent with a session id share tracking state across requests, and
+    # get debounced start/end events instead of a per-frame verdict
+    session = sessions.get(session_id) if session_id else None
+    tracker = _session_tracker(session) if session is not None else None
+    try:
+        # Smaller YOLO input while the inference queue is backed up
+        yolo_size = yolo_input_size(executor.queue_depth())
+        result = await executor.run(_analyze_jpeg, contents, tracker, detector, yolo_size)
+    except InferenceOverloaded as e:
+        return _overloaded(str(e))
+
+    if result is None:
+        return {"status": "error"}
+
+    issues = result["issues"]
+    if session is not None:
+        events = _session_events(session, result)
+        started = [e["issue"] for e in events if e["state"] == "start"]
+        response = {"status": "alert" if started else "ok", "events": events,
+                    "active": session.events.active()}
+        if started:
+            response["issue"] = ", ".join(started)
+        return response
 
     if issues:
-        return {"status": "alert", "issue": ", ".join(issues)}
+        return {"status": "alert", "issue": ", ".join(ISSUES[i] for i in issues)}
     
-    return {"status": "ok"}
\ No newline at end of file
+    return {"status": "ok"}
+
+def _analyze_jpeg(data: bytes, tracker=None, detector=None, yolo_size=None):
+    """Decode (reduced if larger than needed) and analyze one frame; None if it is not an image."""
+    frame = decode_frame(data)
+    if frame is None:
+        return None
+    return _analyze_frame(frame, tracker, detector, yolo_size)
+
+@router.websocket("/stream")
+async def stream(websocket: WebSocket, session_id: Optional[str] = None, detector: Optional[str] = None):
+    """
+    Continuous proctoring over one WebSocket.
+
+    The client sends JPEG frames as binary messages. The server sends JSON:
+    {"type": "session"} once with the session id (reconnect with
+    ?session_id=... to keep the same session), then {"type": "event"} when
+    an issue starts or ends, debounced by the session's EventEngine. A frame arriving while the previous one
+    is still being analyzed replaces any frame already waiting, so a slow
+    server always works on the newest frame instead of building a backlog.
+    ?detector=yolo|yolo_tflite|ssd overrides the deployment's object detector.
+    """
+    if detector is not None and detector not in OBJECT_BACKENDS:
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
+    session = sessions.get(session_id)
+    session.connections += 1
+    await websocket.send_json({"type": "session", "session_id": session.id})
+
+    latest = {"data": None}
+    ready = asyncio.Event()
+
+    async def receive():
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            data = message.get("bytes")
+            if not data:
+                continue
+            if latest["data"] is not None:
+                session.dropped += 1
+            latest["data"] = data
+            session.touch()
+            ready.set()
+
+    async def analyze():
+        while True:
+            await ready.wait()
+            ready.clear()
+            data, latest["data"] = latest["data"], None
+            try:
+                result = await executor.run(_analyze_jpeg, data, _session_tracker(session), detector,
+                                            yolo_input_size(executor.queue_depth()))
+            except InferenceOverloaded:
+                session.dropped += 1
+                continue
+            if result is None:
+                await websocket.send_json({"type": "error", "detail": "Invalid image format"})
+                continue
+            for event in _session_events(session, result):
+                await websocket.send_json(dict(event, type="event", frame=session.frames))
+
+    tasks = [asyncio.ensure_future(receive()), asyncio.ensure_future(analyze())]
+    try:
+        # receive() returns on disconnect; analyze() only ends by failing
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if task.exception() is not None:
+                print(f"Proctor Stream Error: {task.exception()}")
+    finally:
+        for task in tasks:
+            task.cancel()
+        session.connections -= 1
+        session.touch()
+        # Nobody is watching any more, so open events end here rather than at expiry
+        if session.connections == 0:
+            session.close()
\ No newline at end of file
@@ -0,0 +1,110 @@
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List
+
+# A batch is flushed when it holds MAX_BATCH frames or its oldest frame has
+# waited MAX_WAIT_MS. Frames only meet in a batch if they are in flight at the
+# same time, so PROCTOR_INFERENCE_WORKERS should be at least MAX_BATCH.
+YOLO_MAX_BATCH = int(os.getenv("PROCTOR_YOLO_MAX_BATCH", "8"))
+YOLO_MAX_WAIT_MS = float(os.getenv("PROCTOR_YOLO_MAX_WAIT_MS", "20"))
+
+
+class MicroBatcher:
+    """
+    Collects items submitted from many threads and runs them through ``fn`` in batches.
+
+    ``fn`` takes a list of items and returns a list of results in the same
+    order. ``submit`` returns a ``concurrent.futures.Future`` per item. The
+    collector thread is started on first use, so the batcher also works in
+    forked worker processes.
+    """
+
+    def __init__(self, fn: Callable[[List[Any]], List[Any]], max_batch_size: int = YOLO_MAX_BATCH,
+                 max_wait_ms: float = YOLO_MAX_WAIT_MS, name: str = "batcher"):
+        self._fn = fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_ms = max(0.0, max_wait_ms)
+        self.name = name
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._sizes = Counter()
+        self._run_ms_total = 0.0
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+                self._pid = os.getpid()
+                self._thread.start()
+
+    def submit(self, item: Any) -> Future:
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self) -> None:
+        while True:
+            batch = self._collect()
+            # Skip items whose caller already gave up
+            batch = [(item, future) for item, future in batch if future.set_running_or_notify_cancel()]
+            if batch:
+                self._run(batch)
+
+    def _run(self, batch) -> None:
+        start = time.perf_counter()
+        try:
+            results = list(self._fn([item for item, _ in batch]))
+            if len(results) != len(batch):
+                raise RuntimeError(f"Batch function returned {len(results)} results for {len(batch)} items")
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+        with self._stats_lock:
+            self._batches += 1
+            self._items += len(batch)
+            self._sizes[len(batch)] += 1
+            self._run_ms_total += (time.perf_counter() - start) * 1000
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait_ms,
+                "batches": self._batches,
+                "items": self._items,
+                "avg_batch_size": round(self._items / self._batches, 2) if self._batches else None,
+                "avg_batch_run_ms": round(self._run_ms_total / self._batches, 2) if self._batches else None,
+                "batch_sizes": dict(sorted(self._sizes.items())),
+            }
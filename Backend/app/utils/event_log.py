@@ -0,0 +1,281 @@
+import hashlib
+import os
+import re
+import struct
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+# Append-only, per-session proctoring logs. Rows are buffered in memory and a
+# background thread appends them as one block per session every FLUSH_S
+# seconds (or sooner once MAX_ROWS rows are waiting), with a single fsync per
+# file per flush, so frames never wait on the disk.
+LOG_DIR = os.getenv("PROCTOR_LOG_DIR", os.path.abspath(os.path.join(os.path.dirname(__file__), "../../proctor_logs")))
+FLUSH_S = float(os.getenv("PROCTOR_LOG_FLUSH_S", "1.0"))
+MAX_ROWS = int(os.getenv("PROCTOR_LOG_MAX_ROWS", "4096"))
+
+# Bit positions in the conditions column. Append only: old logs rely on them.
+CONDITIONS = ("no_face", "multiple_faces", "looking_left", "looking_right", "looking_up",
+              "phone", "multiple_people")
+_BITS = {name: 1 << i for i, name in enumerate(CONDITIONS)}
+
+# Row kinds
+FRAME, EVENT_START, EVENT_END = 0, 1, 2
+KINDS = {FRAME: "frame", EVENT_START: "start", EVENT_END: "end"}
+
+# A block is a header followed by one array per column, then the face boxes
+# of all its rows as int16 (x, y, x1, y1). A torn block at the end of a file
+# (crash mid-write) is ignored on read.
+MAGIC = b"PLG1"
+_HEADER = struct.Struct("<4sII")  # magic, rows, boxes
+COLUMNS = (
+    ("time", "<f8"),         # unix time
+    ("frame", "<u4"),        # frame number within the session
+    ("kind", "u1"),          # FRAME, EVENT_START or EVENT_END
+    ("conditions", "<u2"),   # bitmask of CONDITIONS
+    ("faces", "u1"),         # number of faces
+    ("people", "u1"),        # people found by YOLO, 255 if unknown
+    ("score", "<f4"),        # strongest detection score, NaN if unknown
+    ("duration", "<f4"),     # seconds, for EVENT_END rows
+    ("boxes", "<u2"),        # face boxes of this row
+)
+
+_SAFE_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def conditions_mask(conditions: Iterable[str]) -> int:
+    mask = 0
+    for name in conditions:
+        mask |= _BITS.get(name, 0)
+    return mask
+
+
+def conditions_of(mask: int) -> List[str]:
+    return [name for name, bit in _BITS.items() if mask & bit]
+
+
+def _file_name(session_id: str) -> str:
+    # Session ids come from clients, so never use an unexpected one as a path
+    if not _SAFE_ID.match(session_id):
+        session_id = hashlib.sha256(session_id.encode("utf-8")).hexdigest()[:32]
+    return session_id + ".plog"
+
+
+class _Buffer:
+    def __init__(self):
+        self.rows: List[tuple] = []
+        self.boxes: List[List[int]] = []
+
+
+def _encode(buffer: _Buffer) -> bytes:
+    columns = list(zip(*buffer.rows))
+    parts = [_HEADER.pack(MAGIC, len(buffer.rows), len(buffer.boxes))]
+    for (_, dtype), values in zip(COLUMNS, columns):
+        parts.append(np.asarray(values, dtype=dtype).tobytes())
+    parts.append(np.asarray(buffer.boxes, dtype="<i2").reshape(-1, 4).tobytes())
+    return b"".join(parts)
+
+
+def _decode(data: bytes) -> Dict[str, np.ndarray]:
+    """Concatenated columns of every complete block in ``data``."""
+    columns: Dict[str, List[np.ndarray]] = {name: [] for name, _ in COLUMNS}
+    boxes: List[np.ndarray] = []
+    offset = 0
+    while offset + _HEADER.size <= len(data):
+        magic, rows, nboxes = _HEADER.unpack_from(data, offset)
+        size = _HEADER.size + sum(np.dtype(dtype).itemsize for _, dtype in COLUMNS) * rows + 8 * nboxes
+        if magic != MAGIC or offset + size > len(data):
+            break
+        pos = offset + _HEADER.size
+        for name, dtype in COLUMNS:
+            columns[name].append(np.frombuffer(data, dtype=dtype, count=rows, offset=pos))
+            pos += np.dtype(dtype).itemsize * rows
+        boxes.append(np.frombuffer(data, dtype="<i2", count=nboxes * 4, offset=pos).reshape(-1, 4))
+        offset += size
+    result = {name: (np.concatenate(parts) if parts else np.empty(0, dtype=dtype))
+              for (name, dtype), parts in zip(COLUMNS, columns.values())}
+    result["box_data"] = np.concatenate(boxes) if boxes else np.empty((0, 4), dtype="<i2")
+    return result
+
+
+class EventLog:
+    """
+    Buffered writer and reader of the per-session logs in ``directory``.
+
+    ``append_frame`` and ``append_event`` only touch memory; the flusher
+    thread starts on first use and writes everything once per ``flush_s``.
+    """
+
+    def __init__(self, directory: str = LOG_DIR, flush_s: float = FLUSH_S, max_rows: int = MAX_ROWS):
+        self.directory = directory
+        self.flush_s = flush_s
+        self.max_rows = max_rows
+        self._lock = threading.Lock()
+        self._buffers: Dict[str, _Buffer] = {}
+        self._pending = 0
+        self._wake = threading.Event()
+        self._stop = False
+        self._thread = None
+        self._pid = None
+        self._write_lock = threading.Lock()
+        self._flushes = 0
+        self._rows_written = 0
+        self._bytes_written = 0
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                os.makedirs(self.directory, exist_ok=True)
+                self._thread = threading.Thread(target=self._loop, name="proctor-log", daemon=True)
+                self._pid = os.getpid()
+                self._thread.start()
+
+    def _append(self, session_id: str, row: tuple, boxes: List[List[int]]) -> None:
+        self._ensure_started()
+        with self._lock:
+            buffer = self._buffers.get(session_id)
+            if buffer is None:
+                buffer = self._buffers[session_id] = _Buffer()
+            buffer.rows.append(row)
+            buffer.boxes.extend(boxes)
+            self._pending += 1
+            if self._pending >= self.max_rows:
+                self._wake.set()
+
+    def append_frame(self, session_id: str, frame: int, conditions: Iterable[str], faces: List[List[int]],
+                     people: Optional[int] = None, score: Optional[float] = None,
+                     timestamp: Optional[float] = None) -> None:
+        boxes = [[int(v) for v in box[:4]] for box in faces]
+        row = (time.time() if timestamp is None else timestamp, frame, FRAME, conditions_mask(conditions),
+               min(len(boxes), 255), 255 if people is None else min(people, 254),
+               float("nan") if score is None else score, float("nan"), len(boxes))
+        self._append(session_id, row, boxes)
+
+    def append_event(self, session_id: str, frame: int, event: Dict[str, Any]) -> None:
+        """Log a start/end event from EventEngine."""
+        kind = EVENT_START if event["state"] == "start" else EVENT_END
+        row = (event["time"], frame, kind, conditions_mask([event["event"]]), 0, 255, float("nan"),
+               event.get("duration", float("nan")), 0)
+        self._append(session_id, row, [])
+
+    def _loop(self) -> None:
+        while not self._stop:
+            self._wake.wait(self.flush_s)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self) -> None:
+        """Write every buffered row, one block and one fsync per session."""
+        with self._write_lock:
+            with self._lock:
+                buffers, self._buffers = self._buffers, {}
+                self._pending = 0
+            if not buffers:
+                return
+            for session_id, buffer in buffers.items():
+                data = _encode(buffer)
+                path = os.path.join(self.directory, _file_name(session_id))
+                try:
+                    with open(path, "ab") as f:
+                        f.write(data)
+                        f.flush()
+                        os.fsync(f.fileno())
+                except OSError as e:
+                    print(f"Warning: Could not write proctoring log {path}: {e}")
+                    continue
+                self._rows_written += len(buffer.rows)
+                self._bytes_written += len(data)
+            self._flushes += 1
+
+    def read(self, session_id: str) -> Dict[str, np.ndarray]:
+        """All rows of a session, including ones not flushed yet, as columns."""
+        # Holding the write lock means no block is half-written or half-taken
+        with self._write_lock:
+            path = os.path.join(self.directory, _file_name(session_id))
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+            except FileNotFoundError:
+                data = b""
+            with self._lock:
+                buffer = self._buffers.get(session_id)
+                if buffer is not None and buffer.rows:
+                    data += _encode(buffer)
+        return _decode(data)
+
+    def close(self) -> None:
+        self._stop = True
+        self._wake.set()
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "directory": self.directory,
+            "pending_rows": self._pending,
+            "flushes": self._flushes,
+            "rows_written": self._rows_written,
+            "bytes_written": self._bytes_written,
+        }
+
+
+def query(columns: Dict[str, np.ndarray], since: Optional[float] = None, until: Optional[float] = None,
+          kind: Optional[str] = None) -> Dict[str, Any]:
+    """Rows matching the filters as JSON-friendly columns; boxes are listed per row."""
+    mask = np.ones(len(columns["time"]), dtype=bool)
+    if since is not None:
+        mask &= columns["time"] >= since
+    if until is not None:
+        mask &= columns["time"] <= until
+    if kind is not None:
+        codes = {name: code for code, name in KINDS.items()}
+        mask &= columns["kind"] == codes.get(kind, -1)
+
+    ends = np.cumsum(columns["boxes"].astype(np.int64))
+    starts = ends - columns["boxes"]
+    rows = np.flatnonzero(mask)
+    return {
+        "time": columns["time"][rows].tolist(),
+        "frame": columns["frame"][rows].tolist(),
+        "kind": [KINDS.get(int(k), "unknown") for k in columns["kind"][rows]],
+        "conditions": [conditions_of(int(m)) for m in columns["conditions"][rows]],
+        "faces": columns["faces"][rows].tolist(),
+        "people": [None if p == 255 else int(p) for p in columns["people"][rows]],
+        "score": [None if np.isnan(s) else round(float(s), 4) for s in columns["score"][rows]],
+        "duration": [None if np.isnan(d) else round(float(d), 3) for d in columns["duration"][rows]],
+        "boxes": [columns["box_data"][starts[i]:ends[i]].tolist() for i in rows],
+    }
+
+
+def report(columns: Dict[str, np.ndarray]) -> Dict[str, Any]:
+    """Aggregates for the proctoring report: frame counts per condition and the list of events."""
+    frames = columns["kind"] == FRAME
+    conditions = columns["conditions"][frames]
+    times = columns["time"][frames]
+
+    events: List[Dict[str, Any]] = []
+    open_events: Dict[str, Dict[str, Any]] = {}
+    for i in np.flatnonzero(~frames):
+        for name in conditions_of(int(columns["conditions"][i])):
+            if columns["kind"][i] == EVENT_START:
+                event = {"event": name, "started": float(columns["time"][i]), "ended": None, "duration": None}
+                open_events[name] = event
+                events.append(event)
+            elif name in open_events:
+                event = open_events.pop(name)
+                event["ended"] = float(columns["time"][i])
+                event["duration"] = round(float(columns["duration"][i]), 3)
+
+    return {
+        "frames": int(frames.sum()),
+        "first": float(times.min()) if len(times) else None,
+        "last": float(times.max()) if len(times) else None,
+        "condition_frames": {name: int(np.count_nonzero(conditions & bit)) for name, bit in _BITS.items()},
+        "events": events,
+    }
+
+
+event_log = EventLog()
\ No newline at end of file
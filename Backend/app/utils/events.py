@@ -0,0 +1,111 @@
+import os
+import time
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional
+
+# A condition (e.g. "phone") starts an event once it was seen in at least
+# start_k of the last `window` frames for min_duration seconds, and ends it
+# once it is seen in at most end_k of them. end_k < start_k gives hysteresis,
+# so a flickering detection does not open and close events on every frame.
+DEFAULT_RULE = {
+    "window": int(os.getenv("PROCTOR_EVENT_WINDOW", "6")),
+    "start_k": int(os.getenv("PROCTOR_EVENT_START_K", "3")),
+    "end_k": int(os.getenv("PROCTOR_EVENT_END_K", "1")),
+    "min_duration": float(os.getenv("PROCTOR_EVENT_MIN_DURATION", "0")),
+    "keyframe_only": False,
+}
+
+# Brief phone glances matter, so two sightings are enough; a face leaving the
+# frame for a moment does not, so it has to last a couple of seconds.
+# Person/phone detection only runs on keyframes of tracked sessions, so those
+# windows count keyframes and other frames leave them untouched.
+RULES: Dict[str, Dict[str, Any]] = {
+    "phone": {"start_k": 2, "keyframe_only": True},
+    "multiple_people": {"keyframe_only": True},
+    "no_face": {"min_duration": 2.0},
+    "looking_left": {"min_duration": 1.5},
+    "looking_right": {"min_duration": 1.5},
+    "looking_up": {"min_duration": 1.5},
+}
+
+
+def rule_for(condition: str) -> Dict[str, Any]:
+    rule = dict(DEFAULT_RULE)
+    rule.update(RULES.get(condition, {}))
+    rule["start_k"] = min(rule["start_k"], rule["window"])
+    rule["end_k"] = min(rule["end_k"], rule["start_k"] - 1)
+    return rule
+
+
+class _ConditionState:
+    def __init__(self, rule: Dict[str, Any]):
+        self.rule = rule
+        self.window = deque(maxlen=rule["window"])
+        self.pending_since: Optional[float] = None
+        self.started: Optional[float] = None
+
+
+class EventEngine:
+    """
+    Turns per-frame conditions of one session into start/end events.
+
+    ``update`` takes the conditions seen in a frame and returns the events
+    that began or ended with it, so a phone held up for ten seconds is one
+    "start" and one "end" instead of an alert per frame. Frames that are not
+    keyframes (``keyframe=False``) do not count for keyframe-only conditions.
+    """
+
+    def __init__(self):
+        self._states: Dict[str, _ConditionState] = {}
+        self.started = 0
+
+    def update(self, conditions: Iterable[str], timestamp: Optional[float] = None,
+               keyframe: bool = True) -> List[Dict[str, Any]]:
+        now = time.time() if timestamp is None else timestamp
+        seen = set(conditions)
+        for condition in seen:
+            if condition not in self._states:
+                self._states[condition] = _ConditionState(rule_for(condition))
+
+        events = []
+        for condition, state in self._states.items():
+            rule = state.rule
+            if rule["keyframe_only"] and not keyframe:
+                continue
+            state.window.append(condition in seen)
+            hits = sum(state.window)
+
+            if state.started is None:
+                if hits >= rule["start_k"]:
+                    if state.pending_since is None:
+                        state.pending_since = now
+                    if now - state.pending_since >= rule["min_duration"]:
+                        state.started = state.pending_since
+                        state.pending_since = None
+                        self.started += 1
+                        events.append({"state": "start", "event": condition, "time": state.started})
+                else:
+                    state.pending_since = None
+            elif hits <= rule["end_k"]:
+                events.append({"state": "end", "event": condition, "time": now,
+                               "started": state.started, "duration": round(now - state.started, 3)})
+                state.started = None
+        return events
+
+    def active(self) -> List[Dict[str, Any]]:
+        """Events that started and have not ended yet."""
+        return [{"event": condition, "started": state.started}
+                for condition, state in self._states.items() if state.started is not None]
+
+    def close(self, timestamp: Optional[float] = None) -> List[Dict[str, Any]]:
+        """End every active event, e.g. when the session ends."""
+        now = time.time() if timestamp is None else timestamp
+        events = []
+        for condition, state in self._states.items():
+            if state.started is not None:
+                events.append({"state": "end", "event": condition, "time": now,
+                               "started": state.started, "duration": round(now - state.started, 3)})
+                state.started = None
+            state.window.clear()
+            state.pending_since = None
+        return events
\ No newline at end of file
@@ -0,0 +1,98 @@
+import os
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cv2
+
+from app.utils.models import registry
+
+# Face detector behind the proctor routes: "haar", "dnn_tf" (the quantized
+# OpenCV face detector that ships in models/) or "dnn_caffe" (needs the
+# res10 caffemodel downloaded into models/).
+FACE_BACKEND = os.getenv("PROCTOR_FACE_BACKEND", "haar")
+# Haar only looks for faces between these fractions of the frame's shorter
+# side; a webcam candidate is never 24px tall, and scanning those scales is
+# both the slowest part and the source of most false positives.
+HAAR_MIN_FACE = float(os.getenv("PROCTOR_HAAR_MIN_FACE", "0.15"))
+HAAR_MAX_FACE = float(os.getenv("PROCTOR_HAAR_MAX_FACE", "0.9"))
+DNN_CONFIDENCE = float(os.getenv("PROCTOR_FACE_CONFIDENCE", "0.5"))
+# A hinted scan covers the last faces plus this many face sizes on every side
+ROI_MARGIN = float(os.getenv("PROCTOR_FACE_ROI_MARGIN", "0.75"))
+
+Box = List[int]
+
+
+def haar_faces(frame, gray=None, min_face: float = HAAR_MIN_FACE, max_face: float = HAAR_MAX_FACE,
+               frame_side: Optional[int] = None) -> List[Box]:
+    """
+    Haar face boxes as [x, y, x1, y1]. Face size limits are fractions of
+    ``frame_side``, the shorter side of the whole frame (of ``frame`` itself
+    by default), so they stay the same when ``frame`` is a crop.
+    """
+    if gray is None:
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    side = frame_side or min(gray.shape[:2])
+    min_size = max(24, int(side * min_face))
+    max_size = max(min_size, int(side * max_face))
+    faces = registry.get("haar").detectMultiScale(gray, 1.1, 4, minSize=(min_size, min_size),
+                                                  maxSize=(max_size, max_size))
+    return [[int(x), int(y), int(x + w), int(y + h)] for (x, y, w, h) in faces]
+
+
+def _dnn(model_name: str):
+    def detect(frame, gray=None, frame_side=None) -> List[Box]:
+        from face_detector import find_faces
+        faces = find_faces(frame, registry.get(model_name), DNN_CONFIDENCE)
+        return [[int(v) for v in box] for box in faces]
+    return detect
+
+
+BACKENDS: Dict[str, Callable[..., List[Box]]] = {
+    "haar": haar_faces,
+    "dnn_tf": _dnn("face_dnn_tf"),
+    "dnn_caffe": _dnn("face_dnn_caffe"),
+}
+if FACE_BACKEND not in BACKENDS:
+    print(f"Warning: Unknown PROCTOR_FACE_BACKEND {FACE_BACKEND!r}, using haar")
+    FACE_BACKEND = "haar"
+
+
+def roi_around(faces: List[Box], shape, margin: float = ROI_MARGIN):
+    """(x0, y0, x1, y1) covering ``faces`` plus ``margin`` face sizes around them, clipped to ``shape``."""
+    h, w = shape[:2]
+    x0 = min(f[0] for f in faces)
+    y0 = min(f[1] for f in faces)
+    x1 = max(f[2] for f in faces)
+    y1 = max(f[3] for f in faces)
+    size = max(max(f[2] - f[0], f[3] - f[1]) for f in faces)
+    pad = int(size * margin)
+    return max(0, x0 - pad), max(0, y0 - pad), min(w, x1 + pad), min(h, y1 + pad)
+
+
+def detect_faces(frame, gray=None, backend: str = FACE_BACKEND, hint: Optional[List[Box]] = None) -> List[Box]:
+    """
+    Face boxes as [x, y, x1, y1] with the chosen backend.
+
+    With ``hint`` (faces found in an earlier frame of the session) only the
+    region around them is scanned; if nothing is found there the whole frame
+    is scanned after all.
+    """
+    return detect_faces_scan(frame, gray, backend, hint)[0]
+
+
+def detect_faces_scan(frame, gray=None, backend: str = FACE_BACKEND,
+                      hint: Optional[List[Box]] = None) -> Tuple[List[Box], bool]:
+    """detect_faces, also returning whether only the region around ``hint`` was scanned."""
+    detect = BACKENDS[backend]
+    if gray is None and backend == "haar":
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+    if hint:
+        x0, y0, x1, y1 = roi_around(hint, frame.shape)
+        if x1 - x0 >= 32 and y1 - y0 >= 32:
+            crop = frame[y0:y1, x0:x1]
+            gray_crop = gray[y0:y1, x0:x1] if gray is not None else None
+            faces = detect(crop, gray_crop, frame_side=min(frame.shape[:2]))
+            if faces:
+                return [[fx0 + x0, fy0 + y0, fx1 + x0, fy1 + y0] for fx0, fy0, fx1, fy1 in faces], True
+
+    return detect(frame, gray), False
\ No newline at end of file
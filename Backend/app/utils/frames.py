@@ -0,0 +1,72 @@
+import os
+import struct
+from typing import Any, Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+# Shorter image side the proctoring detectors need. YOLO letterboxes every
+# frame into (at most) 416x416 by default and face detection works on faces
+# well under that, so pixels beyond it are decoded only to be thrown away.
+# Clients are asked to send frames this size.
+INPUT_MIN_SIDE = int(os.getenv("PROCTOR_INPUT_MIN_SIDE", "416"))
+# Enough for the Haar-only /initial-check
+FACE_MIN_SIDE = int(os.getenv("PROCTOR_FACE_MIN_SIDE", "240"))
+JPEG_QUALITY = float(os.getenv("PROCTOR_INPUT_JPEG_QUALITY", "0.8"))
+
+_REDUCED = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+# Start-of-frame markers carry the image size; C4, C8 and CC are other segments
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def jpeg_size(data: bytes) -> Optional[Tuple[int, int]]:
+    """(width, height) from a JPEG header without decoding it, or None if it is not a JPEG."""
+    if data[:2] != b"\xff\xd8":
+        return None
+    pos = 2
+    while pos + 4 <= len(data):
+        if data[pos] != 0xFF:
+            return None
+        marker = data[pos + 1]
+        if marker == 0xFF:
+            pos += 1
+            continue
+        (length,) = struct.unpack_from(">H", data, pos + 2)
+        if marker in _SOF_MARKERS:
+            if pos + 9 > len(data):
+                return None
+            height, width = struct.unpack_from(">HH", data, pos + 5)
+            return width, height
+        pos += 2 + length
+    return None
+
+
+def decode_frame(data: bytes, min_side: int = INPUT_MIN_SIDE):
+    """
+    Decode an uploaded frame, letting libjpeg downscale it by 2, 4 or 8 while
+    decoding when the shorter side stays at least ``min_side``. Returns None if
+    the data is not an image.
+    """
+    flag = cv2.IMREAD_COLOR
+    size = jpeg_size(data)
+    if size is not None:
+        shorter = min(size)
+        for factor, reduced in _REDUCED:
+            if shorter // factor >= min_side:
+                flag = reduced
+                break
+    return cv2.imdecode(np.frombuffer(data, np.uint8), flag)
+
+
+def input_spec() -> Dict[str, Any]:
+    """What clients should send: JPEG frames whose shorter side is ``min_side``."""
+    return {
+        "format": "image/jpeg",
+        "min_side": INPUT_MIN_SIDE,
+        "initial_check_min_side": FACE_MIN_SIDE,
+        "jpeg_quality": JPEG_QUALITY,
+    }
\ No newline at end of file
@@ -0,0 +1,170 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+# Sizing knobs. /monitor gets one frame per candidate every 5 seconds, so a
+# frame that waited longer than that is already stale and is dropped. Streamed
+# frames (/stream) are superseded by newer ones long before that.
+INFERENCE_MODE = os.getenv("PROCTOR_INFERENCE_MODE", "thread")  # "thread" or "process"
+# Workers spend most of their time blocked on the shared YOLO batch, so the
+# default matches the batcher's max batch size (PROCTOR_YOLO_MAX_BATCH).
+INFERENCE_WORKERS = int(os.getenv("PROCTOR_INFERENCE_WORKERS", "8"))
+INFERENCE_QUEUE = int(os.getenv("PROCTOR_INFERENCE_QUEUE", "8"))
+INFERENCE_TIMEOUT = float(os.getenv("PROCTOR_INFERENCE_TIMEOUT", "5.0"))
+# What an overloaded request gets back: a "skipped" status or an HTTP 503
+OVERLOAD_RESPONSE = os.getenv("PROCTOR_OVERLOAD_RESPONSE", "skip")
+
+_SAMPLE_WINDOW = 512
+
+
+class InferenceOverloaded(Exception):
+    """The queue was full, or the deadline passed before a worker finished the job."""
+
+
+def _init_worker():
+    # Runs once in every worker thread or spawned worker process, so models are
+    # loaded before the first job instead of during it. Jobs run on this same
+    # thread, so per-thread models are worth loading here too.
+    from app.utils.models import registry, WARMUP_MODELS
+    registry.warm_up(WARMUP_MODELS, per_thread=True)
+
+
+def _started(barrier=None):
+    # Keeps a worker busy until all of them have started, so every submit of
+    # start_workers gets a worker of its own
+    if barrier is not None:
+        try:
+            barrier.wait()
+        except threading.BrokenBarrierError:
+            pass
+
+
+def _timed(fn, args, kwargs):
+    # Runs inside the worker. Wall-clock time so it is comparable across processes.
+    started = time.time()
+    result = fn(*args, **kwargs)
+    return started, time.time() - started, result
+
+
+def _summary(samples) -> Dict[str, Any]:
+    if not samples:
+        return {"avg": None, "p95": None, "max": None}
+    ordered = sorted(samples)
+    return {
+        "avg": round(sum(ordered) / len(ordered), 2),
+        "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2),
+        "max": round(ordered[-1], 2),
+    }
+
+
+class InferenceExecutor:
+    """
+    Runs blocking model inference off the asyncio event loop.
+
+    At most ``workers + max_queue`` jobs are admitted at once; beyond that, and
+    for jobs not finished within ``timeout`` seconds, ``run`` raises
+    ``InferenceOverloaded`` so the caller can shed load instead of piling up.
+    With ``mode="process"`` the function and its arguments must be picklable.
+    Worker processes are spawned rather than forked, since forking a parent
+    that has already started TensorFlow threads can deadlock, and each one
+    loads its own models when it starts.
+    """
+
+    def __init__(self, workers: int = INFERENCE_WORKERS, max_queue: int = INFERENCE_QUEUE,
+                 timeout: float = INFERENCE_TIMEOUT, mode: str = INFERENCE_MODE):
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self.timeout = timeout
+        self.mode = mode
+        if mode == "process":
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                             mp_context=multiprocessing.get_context("spawn"))
+        else:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="inference",
+                                            initializer=_init_worker)
+
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._counts = {"submitted": 0, "completed": 0, "rejected": 0, "timed_out": 0, "failed": 0}
+        self._wait_ms = deque(maxlen=_SAMPLE_WINDOW)
+        self._run_ms = deque(maxlen=_SAMPLE_WINDOW)
+
+    def _on_done(self, _future) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        with self._lock:
+            if self._pending >= self.workers + self.max_queue:
+                self._counts["rejected"] += 1
+                raise InferenceOverloaded("Inference queue is full")
+            self._pending += 1
+            self._counts["submitted"] += 1
+
+        submitted = time.time()
+        future = self._pool.submit(_timed, fn, args, kwargs)
+        future.add_done_callback(self._on_done)
+
+        try:
+            # On timeout the job is cancelled if no worker has picked it up yet;
+            # a job that is already running finishes but its result is dropped.
+            started, run_time, result = await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._counts["timed_out"] += 1
+            raise InferenceOverloaded(f"Inference did not finish within {self.timeout}s")
+        except Exception:
+            with self._lock:
+                self._counts["failed"] += 1
+            raise
+
+        with self._lock:
+            self._counts["completed"] += 1
+            self._wait_ms.append(max(0.0, started - submitted) * 1000)
+            self._run_ms.append(run_time * 1000)
+        return result
+
+    def start_workers(self) -> None:
+        """
+        Start every worker now and wait for their initializers, so model
+        loading happens at startup instead of on each worker's first request.
+        """
+        # Worker processes cannot share a barrier; they start from plain jobs
+        barrier = threading.Barrier(self.workers, timeout=300) if self.mode != "process" else None
+        futures = [self._pool.submit(_started, barrier) for _ in range(self.workers)]
+        for future in futures:
+            future.result()
+
+    def queue_depth(self) -> int:
+        """Jobs admitted but not picked up by a worker yet."""
+        with self._lock:
+            return max(0, self._pending - self.workers)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pending = self._pending
+            counts = dict(self._counts)
+            wait_ms = list(self._wait_ms)
+            run_ms = list(self._run_ms)
+        return {
+            "mode": self.mode,
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "timeout_s": self.timeout,
+            "in_flight": pending,
+            "queue_depth": max(0, pending - self.workers),
+            **counts,
+            "wait_ms": _summary(wait_ms),
+            "run_ms": _summary(run_ms),
+        }
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+executor = InferenceExecutor()
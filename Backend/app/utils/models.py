@@ -0,0 +1,220 @@
+import os
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+import cv2
+
+# The detectors live in the Proctoring-AI-master folder, which is not a package.
+# Put it on the path once here so every loader below can import from it.
+PROCTOR_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../Proctoring-AI-master"))
+if PROCTOR_PATH not in sys.path:
+    sys.path.append(PROCTOR_PATH)
+
+MODELS_DIR = os.path.join(PROCTOR_PATH, "models")
+
+HAAR_CASCADE_PATH = cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
+# Kernel threads of each SSD MobileNet interpreter (one interpreter per worker thread)
+SSD_THREADS = int(os.getenv("PROCTOR_SSD_THREADS", "2"))
+# YoloV3 input sizes, largest first, from YOLO_INPUT_SIZES (read by yolo_input,
+# which person_and_phone shares). Frames use the first one and drop to the
+# next under load (see app.utils.objects); all of them are traced at warm-up.
+from yolo_input import YOLO_INPUT_SIZES as YOLO_SIZES
+# YoloV3 exported by Proctoring-AI-master/yolo_tflite.py, and its interpreter threads
+YOLO_TFLITE_MODEL = os.getenv("PROCTOR_YOLO_TFLITE_MODEL", os.path.join(MODELS_DIR, "yolov3_int8.tflite"))
+YOLO_TFLITE_THREADS = int(os.getenv("PROCTOR_YOLO_TFLITE_THREADS", "2"))
+# Models loaded at startup, all by default; e.g. "haar,yolo" narrows the list
+WARMUP_MODELS = [n.strip() for n in os.getenv("PROCTOR_WARMUP_MODELS", "").split(",") if n.strip()] or None
+
+
+def _rss_bytes() -> Optional[int]:
+    """Resident set size of this process, or None where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class ModelRegistry:
+    """
+    Loads every detector the backend uses once and hands out cached instances.
+
+    OpenCV objects (cascade classifiers, dnn nets) keep per-call state and are
+    not safe to share between threads, so models registered with
+    ``per_thread=True`` are built once per worker thread. Everything else is
+    loaded once per process and shared.
+    """
+
+    def __init__(self):
+        self._loaders: Dict[str, Callable[[], Any]] = {}
+        self._per_thread = set()
+        self._shared: Dict[str, Any] = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        # Models that failed to load are not retried on every request
+        self._failed: Dict[str, str] = {}
+
+    def register(self, name: str, loader: Callable[[], Any], per_thread: bool = False) -> None:
+        self._loaders[name] = loader
+        if per_thread:
+            self._per_thread.add(name)
+        self._stats[name] = {
+            "per_thread": per_thread,
+            "loaded": False,
+            "instances": 0,
+            "load_time_ms": None,
+            "memory_bytes": None,
+            "error": None,
+        }
+
+    def names(self):
+        return list(self._loaders)
+
+    def get(self, name: str) -> Any:
+        if name not in self._loaders:
+            raise KeyError(f"Unknown model: {name}")
+        if name in self._failed:
+            raise RuntimeError(f"Model '{name}' failed to load: {self._failed[name]}")
+
+        if name in self._per_thread:
+            instances = getattr(self._local, "instances", None)
+            if instances is None:
+                instances = self._local.instances = {}
+            if name not in instances:
+                instances[name] = self._load(name)
+            return instances[name]
+
+        model = self._shared.get(name)
+        if model is None:
+            with self._lock:
+                model = self._shared.get(name)
+                if model is None:
+                    model = self._shared[name] = self._load(name)
+        return model
+
+    def _load(self, name: str) -> Any:
+        stats = self._stats[name]
+        rss_before = _rss_bytes()
+        start = time.perf_counter()
+        try:
+            model = self._loaders[name]()
+        except Exception as e:
+            stats["error"] = self._failed[name] = str(e)
+            raise
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        rss_after = _rss_bytes()
+
+        # Memory is the RSS growth across the load, so it is approximate when
+        # other threads allocate at the same time.
+        stats["loaded"] = True
+        stats["instances"] += 1
+        stats["load_time_ms"] = round(elapsed_ms, 2)
+        if rss_before is not None and rss_after is not None:
+            stats["memory_bytes"] = max(0, rss_after - rss_before)
+        stats["error"] = None
+        return model
+
+    def available(self, name: str) -> bool:
+        """Whether the model is (or can be) loaded. Loads it on first call."""
+        try:
+            self.get(name)
+            return True
+        except Exception:
+            return False
+
+    def warm_up(self, names: Optional[Iterable[str]] = None, per_thread: bool = False) -> Dict[str, bool]:
+        """
+        Load the given models (all by default) so the first request does not pay for it.
+        A model that fails to load is reported and skipped, not fatal.
+
+        Per-thread models are skipped unless ``per_thread`` is set: an instance
+        built here would only serve the calling thread, which is not one of
+        the inference workers unless the caller is a worker itself.
+        """
+        results = {}
+        for name in names if names is not None else self.names():
+            if name in self._per_thread and not per_thread:
+                continue
+            try:
+                self.get(name)
+                results[name] = True
+            except Exception as e:
+                print(f"WARNING: Could not load model '{name}': {e}")
+                results[name] = False
+        return results
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: dict(s) for name, s in self._stats.items()}
+
+
+def _load_haar():
+    cascade = cv2.CascadeClassifier(HAAR_CASCADE_PATH)
+    if cascade.empty():
+        raise RuntimeError(f"Failed to load Haar cascade from {HAAR_CASCADE_PATH}")
+    return cascade
+
+
+def _load_face_dnn_caffe():
+    from face_detector import get_face_detector
+    return get_face_detector(
+        modelFile=os.path.join(MODELS_DIR, "res10_300x300_ssd_iter_140000.caffemodel"),
+        configFile=os.path.join(MODELS_DIR, "deploy.prototxt"),
+        quantized=False,
+    )
+
+
+def _load_face_dnn_tf():
+    from face_detector import get_face_detector
+    return get_face_detector(
+        modelFile=os.path.join(MODELS_DIR, "opencv_face_detector_uint8.pb"),
+        configFile=os.path.join(MODELS_DIR, "opencv_face_detector.pbtxt"),
+        quantized=True,
+    )
+
+
+def _load_landmarks():
+    from face_landmarks import get_landmark_model
+    return get_landmark_model(os.path.join(MODELS_DIR, "pose_model"))
+
+
+def _load_eye_tracker():
+    # Holds reusable eye-crop buffers, so each thread gets its own
+    from eye_tracker import EyeTracker
+    return EyeTracker(registry.get("landmarks"))
+
+
+def _load_yolo():
+    # Importing person_and_phone pulls in TensorFlow, so it only happens here
+    from person_and_phone import get_yolo, warm_up_yolo
+    # Trace the tf.function entry point now rather than on the first frame
+    warm_up_yolo(sizes=YOLO_SIZES)
+    return get_yolo()
+
+
+def _load_ssd():
+    from ssd_detector import SsdDetector
+    return SsdDetector(num_threads=SSD_THREADS)
+
+
+
+def _load_yolo_tflite():
+    if not os.path.exists(YOLO_TFLITE_MODEL):
+        raise FileNotFoundError(f"{YOLO_TFLITE_MODEL} not found, export it with yolo_tflite.py")
+    from yolo_tflite import TfliteYolo
+    return TfliteYolo(YOLO_TFLITE_MODEL, num_threads=YOLO_TFLITE_THREADS)
+
+
+registry = ModelRegistry()
+registry.register("haar", _load_haar, per_thread=True)
+registry.register("face_dnn_caffe", _load_face_dnn_caffe, per_thread=True)
+registry.register("face_dnn_tf", _load_face_dnn_tf, per_thread=True)
+registry.register("landmarks", _load_landmarks)
+registry.register("eye_tracker", _load_eye_tracker, per_thread=True)
+registry.register("yolo", _load_yolo)
+# TFLite interpreters are not thread-safe
+registry.register("ssd", _load_ssd, per_thread=True)
+registry.register("yolo_tflite", _load_yolo_tflite, per_thread=True)
@@ -0,0 +1,120 @@
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional
+
+from app.utils.models import registry, YOLO_SIZES
+from app.utils.batching import MicroBatcher
+
+# Person/phone detector behind the proctor routes: "yolo" (YoloV3 on
+# letterboxed frames, batched across requests), "yolo_tflite" (YoloV3 exported to
+# float16/INT8 TFLite by yolo_tflite.py) or "ssd" (COCO SSD MobileNet v1
+# TFLite, an order of magnitude cheaper on CPU). Requests may pick another one.
+OBJECT_BACKEND = os.getenv("PROCTOR_OBJECT_BACKEND", "yolo")
+# SSD detections below this score are ignored
+SSD_SCORE = float(os.getenv("PROCTOR_SSD_SCORE", "0.5"))
+# YOLO frames drop to the next smaller of YOLO_INPUT_SIZES for every
+# YOLO_PRESSURE_QUEUE jobs waiting in the inference queue; 0 never drops.
+YOLO_PRESSURE_QUEUE = int(os.getenv("PROCTOR_YOLO_PRESSURE_QUEUE", "4"))
+
+
+def yolo_input_size(queue_depth: int) -> int:
+    """YOLO input size for a frame submitted while ``queue_depth`` jobs wait."""
+    if YOLO_PRESSURE_QUEUE <= 0:
+        return YOLO_SIZES[0]
+    return YOLO_SIZES[min(queue_depth // YOLO_PRESSURE_QUEUE, len(YOLO_SIZES) - 1)]
+
+
+def _run_yolo_batch(items):
+    # person_and_phone (and TensorFlow) is only imported once YOLO is first used,
+    # so importing the proctor router stays cheap.
+    from person_and_phone import process_frames_for_proctoring
+    # Items are (frame, input size); one forward pass per size in the batch
+    by_size: Dict[int, List[int]] = {}
+    for i, (_, size) in enumerate(items):
+        by_size.setdefault(size, []).append(i)
+    results = [None] * len(items)
+    for size, indices in by_size.items():
+        for i, result in zip(indices, process_frames_for_proctoring([items[i][0] for i in indices], size)):
+            results[i] = result
+    return results
+
+
+class YoloBackend:
+    """YoloV3; frames from concurrent candidates share one batched forward pass."""
+
+    model = "yolo"
+
+    def __init__(self):
+        self.batcher = MicroBatcher(_run_yolo_batch, name="yolo-batcher")
+        self._sizes_lock = threading.Lock()
+        self._sizes = Counter()
+
+    def submit(self, frame, size: Optional[int] = None) -> Future:
+        size = size or YOLO_SIZES[0]
+        with self._sizes_lock:
+            self._sizes[size] += 1
+        return self.batcher.submit((frame, size))
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.batcher.stats()
+        with self._sizes_lock:
+            stats["input_sizes"] = dict(sorted(self._sizes.items()))
+        return stats
+
+
+class InterpreterBackend:
+    """
+    A TFLite model on the calling worker thread. Each thread gets its own
+    interpreter from the registry, so workers run in parallel without a batcher.
+    """
+
+    def __init__(self, model: str, score_thresh: Optional[float] = None):
+        self.model = model
+        self.score_thresh = score_thresh
+        self._stats_lock = threading.Lock()
+        self._frames = 0
+        self._run_ms_total = 0.0
+
+    def submit(self, frame, size: Optional[int] = None) -> Future:
+        # The model's input size is fixed, so ``size`` is ignored
+        future: Future = Future()
+        start = time.perf_counter()
+        try:
+            result = registry.get(self.model).process_frame_for_proctoring(frame, self.score_thresh)
+        except Exception as e:
+            future.set_exception(e)
+            return future
+        with self._stats_lock:
+            self._frames += 1
+            self._run_ms_total += (time.perf_counter() - start) * 1000
+        future.set_result(result)
+        return future
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "frames": self._frames,
+            "run_ms_avg": round(self._run_ms_total / self._frames, 2) if self._frames else None,
+        }
+
+
+BACKENDS = {
+    "yolo": YoloBackend(),
+    "yolo_tflite": InterpreterBackend("yolo_tflite"),
+    "ssd": InterpreterBackend("ssd", SSD_SCORE),
+}
+if OBJECT_BACKEND not in BACKENDS:
+    print(f"Warning: Unknown PROCTOR_OBJECT_BACKEND {OBJECT_BACKEND!r}, using yolo")
+    OBJECT_BACKEND = "yolo"
+
+
+def get_backend(name: str = None):
+    """The named backend (the deployment default for None), or None if its model cannot be loaded."""
+    backend = BACKENDS[name or OBJECT_BACKEND]
+    return backend if registry.available(backend.model) else None
+
+
+def stats() -> Dict[str, Any]:
+    return {"default": OBJECT_BACKEND, **{name: backend.stats() for name, backend in BACKENDS.items()}}
\ No newline at end of file
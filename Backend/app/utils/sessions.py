@@ -0,0 +1,95 @@
+import os
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from app.utils.event_log import event_log
+from app.utils.events import EventEngine
+from app.utils.tracking import SessionTracker
+
+# Sessions that sent nothing for this long are forgotten
+SESSION_TTL = float(os.getenv("PROCTOR_SESSION_TTL", "600"))
+
+
+class ProctorSession:
+    """
+    Server-side state of one candidate's proctoring stream.
+
+    Lives across frames and reconnects, so detectors can keep state per
+    candidate instead of treating every frame on its own.
+    """
+
+    def __init__(self, session_id: str):
+        self.id = session_id
+        self.created = time.time()
+        self.last_seen = self.created
+        self.frames = 0
+        self.dropped = 0
+        self.alerts = 0
+        self.connections = 0
+        self.tracker = SessionTracker()
+        self.events = EventEngine()
+
+    def touch(self) -> None:
+        self.last_seen = time.time()
+
+    def close(self) -> List[Dict[str, Any]]:
+        """End the session's active events and log them; returns the end events."""
+        events = self.events.close()
+        for event in events:
+            event_log.append_event(self.id, self.frames, event)
+        return events
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "session_id": self.id,
+            "created": self.created,
+            "last_seen": self.last_seen,
+            "frames": self.frames,
+            "dropped": self.dropped,
+            "alerts": self.alerts,
+            "events": self.events.started,
+            "active_events": self.events.active(),
+            "connections": self.connections,
+            "tracking": self.tracker.stats(),
+        }
+
+
+class SessionManager:
+    """Sessions by id, with idle ones expiring after ``ttl`` seconds."""
+
+    def __init__(self, ttl: float = SESSION_TTL):
+        self.ttl = ttl
+        self._sessions: Dict[str, ProctorSession] = {}
+        self._lock = threading.Lock()
+
+    def get(self, session_id: Optional[str] = None) -> ProctorSession:
+        """The session with this id, created if needed; a new id if none is given."""
+        session_id = session_id or uuid.uuid4().hex
+        with self._lock:
+            self._expire()
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = ProctorSession(session_id)
+        session.touch()
+        return session
+
+    def find(self, session_id: str) -> Optional[ProctorSession]:
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def _expire(self) -> None:
+        cutoff = time.time() - self.ttl
+        expired: List[str] = [sid for sid, s in self._sessions.items()
+                              if s.connections == 0 and s.last_seen < cutoff]
+        for sid in expired:
+            self._sessions.pop(sid).close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"sessions": len(self._sessions),
+                    "connected": sum(1 for s in self._sessions.values() if s.connections)}
+
+
+sessions = SessionManager()
\ No newline at end of file
@@ -0,0 +1,145 @@
+import os
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+# Full detection runs at least every KEYFRAME_INTERVAL frames of a session,
+# and at least every KEYFRAME_SECONDS seconds, so slow senders (/monitor posts
+# a frame every few seconds) still get fresh person/phone detection.
+# In between, face boxes are followed by template matching on a small gray
+# copy of the frame and person/phone detection is skipped, unless the match score
+# drops below TRACK_MIN_SCORE or the frame differs from the keyframe by more
+# than SCENE_CHANGE (mean absolute gray difference, 0-255).
+KEYFRAME_INTERVAL = int(os.getenv("PROCTOR_KEYFRAME_INTERVAL", "10"))
+KEYFRAME_SECONDS = float(os.getenv("PROCTOR_KEYFRAME_SECONDS", "1.0"))
+TRACK_MIN_SCORE = float(os.getenv("PROCTOR_TRACK_MIN_SCORE", "0.6"))
+SCENE_CHANGE = float(os.getenv("PROCTOR_SCENE_CHANGE", "10"))
+# Keyframes with known faces only scan around them for faces; every
+# FACE_FULL_SCAN_EVERY-th keyframe scans the whole frame so newcomers are seen.
+FACE_FULL_SCAN_EVERY = int(os.getenv("PROCTOR_FACE_FULL_SCAN_EVERY", "3"))
+# Width of the gray copy used for tracking and scene comparison
+TRACK_WIDTH = 160
+_THUMB_SIZE = (64, 48)
+
+
+class SessionTracker:
+    """
+    Keyframe/tracking state of one proctoring session.
+
+    ``update`` decides whether a frame needs full detection. Callers hold
+    ``lock`` around ``update`` and ``keyframe`` so frames of one session are
+    handled one at a time.
+    """
+
+    def __init__(self, keyframe_interval: int = KEYFRAME_INTERVAL,
+                 min_score: float = TRACK_MIN_SCORE, scene_change: float = SCENE_CHANGE,
+                 keyframe_seconds: float = KEYFRAME_SECONDS):
+        self.keyframe_interval = max(1, keyframe_interval)
+        self.keyframe_seconds = keyframe_seconds
+        self.min_score = min_score
+        self.scene_change = scene_change
+        self.lock = threading.Lock()
+
+        self.faces: List[List[int]] = []
+        # None for faces too small to match; their box is kept as it was
+        self._templates: List[Optional[np.ndarray]] = []
+        self._thumb = None
+        self._scale = 1.0
+        self._since_keyframe = 0
+        self._keyframe_time = 0.0
+        self._hinted_keyframes = 0
+        self._reasons = Counter()
+        self._tracked = 0
+
+    def _small(self, gray):
+        scale = min(1.0, TRACK_WIDTH / gray.shape[1])
+        small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1 else gray
+        return small, scale
+
+    def _track(self, small) -> Optional[List[List[int]]]:
+        """Boxes of the keyframe faces in this frame, or None if any is lost."""
+        boxes = []
+        h, w = small.shape[:2]
+        for (x, y, x1, y1), template in zip(self.faces, self._templates):
+            if template is None:
+                boxes.append([x, y, x1, y1])
+                continue
+            th, tw = template.shape[:2]
+            # Search a window twice the face size around its last position
+            sx, sy = int(x * self._scale), int(y * self._scale)
+            wx0, wy0 = max(0, sx - tw // 2), max(0, sy - th // 2)
+            wx1, wy1 = min(w, sx + tw + tw // 2), min(h, sy + th + th // 2)
+            window = small[wy0:wy1, wx0:wx1]
+            if window.shape[0] < th or window.shape[1] < tw:
+                return None
+            scores = cv2.matchTemplate(window, template, cv2.TM_CCOEFF_NORMED)
+            _, score, _, (mx, my) = cv2.minMaxLoc(scores)
+            if score < self.min_score:
+                return None
+            nx, ny = (wx0 + mx) / self._scale, (wy0 + my) / self._scale
+            boxes.append([int(nx), int(ny), int(nx + x1 - x), int(ny + y1 - y)])
+        return boxes
+
+    def update(self, gray) -> Optional[List[List[int]]]:
+        """
+        Track the session's faces into a new frame.
+
+        Returns the tracked face boxes, or None when the frame should be a
+        keyframe; the caller then runs full detection and calls ``keyframe``.
+        """
+        small, scale = self._small(gray)
+        thumb = cv2.resize(small, _THUMB_SIZE, interpolation=cv2.INTER_AREA)
+        reason = None
+        if self._thumb is None or scale != self._scale:
+            reason = "first"
+        elif (self._since_keyframe + 1 >= self.keyframe_interval
+              or time.monotonic() - self._keyframe_time >= self.keyframe_seconds):
+            reason = "interval"
+        elif float(cv2.absdiff(thumb, self._thumb).mean()) > self.scene_change:
+            reason = "scene_change"
+        else:
+            boxes = self._track(small)
+            if boxes is None:
+                reason = "lost_track"
+            else:
+                self.faces = boxes
+                self._since_keyframe += 1
+                self._tracked += 1
+                return boxes
+        self._reasons[reason] += 1
+        return None
+
+    def face_hint(self) -> Optional[List[List[int]]]:
+        """Last known faces to narrow the keyframe's face scan, or None when a full scan is due."""
+        if not self.faces or self._hinted_keyframes + 1 >= FACE_FULL_SCAN_EVERY:
+            return None
+        return self.faces
+
+    def keyframe(self, gray, faces: List[List[int]], hinted: bool = False) -> None:
+        """Remember the result of full detection on ``gray``; ``hinted`` if faces were only searched near a hint."""
+        self._hinted_keyframes = self._hinted_keyframes + 1 if hinted else 0
+        small, scale = self._small(gray)
+        self._scale = scale
+        self._thumb = cv2.resize(small, _THUMB_SIZE, interpolation=cv2.INTER_AREA)
+        self._since_keyframe = 0
+        self._keyframe_time = time.monotonic()
+        self.faces = [list(box) for box in faces]
+        self._templates = []
+        for box in faces:
+            x, y, x1, y1 = (int(round(v * scale)) for v in box)
+            template = small[y:y1, x:x1]
+            too_small = template.shape[0] < 4 or template.shape[1] < 4
+            self._templates.append(None if too_small else template.copy())
+
+    def stats(self) -> Dict[str, Any]:
+        keyframes = sum(self._reasons.values())
+        return {
+            "keyframes": keyframes,
+            "tracked": self._tracked,
+            "keyframe_ratio": round(keyframes / (keyframes + self._tracked), 3) if keyframes else None,
+            "keyframe_reasons": dict(self._reasons),
+        }
\ No newline at end of file
@@ -3,6 +3,10 @@ import { useNavigate } from "react-router-dom";
 import { Conversation } from "@11labs/client";
 
 const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || "http://127.0.0.1:8000";
+// How often a camera frame is sent for proctoring
+const PROCTOR_INTERVAL_MS = Number(import.meta.env.VITE_PROCTOR_INTERVAL_MS) || 500;
+// Person/phone detector to ask for ("yolo", "yolo_tflite" or "ssd"); empty uses the server default
+const PROCTOR_DETECTOR = import.meta.env.VITE_PROCTOR_DETECTOR || "";
 
 const InterviewScreen = () => {
   const navigate = useNavigate();
@@ -132,40 +136,84 @@ const InterviewScreen = () => {
   }, []);
 
   useEffect(() => {
-    const interval = setInterval(async () => {
-      if (cameraRef.current) {
-        const canvas = document.createElement('canvas');
-        canvas.width = 640;
-        canvas.height = 480;
-        const ctx = canvas.getContext('2d');
-        if (ctx) {
-            ctx.drawImage(cameraRef.current, 0, 0);
-            canvas.toBlob(async (blob) => {
-              if(!blob) return;
-              const formData = new FormData();
-              formData.append('file', blob, 'capture.jpg');
-    
-              try {
-                const res = await fetch(`${API_BASE_URL}/proctor/monitor`, { method: 'POST', body: formData });
-                const data = await res.json();
-                
-                if (data.status === 'alert') {
-                  const newAlert = { time: new Date().toLocaleTimeString(), issue: data.issue };
-                  setMalpractices(prev => [...prev, newAlert]);
-                  
-                  const existing = JSON.parse(localStorage.getItem('proctorReport') || "[]");
-                  existing.push(newAlert);
-                  localStorage.setItem('proctorReport', JSON.stringify(existing));
-                }
-              } catch (e) {
-                console.error("Proctor loop failed", e);
-              }
-            }, 'image/jpeg');
-        }
+    // Frames are streamed over one WebSocket. The server debounces what it sees
+    // and pushes an event when an issue starts and when it ends.
+    const streamUrl = `${API_BASE_URL.replace(/^http/, 'ws')}/proctor/stream`;
+    const canvas = document.createElement('canvas');
+    // Downscale before encoding: the server only needs frames whose shorter
+    // side is spec.min_side, and says so at /proctor/input-spec.
+    const spec = { min_side: 416, jpeg_quality: 0.8 };
+    fetch(`${API_BASE_URL}/proctor/input-spec`)
+      .then(res => res.json())
+      .then(data => Object.assign(spec, data))
+      .catch(() => {});
+    let sessionId = null;
+    let socket = null;
+    let closed = false;
+    let reconnectTimer = null;
+
+    const recordEvent = (event) => {
+      const id = `${event.event}-${event.started ?? event.time}`;
+      const existing = JSON.parse(localStorage.getItem('proctorReport') || "[]");
+      if (event.state === 'start') {
+        const newAlert = { id, time: new Date(event.time * 1000).toLocaleTimeString(), issue: event.issue };
+        setMalpractices(prev => [...prev, newAlert]);
+        existing.push(newAlert);
+      } else {
+        // One report entry per event: the end only adds its duration
+        const withDuration = (item) => (item.id === id ? { ...item, duration: event.duration } : item);
+        setMalpractices(prev => prev.map(withDuration));
+        existing.splice(0, existing.length, ...existing.map(withDuration));
       }
-    }, 5000);
+      localStorage.setItem('proctorReport', JSON.stringify(existing));
+    };
+
+    const connect = () => {
+      // Reconnects keep the session so the server keeps its per-candidate state
+      const params = new URLSearchParams();
+      if (sessionId) params.set('session_id', sessionId);
+      if (PROCTOR_DETECTOR) params.set('detector', PROCTOR_DETECTOR);
+      const query = params.toString();
+      socket = new WebSocket(query ? `${streamUrl}?${query}` : streamUrl);
+      socket.onmessage = (event) => {
+        const data = JSON.parse(event.data);
+        if (data.type === 'session') {
+          sessionId = data.session_id;
+          localStorage.setItem('proctorSessionId', sessionId);
+        } else if (data.type === 'event') {
+          recordEvent(data);
+        }
+      };
+      socket.onerror = (e) => console.error("Proctor stream failed", e);
+      socket.onclose = () => {
+        if (!closed) reconnectTimer = setTimeout(connect, 2000);
+      };
+    };
+    connect();
+
+    const interval = setInterval(() => {
+      if (!cameraRef.current || !socket || socket.readyState !== WebSocket.OPEN) return;
+      // Skip a tick rather than queue frames behind a slow connection
+      if (socket.bufferedAmount > 0) return;
+      const video = cameraRef.current;
+      if (!video.videoWidth || !video.videoHeight) return;
+      const scale = Math.min(1, spec.min_side / Math.min(video.videoWidth, video.videoHeight));
+      canvas.width = Math.round(video.videoWidth * scale);
+      canvas.height = Math.round(video.videoHeight * scale);
+      const ctx = canvas.getContext('2d');
+      if (!ctx) return;
+      ctx.drawImage(video, 0, 0, canvas.width, canvas.height);
+      canvas.toBlob((blob) => {
+        if (blob && socket.readyState === WebSocket.OPEN) socket.send(blob);
+      }, 'image/jpeg', spec.jpeg_quality);
+    }, PROCTOR_INTERVAL_MS);
 
-    return () => clearInterval(interval);
+    return () => {
+      closed = true;
+      clearInterval(interval);
+      clearTimeout(reconnectTimer);
+      if (socket) socket.close();
+    };
   }, []);
 
   const endInterview = async () => {
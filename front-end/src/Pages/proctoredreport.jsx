@@ -1,14 +1,32 @@
 import React, { useEffect, useState } from 'react';
 import { useNavigate } from 'react-router-dom';
 
+const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || "http://127.0.0.1:8000";
+
+const formatDuration = (seconds) => (seconds == null ? 'Ongoing' : `${seconds.toFixed(1)}s`);
+
 const ProctoredReport = () => {
     const navigate = useNavigate();
     const [report, setReport] = useState([]);
+    const sessionId = localStorage.getItem('proctorSessionId');
 
     useEffect(() => {
-        const data = JSON.parse(localStorage.getItem('proctorReport') || "[]");
-        setReport(data);
-    }, []);
+        const loadLocal = () => setReport(JSON.parse(localStorage.getItem('proctorReport') || "[]"));
+        if (!sessionId) {
+            loadLocal();
+            return;
+        }
+        // The server keeps the full event log of the session; the browser copy
+        // is only a fallback if it cannot be reached.
+        fetch(`${API_BASE_URL}/proctor/sessions/${encodeURIComponent(sessionId)}/report`)
+            .then(res => (res.ok ? res.json() : Promise.reject(res.status)))
+            .then(data => setReport(data.events.map(event => ({
+                time: new Date(event.started * 1000).toLocaleTimeString(),
+                issue: event.issue,
+                duration: event.duration,
+            }))))
+            .catch(loadLocal);
+    }, [sessionId]);
 
     const score = Math.max(0, 100 - (report.length * 10)); // Simple scoring logic
 
@@ -16,7 +34,7 @@ const ProctoredReport = () => {
         <div className="min-h-screen bg-gray-50 p-8">
             <div className="max-w-3xl mx-auto bg-white rounded-xl shadow p-8">
                 <h1 className="text-3xl font-bold text-gray-800 mb-2">Proctoring Report</h1>
-                <p className="text-gray-500 mb-8">Session ID: #882103</p>
+                <p className="text-gray-500 mb-8">Session ID: {sessionId || 'Unknown'}</p>
 
                 <div className="grid grid-cols-2 gap-6 mb-8">
                     <div className="bg-blue-50 p-6 rounded-lg text-center">
@@ -43,6 +61,7 @@ const ProctoredReport = () => {
                                 <tr>
                                     <th className="p-3">Time</th>
                                     <th className="p-3">Violation Type</th>
+                                    <th className="p-3">Duration</th>
                                     <th className="p-3">Severity</th>
                                 </tr>
                             </thead>
@@ -51,6 +70,7 @@ const ProctoredReport = () => {
                                     <tr key={idx} className="border-t">
                                         <td className="p-3">{item.time}</td>
                                         <td className="p-3 font-medium text-red-600">{item.issue}</td>
+                                        <td className="p-3 text-sm text-gray-500">{formatDuration(item.duration)}</td>
                                         <td className="p-3 text-sm text-gray-500">High</td>
                                     </tr>
                                 ))}